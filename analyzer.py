@@ -1,35 +1,306 @@
 from collections import Counter
-from datetime import datetime
 
-def analyze_events(entries):
+import numpy as np
+
+from bursts import BurstTracker
+from events import EventBatch, NO_USER
+from sketches import SketchSummary
+from timestamps import YearResolver, decode_seconds
+
+def analyze_events(entries, reference=None, approximate=False):
     """
     Analizza una lista di eventi di log e restituisce:
     - un Counter con la frequenza di ogni IP
     - un Counter con la frequenza degli eventi per ogni ora del giorno
+    - gli aggregati per IP usati dal modello (ore, utenti e minuti di attività)
+    - i picchi di tentativi per IP in finestre scorrevoli (vedi bursts.BurstTracker),
+      calcolati su timestamp assoluti con l'anno dedotto da 'reference'
 
     Args:
-        entries (list): Lista di dizionari, ciascuno rappresentante un evento di log con chiavi 'ip' e 'timestamp'.
+        entries (iterable): Lista (o generatore, es. log_parser.iter_log_events) di dizionari,
+            ciascuno rappresentante un evento di log con chiavi 'ip', 'timestamp' e
+            (opzionale) 'user', oppure un EventBatch compatto (es. log_parser.parse_log_compact).
+        reference (datetime): Istante di riferimento per dedurre l'anno dei timestamp
+            syslog, di solito la data di modifica del file (default: adesso).
+        approximate (bool): Se True usa la modalità approssimata a memoria fissa
+            (vedi _analyze_approximate).
 
     Returns:
-        dict: Dizionario con due Counter: 'ip_counter' e 'hourly_counter'
+        dict: Dizionario con 'ip_counter' e 'hourly_counter' (Counter) e con
+            'ip_hourly' (IP -> Counter delle ore), 'ip_users' (IP -> set di utenti),
+            'ip_minutes' (IP -> [minuti di attività, primo minuto, ultimo minuto], vedi
+            _add_minute) e 'bursts' (BurstTracker con picchi e primo/ultimo istante di
+            attività di ogni IP)
     """
+    if isinstance(entries, EventBatch):
+        return _analyze_batch(entries, reference, approximate)
+    if approximate:
+        return _analyze_approximate(entries)
+
     ip_counter = Counter()        # Conta le occorrenze di ogni IP
     hourly_counter = Counter()    # Conta gli eventi per ogni ora
+    ip_hourly = {}                # Per ogni IP, conta gli eventi per ora
+    ip_users = {}                 # Per ogni IP, insieme degli utenti tentati
+    ip_minutes = {}               # Per ogni IP, minuti di attività contati (vedi _add_minute)
+    bursts = BurstTracker()       # Per ogni IP, tentativi in finestre scorrevoli (1 min, 10 min, 1 h)
+    epoch = YearResolver(reference).epoch
 
     for entry in entries:
         ip = entry["ip"]
         ip_counter[ip] += 1      # Incrementa il conteggio per l'IP
 
-        try:
-            # Estrae l'ora dal timestamp (formato: "Mese Giorno Ora:Minuti:Secondi")
-            hour = datetime.strptime(entry["timestamp"], "%b %d %H:%M:%S").hour
+        if ip not in ip_hourly:
+            ip_hourly[ip] = Counter()
+            ip_users[ip] = set()
+
+        user = entry.get("user")
+        if user is not None:
+            ip_users[ip].add(user)
+
+        # Estrae l'ora dal timestamp (formato: "Mese Giorno Ora:Minuti:Secondi")
+        seconds = decode_seconds(entry["timestamp"])
+        if seconds is not None:
+            hour = (seconds // 3600) % 24
             hourly_counter[hour] += 1  # Incrementa il conteggio per quell'ora
-        except ValueError:
-            # Se il timestamp non è nel formato atteso, ignora l'errore
-            pass
+            ip_hourly[ip][hour] += 1
+            _add_minute(ip_minutes, ip, seconds // 60)
+            bursts.add(ip, epoch(seconds))
+        # Se il timestamp non è nel formato atteso, l'evento non viene conteggiato per ora
 
     return {
         "ip_counter": ip_counter,
-        "hourly_counter": hourly_counter
+        "hourly_counter": hourly_counter,
+        "ip_hourly": ip_hourly,
+        "ip_users": ip_users,
+        "ip_minutes": ip_minutes,
+        "bursts": bursts
+    }
+
+
+def _add_minute(ip_minutes, ip, minute):
+    """
+    Conta i minuti di attività di un IP senza conservarli: [conteggio, primo minuto,
+    ultimo minuto]. Un minuto viene contato quando è diverso dall'ultimo visto, quindi
+    il conteggio è esatto per i log in ordine cronologico (come quelli di syslog).
+    """
+    minutes = ip_minutes.get(ip)
+    if minutes is None:
+        ip_minutes[ip] = [1, minute, minute]
+    elif minute != minutes[2]:
+        minutes[0] += 1
+        minutes[2] = minute
+
+
+def _approximate_summary(hourly_counter, sketch):
+    """
+    Riepilogo della modalità approssimata: 'ip_counter' contiene solo gli IP più
+    attivi con il conteggio stimato, 'sketch' il SketchSummary completo; gli
+    aggregati per IP (ore, utenti, minuti, raffiche) non vengono calcolati.
+    """
+    return {
+        "ip_counter": sketch.counter(),
+        "hourly_counter": hourly_counter,
+        "ip_hourly": {},
+        "ip_users": {},
+        "ip_minutes": {},
+        "bursts": None,
+        "sketch": sketch
     }
-        
\ No newline at end of file
+
+
+def _analyze_approximate(entries):
+    """
+    Variante di analyze_events a memoria fissa per log con moltissimi IP distinti:
+    gli IP più attivi sono stimati con un Count-Min Sketch e gli IP/utenti distinti
+    per ora con HyperLogLog (vedi sketches.SketchSummary). La distribuzione oraria
+    resta esatta.
+    """
+    hourly_counter = Counter()
+    sketch = SketchSummary()
+    add = sketch.add
+
+    for entry in entries:
+        seconds = decode_seconds(entry["timestamp"])
+        hour = None
+        if seconds is not None:
+            hour = (seconds // 3600) % 24
+            hourly_counter[hour] += 1
+        add(entry["ip"], hour, entry.get("user"))
+
+    return _approximate_summary(hourly_counter, sketch)
+
+
+def _hourly_counter(hours):
+    # Counter delle ore con l'ordine di inserimento del percorso basato sui dizionari (prima apparizione)
+    hourly_counter = Counter()
+    if hours.size:
+        hour_counts = np.bincount(hours, minlength=24)
+        present, first_seen = np.unique(hours, return_index=True)
+        for hour in present[np.argsort(first_seen)].tolist():
+            hourly_counter[hour] = int(hour_counts[hour])
+    return hourly_counter
+
+
+def _analyze_batch(batch, reference=None, approximate=False):
+    """
+    Variante vettoriale di analyze_events per un EventBatch: conta IP e ore sulle
+    colonne NumPy. L'ordine di inserimento nei Counter (prima apparizione) è lo
+    stesso del percorso basato sui dizionari.
+    """
+    ip_table = batch.ip_table
+    ip_ids = np.frombuffer(batch.ip_ids, dtype=np.uint32).astype(np.int64)
+    seconds = np.frombuffer(batch.seconds, dtype=np.int32).astype(np.int64)
+    user_ids = np.frombuffer(batch.user_ids, dtype=np.uint32)
+    valid = seconds >= 0
+    hours = (seconds[valid] // 3600) % 24
+    hourly_counter = _hourly_counter(hours)
+
+    if approximate:
+        all_hours = np.where(valid, (seconds // 3600) % 24, -1)
+        has_user = user_ids != NO_USER
+        sketch = SketchSummary()
+        sketch.add_arrays(ip_table, ip_ids, all_hours, batch.user_table, user_ids[has_user], all_hours[has_user])
+        return _approximate_summary(hourly_counter, sketch)
+
+    counts = batch.ip_counts().tolist()
+    ip_counter = Counter(dict(zip(ip_table, counts)))
+
+    ip_hourly = {ip: Counter() for ip in ip_table}
+    ip_users = {ip: set() for ip in ip_table}
+    ip_minutes = {}
+
+    # Istogramma (IP, ora) in un'unica bincount
+    per_ip_hour = np.bincount(ip_ids[valid] * 24 + hours, minlength=len(ip_table) * 24).reshape(-1, 24)
+    for ip_id, hour in zip(*np.nonzero(per_ip_hour)):
+        ip_hourly[ip_table[ip_id]][int(hour)] = int(per_ip_hour[ip_id, hour])
+
+    has_user = user_ids != NO_USER
+    for ip_id, user_id in np.unique(np.stack([ip_ids[has_user], user_ids[has_user]]), axis=1).T.tolist():
+        ip_users[ip_table[ip_id]].add(batch.user_table[user_id])
+
+    # Minuti di attività come in _add_minute: eventi di ogni IP in ordine (ordinamento stabile),
+    # contando i cambi di minuto
+    order = np.argsort(ip_ids[valid], kind="stable")
+    minute_ips = ip_ids[valid][order]
+    minutes = (seconds[valid] // 60)[order]
+    if minute_ips.size:
+        new_ip = np.ones(minute_ips.size, dtype=bool)
+        new_ip[1:] = minute_ips[1:] != minute_ips[:-1]
+        new_minute = new_ip.copy()
+        new_minute[1:] |= minutes[1:] != minutes[:-1]
+        counts = np.bincount(minute_ips[new_minute], minlength=len(ip_table))
+        first = np.flatnonzero(new_ip)
+        last = np.append(first[1:] - 1, minute_ips.size - 1)
+        for ip_id, first_minute, last_minute in zip(minute_ips[first].tolist(), minutes[first].tolist(),
+                                                    minutes[last].tolist()):
+            ip_minutes[ip_table[ip_id]] = [int(counts[ip_id]), first_minute, last_minute]
+
+    bursts = BurstTracker()
+    bursts.add_arrays(ip_table, ip_ids, YearResolver(reference).epochs(seconds))
+
+    return {
+        "ip_counter": ip_counter,
+        "hourly_counter": hourly_counter,
+        "ip_hourly": ip_hourly,
+        "ip_users": ip_users,
+        "ip_minutes": ip_minutes,
+        "bursts": bursts
+    }
+
+
+def empty_summary():
+    """
+    Restituisce un riepilogo vuoto, con la stessa struttura di quello di analyze_events.
+    """
+    return {
+        "ip_counter": Counter(),
+        "hourly_counter": Counter(),
+        "ip_hourly": {},
+        "ip_users": {},
+        "ip_minutes": {},
+        "bursts": BurstTracker(),
+        "lines": 0
+    }
+
+
+def update_summary(target, partial):
+    """
+    Aggiunge in place il riepilogo 'partial' al riepilogo 'target'.
+    Il costo è proporzionale alla dimensione di 'partial', non di 'target':
+    è il passo usato per gli aggiornamenti incrementali.
+
+    Args:
+        target (dict): Riepilogo da aggiornare (modificato in place).
+        partial (dict): Riepilogo parziale prodotto da analyze_events.
+
+    Returns:
+        dict: Il riepilogo 'target' aggiornato.
+    """
+    if ((target.get("sketch") is None) != (partial.get("sketch") is None)
+            and target["ip_counter"] and partial["ip_counter"]):
+        raise ValueError("Impossibile unire un riepilogo esatto e uno approssimato")
+    target["ip_counter"].update(partial["ip_counter"])
+    target["hourly_counter"].update(partial["hourly_counter"])
+    target["lines"] = target.get("lines", 0) + partial.get("lines", 0) # Righe lette (se note)
+    ip_hourly = target.setdefault("ip_hourly", {})
+    ip_users = target.setdefault("ip_users", {})
+    ip_minutes = target.setdefault("ip_minutes", {})
+    for ip, hours in partial.get("ip_hourly", {}).items():
+        ip_hourly.setdefault(ip, Counter()).update(hours)
+    for ip, users in partial.get("ip_users", {}).items():
+        ip_users.setdefault(ip, set()).update(users)
+    for ip, (count, first, last) in partial.get("ip_minutes", {}).items():
+        minutes = ip_minutes.get(ip)
+        if minutes is None:
+            ip_minutes[ip] = [count, first, last]
+        else:
+            # Il minuto a cavallo tra due porzioni consecutive del log va contato una volta sola
+            minutes[0] += count - (first == minutes[2])
+            minutes[2] = last
+    if partial.get("bursts") is not None:
+        target.setdefault("bursts", BurstTracker()).merge(partial["bursts"])
+    if partial.get("sketch") is not None:
+        # Riepiloghi approssimati: si uniscono gli sketch e si ricalcolano gli IP più attivi
+        if target.get("sketch") is None:
+            target["sketch"] = partial["sketch"]
+        else:
+            target["sketch"].merge(partial["sketch"])
+        target["ip_counter"] = target["sketch"].counter()
+    return target
+
+
+def total_events(summary):
+    """
+    Restituisce il numero di eventi del riepilogo (anche in modalità approssimata,
+    dove 'ip_counter' contiene solo gli IP più attivi).
+    """
+    sketch = summary.get("sketch")
+    return sketch.events if sketch is not None else sum(summary["ip_counter"].values())
+
+
+def distinct_ips(summary):
+    """
+    Restituisce il numero di IP distinti del riepilogo (stimato in modalità approssimata).
+    """
+    sketch = summary.get("sketch")
+    return sketch.distinct_ips() if sketch is not None else len(summary["ip_counter"])
+
+
+def merge_summaries(summaries):
+    """
+    Unisce più riepiloghi parziali (prodotti da analyze_events su porzioni diverse
+    del log) in un unico riepilogo con la stessa struttura.
+    I riepiloghi vengono uniti nell'ordine in cui sono forniti: se corrispondono a
+    porzioni consecutive del file, il risultato è identico a quello dell'analisi seriale
+    (compreso l'ordine di inserimento degli IP nel Counter).
+
+    Args:
+        summaries (iterable): Riepiloghi parziali prodotti da analyze_events.
+
+    Returns:
+        dict: Riepilogo con la stessa struttura di quello di analyze_events
+    """
+    merged = empty_summary()
+    for summary in summaries:
+        update_summary(merged, summary)
+    return merged
@@ -0,0 +1,68 @@
+# bench_compressed.py
+# Confronta la velocità di parsing dei log compressi (gzip, bzip2, xz) con il testo semplice
+# e l'analisi seriale di una rotazione con quella parallela (analyze_rotation_set).
+#
+# Uso (dalla cartella del progetto):
+#     python benchmarks/bench_compressed.py [file_di_log] [copie_nella_rotazione]
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer import analyze_events
+from log_parser import iter_log_events
+from parallel_engine import analyze_rotation_set, expand_rotation_set
+
+COMPRESSORS = (("gz", gzip.compress), ("bz2", bz2.compress), ("xz", lzma.compress))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def count_events(filepath):
+    return sum(1 for _ in iter_log_events(filepath))
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join("sample_logs", "auth1.log")
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with open(source, "rb") as file:
+        data = file.read()
+    # Ripete il log fino ad almeno ~20 MB per avere misure stabili
+    data = data * max(1, (20 * 1024 * 1024) // max(1, len(data)))
+    megabytes = len(data) / 1024 / 1024
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain = os.path.join(directory, "auth.log")
+        with open(plain, "wb") as file:
+            file.write(data)
+
+        elapsed, events = timed(count_events, plain)
+        print(f"testo:  {megabytes / elapsed:7.1f} MB/s ({events} eventi, {elapsed:.2f}s)")
+        for suffix, compress in COMPRESSORS:
+            path = f"{plain}.{suffix}"
+            with open(path, "wb") as file:
+                file.write(compress(data))
+            elapsed, compressed_events = timed(count_events, path)
+            print(f"{suffix + ':':7} {megabytes / elapsed:7.1f} MB/s decompressi "
+                  f"({compressed_events} eventi, {elapsed:.2f}s)")
+
+        # Rotazione: auth.log + auth.log.1 ... auth.log.N.gz
+        for index in range(1, copies + 1):
+            shutil.copy(f"{plain}.gz", f"{plain}.{index}.gz")
+        files = expand_rotation_set(plain)
+        serial_time, serial = timed(lambda: analyze_events(e for f in files for e in iter_log_events(f)))
+        parallel_time, parallel = timed(analyze_rotation_set, plain)
+        print(f"rotazione di {len(files)} file: seriale {serial_time:.2f}s, parallela {parallel_time:.2f}s "
+              f"({os.cpu_count()} core) - risultati identici: {serial['ip_counter'] == parallel['ip_counter']}")
@@ -0,0 +1,87 @@
+# bench_extractor.py
+# Confronto per riga tra l'estrattore di tutti gli eventi sshd (iter_log_records) e il
+# percorso originale "Failed password" in riga + split(), su un log ottenuto ripetendo
+# i file di sample_logs/. Termina con codice 1 se il rapporto tra i tempi supera
+# l'obiettivo (--max-ratio, di default 1.0: almeno veloce quanto il percorso originale).
+#
+# Uso (dalla cartella del progetto):
+#     python benchmarks/bench_extractor.py [--copies 40] [--repeat 5] [--max-ratio 1.0]
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from log_parser import iter_log_records
+
+SAMPLE_LOGS = os.path.join(PROJECT_DIR, "sample_logs", "*.log")
+
+
+def write_sample_log(path, copies):
+    """
+    Scrive in 'path' i file di sample_logs/ ripetuti 'copies' volte e restituisce il
+    numero di righe scritte.
+    """
+    lines = []
+    for sample in sorted(glob.glob(SAMPLE_LOGS)):
+        with open(sample) as file:
+            lines += [line if line.endswith("\n") else line + "\n" for line in file]
+    with open(path, "w") as file:
+        for _ in range(copies):
+            file.writelines(lines)
+    return len(lines) * copies
+
+
+def baseline(path):
+    """Percorso originale: solo l'IP delle righe "Failed password", letto per posizione."""
+    ips = []
+    with open(path) as file:
+        for line in file:
+            if "Failed password" in line:
+                ips.append(line.split()[-4])
+    return ips
+
+
+def extractor(path):
+    """Tutti gli eventi sshd tipizzati (timestamp, host, pid, tipo, utente, IP e porta)."""
+    return list(iter_log_records(path))
+
+
+def best_time(function, path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confronta iter_log_records con il percorso 'in' + split().")
+    parser.add_argument("--copies", type=int, default=40, help="Ripetizioni dei file di sample_logs/")
+    parser.add_argument("--repeat", type=int, default=5, help="Esecuzioni per misura (si tiene la migliore)")
+    parser.add_argument("--max-ratio", type=float, default=1.0,
+                        help="Rapporto massimo tra il tempo di iter_log_records e quello del percorso originale")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, "auth.log")
+        lines = write_sample_log(log_path, args.copies)
+        baseline_time, ips = best_time(baseline, log_path, args.repeat)
+        extractor_time, records = best_time(extractor, log_path, args.repeat)
+
+    ratio = extractor_time / baseline_time
+    print(f"righe: {lines:,}")
+    print(f"in + split():      {baseline_time:.3f}s ({baseline_time / lines * 1e6:.2f} µs/riga, {len(ips):,} IP)")
+    print(f"iter_log_records:  {extractor_time:.3f}s ({extractor_time / lines * 1e6:.2f} µs/riga, "
+          f"{len(records):,} eventi)")
+    print(f"rapporto: x{ratio:.2f} (obiettivo <= x{args.max_ratio:.2f})")
+    if ratio > args.max_ratio:
+        print("Obiettivo non raggiunto: iter_log_records è più lento per riga del percorso originale.")
+        sys.exit(1)
@@ -0,0 +1,192 @@
+# bench_pipeline.py
+# Benchmark dell'intera pipeline su un log sintetico: misura separatamente parsing,
+# aggregazione, rilevamento anomalie, generazione del report e scritture nel database,
+# con throughput e picco di memoria, e salva i risultati in JSON per il confronto
+# tra versioni.
+#
+# Uso (dalla cartella del progetto):
+#     python benchmarks/bench_pipeline.py --lines 1000000 --ips 5000
+#     python benchmarks/bench_pipeline.py --log /var/log/auth.log --compare benchmarks/results/precedente.json
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_auth_log import add_generator_arguments, options_from_args, write_log
+
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+LIST_PARSE_MAX_LINES = 5_000_000  # Oltre questa soglia parse_log (lista di dizionari) non viene misurato
+
+
+def peak_rss_mb():
+    """Picco di memoria residente del processo (MB) fino a questo momento."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # macOS: byte, Linux: KB
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Stages:
+    """
+    Misura le fasi della pipeline: tempo, throughput e picco di memoria.
+    Con 'trace_memory' il picco delle allocazioni Python di ogni fase è misurato con
+    tracemalloc (più preciso ma rallenta l'esecuzione); altrimenti si riporta il picco
+    di memoria residente del processo dopo la fase.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def run(self, name, function, *args, items=None, nbytes=None):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        record = {"seconds": round(seconds, 4), "peak_rss_mb": round(peak_rss_mb(), 1)}
+        if self.trace_memory:
+            record["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+            tracemalloc.stop()
+        if items is not None:
+            count = items(result) if callable(items) else items
+            record["items"] = count
+            record["items_per_s"] = round(count / seconds, 1) if seconds else None
+        if nbytes is not None:
+            record["mb_per_s"] = round(nbytes / 1024 / 1024 / seconds, 1) if seconds else None
+        self.results[name] = record
+        extra = f", {record['items_per_s']:,.0f}/s" if record.get("items_per_s") else ""
+        extra += f", {record['mb_per_s']} MB/s" if record.get("mb_per_s") else ""
+        print(f"{name:22} {seconds:9.3f} s{extra}  (picco RSS {record['peak_rss_mb']} MB)")
+        return result
+
+
+def run_benchmark(log_path, lines, trace_memory=False, db_rows=None):
+    """
+    Esegue tutte le fasi sul file indicato e restituisce il dizionario dei risultati.
+    """
+    from analyzer import analyze_events, total_events
+    from log_parser import iter_log_events, iter_log_records, parse_log, parse_log_compact
+    from model import detect_anomalies
+    from parallel_engine import analyze_parallel
+    from report_generator import generate_report
+    from sqlite_storage import SQLiteStorage
+    from storage import analysis_record
+    import sklearn.ensemble  # noqa: F401 - caricato prima: il tempo di detect_anomalies non include l'import
+
+    size = os.path.getsize(log_path)
+    stages = Stages(trace_memory)
+
+    if lines is None or lines <= LIST_PARSE_MAX_LINES:
+        events = stages.run("parse_log", parse_log, log_path, items=len, nbytes=size)
+        stages.run("analyze_events[list]", analyze_events, events, items=len(events))
+        del events
+    stages.run("iter_log_events", lambda: sum(1 for _ in iter_log_events(log_path)), items=lambda n: n, nbytes=size)
+    stages.run("iter_log_records", lambda: sum(1 for _ in iter_log_records(log_path)), items=lambda n: n, nbytes=size)
+    batch = stages.run("parse_log_compact", parse_log_compact, log_path, items=len, nbytes=size)
+    summary = stages.run("analyze_events[batch]", analyze_events, batch, items=len(batch))
+    del batch
+    stages.run("analyze_parallel", analyze_parallel, log_path, items=lambda s: sum(s["ip_counter"].values()),
+               nbytes=size)
+    stages.run("analyze_parallel[approx]", lambda: analyze_parallel(log_path, approximate=True),
+               items=total_events, nbytes=size)
+
+    anomalies = stages.run("detect_anomalies", detect_anomalies, summary, items=len(summary["ip_counter"]))
+
+    with tempfile.TemporaryDirectory() as directory:
+        import report_generator
+        report_generator.CHART_WORKERS = 1  # Misura il report da solo, senza il pool dei grafici
+        stages.run("generate_report", generate_report, summary, anomalies, os.path.join(directory, "report.pdf"))
+
+        # Scritture nel database: SQLite integrato, nessun servizio esterno necessario
+        storage = SQLiteStorage(os.path.join(directory, "bench.db"))
+        storage.init()
+        analyses = [analysis_record(anomalies, summary["ip_counter"], log_path, "report.pdf", summary)]
+        stages.run("db_write[sqlite]", storage.write_analyses, analyses, items=len(summary["ip_counter"]) + len(anomalies))
+        many = [analysis_record(anomalies, summary["ip_counter"], f"{log_path}.{index}", "report.pdf")
+                for index in range(db_rows or 100)]
+        stages.run("db_write_batch[sqlite]", storage.write_analyses, many, items=len(many))
+
+    return {
+        "version": git_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "log": {"path": log_path, "bytes": size, "lines": lines,
+                "events": sum(summary["ip_counter"].values()), "ips": len(summary["ip_counter"])},
+        "stages": stages.results,
+    }
+
+
+def compare(current, previous_path):
+    """
+    Stampa il rapporto tra i tempi attuali e quelli di un risultato precedente.
+    """
+    with open(previous_path, encoding="utf-8") as file:
+        previous = json.load(file)
+    print(f"\nConfronto con {previous_path} (versione {previous.get('version')}):")
+    for name, record in current["stages"].items():
+        old = previous.get("stages", {}).get(name)
+        if not old or not old.get("seconds"):
+            continue
+        ratio = record["seconds"] / old["seconds"]
+        marker = "  <-- più lento" if ratio > 1.1 else ""
+        print(f"{name:22} {old['seconds']:9.3f} s -> {record['seconds']:9.3f} s  (x{ratio:.2f}){marker}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark della pipeline di analisi dei log.")
+    add_generator_arguments(parser)
+    parser.add_argument("--log", help="Usa un log esistente invece di generarne uno sintetico")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Misura il picco di allocazioni di ogni fase con tracemalloc (più lento)")
+    parser.add_argument("--db-rows", type=int, default=100, help="Analisi scritte nel test di scrittura a lotti")
+    parser.add_argument("--output", help="File JSON dei risultati (default: benchmarks/results/<data>.json)")
+    parser.add_argument("--compare", help="File JSON di un risultato precedente da confrontare")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = args.log
+        lines = None
+        if not log_path:
+            log_path = os.path.join(directory, "auth.log")
+            start = time.perf_counter()
+            size = write_log(log_path, args.lines, **options_from_args(args))
+            lines = args.lines
+            print(f"Log sintetico: {lines} righe, {size / 1024 / 1024:.1f} MB "
+                  f"(generato in {time.perf_counter() - start:.1f} s)")
+        results = run_benchmark(log_path, lines, args.trace_memory, args.db_rows)
+        if not args.log:
+            results["log"]["generator"] = options_from_args(args)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"\nRisultati salvati in {output}")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,48 @@
+# bench_startup.py
+# Misura il tempo di importazione della GUI (il costo dominante dell'avvio) in processi
+# Python nuovi e verifica che scikit-learn, matplotlib e ReportLab non vengano caricati.
+# I risultati vengono aggiunti a output/startup_times.jsonl per il confronto tra versioni.
+#
+# Uso (dalla cartella del progetto):
+#     python benchmarks/bench_startup.py [ripetizioni]
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from startup import record_startup
+
+# Eseguito in un processo nuovo: importa la GUI senza creare la finestra
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import gui
+elapsed = time.perf_counter() - start
+from startup import heavy_modules_loaded
+print(json.dumps({"seconds": elapsed, "heavy": heavy_modules_loaded()}))
+"""
+
+
+def measure():
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=PROJECT_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    measure()  # Primo avvio a vuoto: scalda la cache dei file del sistema operativo
+    results = [measure() for _ in range(runs)]
+    times = [result["seconds"] for result in results]
+    median = statistics.median(times)
+
+    print(f"import gui: mediana {median:.3f} s, min {min(times):.3f} s, max {max(times):.3f} s ({runs} avvii)")
+    heavy = results[-1]["heavy"]
+    print(f"moduli pesanti caricati all'avvio: {', '.join(heavy) if heavy else 'nessuno'}")
+    record_startup(median, label="import_gui", path=os.path.join(PROJECT_DIR, "output", "startup_times.jsonl"),
+                   heavy=heavy)
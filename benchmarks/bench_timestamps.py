@@ -0,0 +1,77 @@
+# bench_timestamps.py
+# Micro-benchmark: estrazione dell'ora con datetime.strptime contro timestamps.py.
+#
+# Uso (dalla cartella del progetto):
+#     python benchmarks/bench_timestamps.py [numero_timestamp]
+
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timestamps import MONTHS, decode_hour, decode_hours, hourly_counts
+
+
+def make_timestamps(count, seed=42):
+    """
+    Genera timestamp syslog realistici: secondi ripetuti (raffiche di tentativi)
+    e giorni sia con zero iniziale sia a una cifra, come in sample_logs/auth2.log.
+    """
+    rng = random.Random(seed)
+    months = list(MONTHS)
+    timestamps = []
+    second = 0
+    while len(timestamps) < count:
+        second += rng.randint(0, 3)
+        month = months[(second // 2592000) % 12]
+        day = (second // 86400) % 28 + 1
+        day_text = str(day) if rng.random() < 0.5 else f"{day:02d}"
+        clock = f"{(second // 3600) % 24:02d}:{(second // 60) % 60:02d}:{second % 60:02d}"
+        timestamps.extend([f"{month} {day_text} {clock}"] * rng.randint(1, 5))
+    return timestamps[:count]
+
+
+def strptime_counts(timestamps):
+    """Implementazione originale di analyze_events (solo la parte oraria)."""
+    counter = Counter()
+    for timestamp in timestamps:
+        try:
+            counter[datetime.strptime(timestamp, "%b %d %H:%M:%S").hour] += 1
+        except ValueError:
+            pass
+    return counter
+
+
+def decode_hour_counts(timestamps):
+    """Stessa logica con il decoder a posizioni fisse e cache."""
+    decode_hour.cache_clear()
+    counter = Counter()
+    for timestamp in timestamps:
+        hour = decode_hour(timestamp)
+        if hour is not None:
+            counter[hour] += 1
+    return counter
+
+
+def measure(function, timestamps):
+    start = time.perf_counter()
+    result = function(timestamps)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    timestamps = make_timestamps(count)
+
+    baseline_time, baseline = measure(strptime_counts, timestamps)
+    print(f"strptime:      {baseline_time:.3f}s ({count / baseline_time:,.0f} timestamp/s)")
+
+    for name, function in (("decode_hour:", decode_hour_counts), ("decode_hours:", hourly_counts)):
+        elapsed, result = measure(function, timestamps)
+        identical = dict(result) == dict(baseline)
+        print(f"{name:<14} {elapsed:.3f}s ({count / elapsed:,.0f} timestamp/s) "
+              f"speedup x{baseline_time / elapsed:.1f} - risultati identici: {identical}")
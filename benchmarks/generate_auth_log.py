@@ -0,0 +1,164 @@
+# generate_auth_log.py
+# Generatore di log sshd sintetici (formato /var/log/auth.log) per i benchmark.
+# Produce righe 'Failed password', 'Accepted password' e 'Invalid user', IP con
+# distribuzione a coda lunga, raffiche di attacchi e giorni sia con spazio sia con
+# zero iniziale ("Jan  5" / "Jan 05"). Con lo stesso seed il file è identico.
+#
+# Uso (dalla cartella del progetto):
+#     python benchmarks/generate_auth_log.py output.log --lines 1000000 --ips 5000 --bursts 200
+
+import argparse
+import random
+from itertools import accumulate
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+USERS = ("root", "admin", "test", "user", "oracle", "postgres", "ubuntu", "git", "guest", "pi", "deploy", "www-data")
+VALID_USERS = ("alice", "bob", "carol", "deploy")
+HOSTS = ("server", "web01", "db01", "bastion")
+WRITE_BATCH = 10000  # Righe scritte su disco per ogni blocco
+
+
+def _make_ips(rng, count):
+    ips = set()
+    while len(ips) < count:
+        ips.add(f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}")
+    return sorted(ips)
+
+
+def _timestamp(second, zero_padded):
+    # second = secondi dall'inizio dell'anno (anno non bisestile, come syslog che non riporta l'anno)
+    day_of_year, rest = divmod(second % (365 * 86400), 86400)
+    month = 0
+    while day_of_year >= DAYS_IN_MONTH[month]:
+        day_of_year -= DAYS_IN_MONTH[month]
+        month += 1
+    day = day_of_year + 1
+    day_text = f"{day:02d}" if zero_padded else f"{day:2d}"
+    return f"{MONTHS[month]} {day_text} {rest // 3600:02d}:{rest // 60 % 60:02d}:{rest % 60:02d}"
+
+
+def iter_lines(lines, ips=1000, bursts=None, failed_ratio=0.7, invalid_ratio=0.2,
+               zero_padded_ratio=0.3, start_second=0, span_seconds=30 * 86400, seed=42):
+    """
+    Genera le righe del log in ordine cronologico.
+
+    Args:
+        lines (int): Numero totale di righe.
+        ips (int): Numero di IP distinti (distribuzione a coda lunga: pochi IP molto attivi).
+        bursts (int): Numero di raffiche di attacco (da 20 a 300 tentativi consecutivi dello
+            stesso IP); default una ogni 10000 righe.
+        failed_ratio (float): Quota di righe 'Failed password' (il resto si divide tra
+            'Invalid user' e 'Accepted password').
+        invalid_ratio (float): Quota di righe 'Invalid user'.
+        zero_padded_ratio (float): Quota di timestamp con zero iniziale ("Jan 05").
+        start_second (int): Istante iniziale (secondi dall'inizio dell'anno).
+        span_seconds (int): Intervallo di tempo coperto dal log.
+        seed (int): Seme del generatore casuale.
+
+    Yields:
+        str: Righe del log (con il carattere di fine riga).
+    """
+    rng = random.Random(seed)
+    if bursts is None:
+        bursts = max(1, lines // 10000)
+    ip_pool = _make_ips(rng, ips)
+    # Pesi a coda lunga (legge di Zipf): l'IP i-esimo ha peso 1/(i+1)
+    cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(ip_pool))))
+    # Le raffiche cadono in righe casuali; ogni raffica ha un IP e una durata propri
+    burst_at = {}
+    for _ in range(bursts):
+        burst_at[rng.randrange(max(1, lines))] = (rng.choice(ip_pool), rng.randint(20, 300))
+    step = span_seconds / max(1, lines)
+
+    pid = 1000
+    emitted = 0
+    burst_ip, burst_left = None, 0
+    while emitted < lines:
+        if emitted in burst_at:
+            burst_ip, burst_left = burst_at[emitted]
+        second = start_second + int(emitted * step)
+        host = HOSTS[emitted % len(HOSTS)]
+        port = rng.randint(1024, 65535)
+        pid += 1
+        timestamp = _timestamp(second, rng.random() < zero_padded_ratio)
+        prefix = f"{timestamp} {host} sshd[{pid}]: "
+
+        if burst_left:
+            burst_left -= 1
+            yield f"{prefix}Failed password for {rng.choice(USERS)} from {burst_ip} port {port} ssh2\n"
+        else:
+            ip = rng.choices(ip_pool, cum_weights=cum_weights)[0]
+            kind = rng.random()
+            if kind < failed_ratio:
+                user = rng.choice(USERS)
+                if rng.random() < 0.3:
+                    yield f"{prefix}Failed password for invalid user {user} from {ip} port {port} ssh2\n"
+                else:
+                    yield f"{prefix}Failed password for {user} from {ip} port {port} ssh2\n"
+            elif kind < failed_ratio + invalid_ratio:
+                yield f"{prefix}Invalid user {rng.choice(USERS)} from {ip} port {port}\n"
+            else:
+                yield f"{prefix}Accepted password for {rng.choice(VALID_USERS)} from {ip} port {port} ssh2\n"
+        emitted += 1
+
+
+def write_log(path, lines, **options):
+    """
+    Scrive un log sintetico di 'lines' righe in 'path' (opzioni come iter_lines).
+    Restituisce il numero di byte scritti.
+    """
+    written = 0
+    batch = []
+    with open(path, "w", encoding="ascii") as file:
+        for line in iter_lines(lines, **options):
+            batch.append(line)
+            if len(batch) >= WRITE_BATCH:
+                written += file.write("".join(batch))
+                batch.clear()
+        written += file.write("".join(batch))
+    return written
+
+
+def add_generator_arguments(parser):
+    """
+    Aggiunge al parser le opzioni del generatore (usate anche da bench_pipeline.py).
+    """
+    parser.add_argument("--lines", type=int, default=100000, help="Numero di righe (es. 10000 ... 100000000)")
+    parser.add_argument("--ips", type=int, default=1000, help="Numero di IP distinti")
+    parser.add_argument("--bursts", type=int, default=None,
+                        help="Numero di raffiche di attacco (default: una ogni 10000 righe)")
+    parser.add_argument("--failed-ratio", type=float, default=0.7, help="Quota di righe 'Failed password'")
+    parser.add_argument("--invalid-ratio", type=float, default=0.2, help="Quota di righe 'Invalid user'")
+    parser.add_argument("--zero-padded-ratio", type=float, default=0.3,
+                        help="Quota di timestamp con zero iniziale ('Jan 05' invece di 'Jan  5')")
+    parser.add_argument("--days", type=float, default=30, help="Giorni coperti dal log")
+    parser.add_argument("--seed", type=int, default=42, help="Seme del generatore casuale")
+    return parser
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Genera un log sshd sintetico per i benchmark.")
+    parser.add_argument("path", help="File di log da creare")
+    return add_generator_arguments(parser)
+
+
+def options_from_args(args):
+    """
+    Converte gli argomenti della riga di comando nelle opzioni di iter_lines.
+    """
+    return {
+        "ips": args.ips,
+        "bursts": args.bursts,
+        "failed_ratio": args.failed_ratio,
+        "invalid_ratio": args.invalid_ratio,
+        "zero_padded_ratio": args.zero_padded_ratio,
+        "span_seconds": int(args.days * 86400),
+        "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    size = write_log(args.path, args.lines, **options_from_args(args))
+    print(f"Creato {args.path}: {args.lines} righe, {size / 1024 / 1024:.1f} MB")
@@ -0,0 +1,335 @@
+# bursts.py
+# Rilevamento delle raffiche di tentativi (brute force): per ogni IP conta i tentativi
+# in finestre scorrevoli di durata fissa (1 minuto, 10 minuti, 1 ora) e ne registra il
+# picco, in un'unica passata sugli eventi e senza conservarli. 500 tentativi in 60 secondi
+# e 500 tentativi distribuiti in un mese producono così picchi molto diversi.
+
+from array import array
+
+import numpy as np
+
+BURST_WINDOWS = (60, 600, 3600)  # Durata delle finestre in secondi
+WINDOW_SLOTS = 20                # Bucket di ogni finestra: risoluzione = durata / WINDOW_SLOTS
+
+
+_ZEROS = {}
+
+
+def _zeros(count):
+    # Array di zeri riutilizzati per azzerare i tratti del buffer circolare
+    zeros = _ZEROS.get(count)
+    if zeros is None:
+        zeros = _ZEROS[count] = array("I", bytes(4 * count))
+    return zeros
+
+
+def _sliding_peak(buckets, slots):
+    """
+    Massimo numero di eventi in 'slots' bucket consecutivi, dato un dizionario
+    {bucket assoluto: conteggio} (anche con buchi).
+    """
+    keys = sorted(buckets)
+    peak = total = 0
+    start = 0
+    for key in keys:
+        total += buckets[key]
+        while keys[start] <= key - slots:
+            total -= buckets[keys[start]]
+            start += 1
+        peak = max(peak, total)
+    return peak
+
+
+class RingWindow:
+    """
+    Conteggio scorrevole dei tentativi di un IP su una finestra di 'slots' bucket.
+    - ring: buffer circolare con i conteggi degli ultimi 'slots' bucket (fino a 'last');
+      avanzare nel tempo azzera solo i bucket superati, quindi ogni evento costa O(1).
+    - head: conteggi dei primi 'slots' bucket (da 'first'), conservati quando il buffer
+      circolare inizia a sovrascriverli; servono, con 'ring', a unire finestre calcolate
+      su porzioni consecutive del log (merge) senza perdere le raffiche a cavallo.
+    - Un IP con un solo bucket di attività non alloca buffer (ring è None): nei log la
+      maggior parte degli IP compare pochissime volte.
+    Gli eventi più vecchi dell'inizio della finestra corrente (fuori ordine di oltre
+    una finestra) vengono ignorati.
+    """
+    __slots__ = ("slots", "first", "last", "head", "ring", "total", "peak")
+
+    def __init__(self, bucket, slots=WINDOW_SLOTS):
+        self.slots = slots
+        self.first = self.last = bucket
+        self.head = None    # None finché i primi bucket sono ancora nel buffer circolare
+        self.ring = None    # None finché c'è un solo bucket (il conteggio è 'total')
+        self.total = 1      # Eventi nella finestra che termina in 'last'
+        self.peak = 1       # Massimo di 'total' finora
+
+    def _allocate(self):
+        ring = self.ring = array("I", bytes(4 * self.slots))
+        ring[self.last % self.slots] = self.total
+        return ring
+
+    def add(self, bucket):
+        """
+        Aggiunge un evento nel bucket indicato (secondi epoch // durata del bucket).
+        """
+        slots = self.slots
+        if bucket == self.last:
+            if self.ring is not None:
+                self.ring[bucket % slots] += 1
+            if self.head is not None and bucket < self.first + slots:
+                self.head[bucket % slots] += 1
+        elif bucket > self.last:
+            ring = self.ring if self.ring is not None else self._allocate()
+            if self.head is None and bucket >= self.first + slots:
+                self.head = array("I", ring)  # Il buffer sta per sovrascrivere i primi bucket
+            gap = bucket - self.last
+            if gap >= slots:
+                ring[:] = _zeros(slots)
+                self.total = 0
+            else:
+                # Azzera i bucket superati (un tratto circolare, al più in due parti) con operazioni in C
+                start = (self.last + 1) % slots
+                end = start + gap
+                if end <= slots:
+                    self.total -= sum(ring[start:end])
+                    ring[start:end] = _zeros(gap)
+                else:
+                    self.total -= sum(ring[start:]) + sum(ring[:end - slots])
+                    ring[start:] = _zeros(slots - start)
+                    ring[:end - slots] = _zeros(end - slots)
+            ring[bucket % slots] += 1
+            self.last = bucket
+            if self.head is not None and bucket < self.first + slots:
+                self.head[bucket % slots] += 1
+        elif bucket > self.last - slots and bucket >= self.first:
+            # Evento leggermente fuori ordine, ancora dentro la finestra corrente
+            ring = self.ring if self.ring is not None else self._allocate()
+            ring[bucket % slots] += 1
+            if self.head is not None and bucket < self.first + slots:
+                self.head[bucket % slots] += 1
+        else:
+            return
+        self.total += 1
+        if self.total > self.peak:
+            self.peak = self.total
+
+    def buckets(self):
+        """
+        Restituisce i conteggi noti come dizionario {bucket assoluto: conteggio}:
+        i primi 'slots' bucket e gli ultimi 'slots' bucket di attività.
+        """
+        slots = self.slots
+        if self.ring is None:
+            return {self.last: self.total}
+        known = {}
+        head = self.head if self.head is not None else self.ring
+        for bucket in range(self.first, min(self.first + slots, self.last + 1)):
+            if head[bucket % slots]:
+                known[bucket] = head[bucket % slots]
+        for bucket in range(max(self.first, self.last - slots + 1), self.last + 1):
+            if self.ring[bucket % slots]:
+                known[bucket] = self.ring[bucket % slots]
+        return known
+
+    @classmethod
+    def from_buckets(cls, buckets, peak, slots=WINDOW_SLOTS):
+        """
+        Ricostruisce lo stato da un dizionario {bucket assoluto: conteggio} che
+        contiene almeno i primi e gli ultimi 'slots' bucket di attività.
+        """
+        keys = sorted(buckets)
+        window = cls(keys[0], slots)
+        window.last = keys[-1]
+        window.peak = peak
+        window.total = sum(count for bucket, count in buckets.items() if bucket > window.last - slots)
+        if len(keys) > 1:
+            window.ring = array("I", bytes(4 * slots))
+            for bucket in keys:
+                if bucket > window.last - slots:
+                    window.ring[bucket % slots] = buckets[bucket]
+            if window.last >= window.first + slots:
+                window.head = array("I", bytes(4 * slots))
+                for bucket in keys:
+                    if bucket < window.first + slots:
+                        window.head[bucket % slots] = buckets[bucket]
+        return window
+
+    def merged(self, other):
+        """
+        Unisce due finestre dello stesso IP calcolate su porzioni diverse del log
+        (in ordine cronologico): il picco tiene conto anche delle raffiche a cavallo
+        tra le due porzioni.
+        """
+        combined = self.buckets()
+        for bucket, count in other.buckets().items():
+            combined[bucket] = combined.get(bucket, 0) + count
+        peak = max(self.peak, other.peak, _sliding_peak(combined, self.slots))
+        return RingWindow.from_buckets(combined, peak, self.slots)
+
+
+class BurstTracker:
+    """
+    Picchi di tentativi per IP in più finestre scorrevoli (BURST_WINDOWS).
+    - add(ip, epoch) aggiorna in O(1) le finestre dell'IP.
+    - peaks() restituisce, per ogni IP, il massimo numero di tentativi in ciascuna finestra.
+    - merge() unisce il tracker di una porzione successiva del log (riepiloghi parziali
+      dei worker, coda di un file cresciuto).
+    Registra anche il primo e l'ultimo istante (epoch) di attività di ogni IP.
+    """
+
+    def __init__(self, windows=BURST_WINDOWS, slots=WINDOW_SLOTS):
+        self.windows = tuple(windows)
+        self.slots = slots
+        self.bucket_seconds = tuple(max(1, size // slots) for size in self.windows)
+        if any(size % self.bucket_seconds[0] for size in self.bucket_seconds):
+            raise ValueError("La durata dei bucket di ogni finestra deve essere multipla di quella della prima")
+        self.state = {}   # IP -> lista di RingWindow, una per finestra
+        self.seen = {}    # IP -> [primo epoch, ultimo epoch]
+
+    def add(self, ip, epoch):
+        """
+        Registra un tentativo dell'IP all'istante 'epoch' (secondi, vedi timestamps.YearResolver).
+        """
+        windows = self.state.get(ip)
+        if windows is None:
+            self.state[ip] = [RingWindow(epoch // size, self.slots) for size in self.bucket_seconds]
+            self.seen[ip] = [epoch, epoch]
+            return
+        finest = windows[0]
+        if epoch // self.bucket_seconds[0] == finest.last:
+            # Percorso veloce (raffiche): stesso bucket dell'evento precedente in tutte le
+            # finestre, perché i bucket più larghi sono multipli di quelli più stretti
+            for window in windows:
+                if window.ring is not None:
+                    window.ring[window.last % window.slots] += 1
+                    if window.head is not None and window.last < window.first + window.slots:
+                        window.head[window.last % window.slots] += 1
+                window.total += 1
+                if window.total > window.peak:
+                    window.peak = window.total
+        else:
+            for window, size in zip(windows, self.bucket_seconds):
+                window.add(epoch // size)
+        seen = self.seen[ip]
+        if epoch < seen[0]:
+            seen[0] = epoch
+        elif epoch > seen[1]:
+            seen[1] = epoch
+
+    def add_arrays(self, ip_table, ip_ids, epochs):
+        """
+        Variante vettoriale di add per le colonne di un EventBatch: calcola in NumPy
+        i conteggi per (IP, bucket) e i picchi di ogni finestra, poi costruisce lo
+        stato di ogni IP. Gli IP già presenti vengono uniti con merge.
+
+        Args:
+            ip_table (list): ID -> indirizzo IP.
+            ip_ids (numpy.ndarray): ID dell'IP di ogni evento.
+            epochs (numpy.ndarray): Secondi epoch di ogni evento (-1 se non validi, ignorati).
+        """
+        valid = epochs >= 0
+        ip_ids = np.asarray(ip_ids, dtype=np.int64)[valid]
+        epochs = np.asarray(epochs, dtype=np.int64)[valid]
+        if not epochs.size:
+            return
+        partial = BurstTracker(self.windows, self.slots)
+        per_window = []
+        for size in partial.bucket_seconds:
+            # Chiave ordinabile (IP, bucket): il bucket occupa i 32 bit bassi
+            keys, counts = np.unique((ip_ids << 32) | (epochs // size), return_counts=True)
+            key_ips = keys >> 32
+            buckets = keys & 0xFFFFFFFF
+            # Eventi nei bucket (b - slots, b] dello stesso IP, con le somme cumulative
+            cumulative = np.concatenate(([0], np.cumsum(counts)))
+            starts = np.searchsorted(keys, keys - (self.slots - 1))
+            window_totals = cumulative[1:] - cumulative[starts]
+            ip_starts = np.flatnonzero(np.concatenate(([True], key_ips[1:] != key_ips[:-1])))
+            peaks = np.maximum.reduceat(window_totals, ip_starts)
+            per_window.append((key_ips, buckets, counts, ip_starts, peaks))
+
+        for window_index, (key_ips, buckets, counts, ip_starts, peaks) in enumerate(per_window):
+            ends = np.append(ip_starts[1:], len(key_ips))
+            for ip_id, start, end, peak in zip(key_ips[ip_starts].tolist(), ip_starts.tolist(), ends.tolist(),
+                                               peaks.tolist()):
+                # Bastano i primi e gli ultimi 'slots' bucket di attività (vedi RingWindow.buckets)
+                first_bucket, last_bucket = int(buckets[start]), int(buckets[end - 1])
+                selected = {}
+                for bucket, count in zip(buckets[start:min(end, start + self.slots)].tolist(),
+                                         counts[start:min(end, start + self.slots)].tolist()):
+                    if bucket < first_bucket + self.slots:
+                        selected[bucket] = count
+                for bucket, count in zip(buckets[max(start, end - self.slots):end].tolist(),
+                                         counts[max(start, end - self.slots):end].tolist()):
+                    if bucket > last_bucket - self.slots:
+                        selected[bucket] = count
+                windows = partial.state.setdefault(ip_table[ip_id], [None] * len(self.windows))
+                windows[window_index] = RingWindow.from_buckets(selected, peak, self.slots)
+
+        order = np.argsort(ip_ids, kind="stable")
+        sorted_ids = ip_ids[order]
+        sorted_epochs = epochs[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1])))
+        firsts = np.minimum.reduceat(sorted_epochs, starts)
+        lasts = np.maximum.reduceat(sorted_epochs, starts)
+        for ip_id, first, last in zip(sorted_ids[starts].tolist(), firsts.tolist(), lasts.tolist()):
+            partial.seen[ip_table[ip_id]] = [first, last]
+        self.merge(partial)
+
+    def merge(self, other):
+        """
+        Aggiunge in place le finestre di 'other' (porzione successiva del log).
+        """
+        for ip, windows in other.state.items():
+            current = self.state.get(ip)
+            if current is None:
+                self.state[ip] = windows
+                self.seen[ip] = list(other.seen[ip])
+                continue
+            self.state[ip] = [mine.merged(theirs) for mine, theirs in zip(current, windows)]
+            seen, their_seen = self.seen[ip], other.seen[ip]
+            seen[0] = min(seen[0], their_seen[0])
+            seen[1] = max(seen[1], their_seen[1])
+        return self
+
+    def peaks(self):
+        """
+        Restituisce {IP: (picco finestra 1, picco finestra 2, ...)}, nell'ordine di BURST_WINDOWS.
+        """
+        return {ip: tuple(window.peak for window in windows) for ip, windows in self.state.items()}
+
+    def peak(self, ip, window_index=0):
+        """
+        Restituisce il picco di tentativi dell'IP nella finestra indicata (0 se l'IP non compare).
+        """
+        windows = self.state.get(ip)
+        return windows[window_index].peak if windows else 0
+
+    def time_range(self):
+        """
+        Restituisce (primo, ultimo) istante epoch di attività su tutti gli IP, oppure None.
+        """
+        if not self.seen:
+            return None
+        return min(first for first, _ in self.seen.values()), max(last for _, last in self.seen.values())
+
+
+def top_bursts(tracker, limit=10):
+    """
+    Restituisce gli IP con i picchi più alti, ordinati per picco nella finestra più
+    breve (poi nelle successive): lista di (IP, (picco finestra 1, picco finestra 2, ...)).
+    """
+    if tracker is None:
+        return []
+    peaks = tracker.peaks()
+    return sorted(peaks.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def window_label(seconds):
+    """
+    Etichetta leggibile della durata di una finestra (es. 60 -> '1 min', 3600 -> '1 h').
+    """
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60} min"
+    return f"{seconds} s"
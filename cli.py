@@ -0,0 +1,301 @@
+# cli.py
+# Modalità batch senza interfaccia grafica: analizza molti file di log (es. da cron)
+# eseguendo per ciascuno parsing, aggregazione, rilevamento anomalie, report e
+# salvataggio nel database, con più file elaborati in parallelo.
+
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from instrumentation import RunMetrics, export_prometheus, format_stages
+from progress import AnalysisCancelled
+
+OUTPUT_FORMATS = ("pdf", "json", "csv")
+TOP_IPS = 10  # IP più attivi riportati nei riepiloghi JSON/CSV
+
+_model_store = None  # Archivio dei modelli del processo (creato al primo utilizzo)
+
+
+def expand_inputs(patterns):
+    """
+    Espande una lista di file, cartelle e pattern glob (anche ricorsivi, '**')
+    nella lista dei file di log da analizzare, senza duplicati e nell'ordine dato.
+    """
+    files = []
+    seen = set()
+    for pattern in patterns:
+        found = 0
+        for match in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+            if os.path.isdir(match):
+                candidates = sorted(os.path.join(match, name) for name in os.listdir(match))
+            else:
+                candidates = [match]
+            for path in candidates:
+                if os.path.isfile(path):
+                    found += 1
+                    if path not in seen:
+                        seen.add(path)
+                        files.append(path)
+        if not found:
+            print(f"Nessun file di log trovato per: {pattern}", file=sys.stderr)
+    return files
+
+
+def get_model_store():
+    """
+    Restituisce l'archivio dei modelli addestrati (model_store.ModelStore) del processo.
+    Tutti i processi usano la stessa cartella: il modello addestrato su un log viene
+    riutilizzato dalle analisi successive dello stesso log finché resta valido.
+    """
+    global _model_store
+    if _model_store is None:
+        from model_store import ModelStore
+        _model_store = ModelStore()
+    return _model_store
+
+
+def init_worker():
+    # Il parallelismo è tra i file: i grafici di ogni report vengono disegnati nel worker stesso
+    import report_generator
+    report_generator.CHART_WORKERS = 1
+
+
+def analyze_file(task):
+    """
+    Esegue l'intera pipeline su un file (usata dai processi worker).
+
+    Args:
+        task (tuple): (percorso, formato di output, cartella di output, usa la cache,
+            restituisci il riepilogo, profila con cProfile, modalità approssimata,
+            avanzamento progress.Progress creato con un Manager o None, processi
+            per il parsing del file: un numero o un parallel_engine.WorkerBudget,
+            analizza l'intera rotazione del file: opzionale, default False).
+            Con la rotazione il percorso è il file corrente (es. /var/log/auth.log) e
+            i file ruotati (auth.log.1, auth.log.2.gz, ...) formano un unico log, senza cache.
+            Se solo il report non può essere generato, i risultati dell'analisi restano
+            validi: 'error' lo segnala e 'report_failed' è True.
+
+    Returns:
+        dict: Risultato con riepilogo sintetico, anomalie, percorso del report, tempo,
+            misure per fase ('metrics') ed eventuale errore ('cancelled' se annullata).
+    """
+    filepath, output_format, output_dir, use_cache, keep_summary, profile, approximate, progress, workers = task[:9]
+    rotation_set = len(task) > 9 and task[9]
+    start = time.perf_counter()
+    result = {"file": filepath, "events": 0, "distinct_ips": 0, "top_ips": [], "hourly": {},
+              "anomalies": [], "report": None, "seconds": 0.0, "error": None}
+    metrics = RunMetrics(filepath, profile)
+    # I messaggi diagnostici vanno su stderr: stdout resta libero per il JSON/CSV
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            from analyzer import distinct_ips, total_events
+            from model import detect_anomalies
+            from parallel_engine import analyze_parallel, analyze_rotation_set, borrowed_workers
+            with metrics.stage("parse_aggregate") as stage, borrowed_workers(workers) as parse_workers:
+                scan = {}
+                if rotation_set:
+                    summary = analyze_rotation_set(filepath, parse_workers, approximate, progress)
+                    scan["lines"] = summary.get("lines")
+                elif use_cache:
+                    from summary_cache import SummaryCache
+                    summary, _ = SummaryCache(workers=parse_workers, approximate=approximate).analyze(filepath, scan,
+                                                                                                     progress)
+                else:
+                    summary = analyze_parallel(filepath, workers=parse_workers, approximate=approximate,
+                                               progress=progress)
+                    scan["lines"] = summary.get("lines")
+                stage.count(lines=scan.get("lines"), events=total_events(summary))
+            if progress is not None:
+                progress.finish()
+                progress.check()
+
+            ip_counter = summary["ip_counter"]
+            with metrics.stage("detect_anomalies"):
+                anomalies = detect_anomalies(summary, store=get_model_store(), source=filepath) if ip_counter else []
+            result.update({
+                "events": total_events(summary),
+                "distinct_ips": distinct_ips(summary),
+                "top_ips": ip_counter.most_common(TOP_IPS),
+                "hourly": {hour: summary["hourly_counter"].get(hour, 0) for hour in range(24)},
+                "anomalies": anomalies,
+            })
+            if summary.get("sketch") is not None:
+                result["error_bounds"] = summary["sketch"].error_bounds()
+
+            if output_format == "pdf" and ip_counter:
+                if progress is not None:
+                    progress.check()
+                from report_cache import ReportCache
+                name = os.path.basename(filepath).replace(os.sep, "_")
+                pdf_filename = os.path.join(
+                    output_dir, f"report_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.pdf")
+                with metrics.stage("report"):
+                    report_failed = ReportCache().generate(summary, anomalies, pdf_filename) == "error"
+                if report_failed:
+                    result["error"] = "generazione del report PDF non riuscita"
+                    result["report_failed"] = True
+                else:
+                    result["report"] = pdf_filename
+
+            if keep_summary:
+                result["summary"] = summary
+        except AnalysisCancelled:
+            result["error"] = "analisi annullata"
+            result["cancelled"] = True
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["metrics"] = metrics.finish()
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def run_batch(files, jobs=None, output_format="pdf", output_dir="output", use_cache=True, save_to_db=True,
+              profile=False, approximate=None, rotation_set=False):
+    """
+    Analizza tutti i file con 'jobs' processi in parallelo (i file più grandi partono
+    per primi) e, se richiesto, salva i risultati nel database tramite il writer in
+    background (scritture raggruppate in transazioni, journal se il database non risponde).
+    Le misure per fase di ogni file vengono esportate per Prometheus e salvate con lo storico.
+    Con 'approximate' (default sketches.APPROXIMATE) i riepiloghi sono calcolati a memoria
+    fissa e i risultati riportano i limiti di errore in 'error_bounds'.
+    Con 'rotation_set' ogni file è il file corrente di una rotazione, analizzata per intera
+    come un unico log (vedi parallel_engine.analyze_rotation_set); i processi disponibili
+    vengono divisi tra le rotazioni.
+
+    Returns:
+        list: Risultati di analyze_file, nello stesso ordine di 'files'.
+    """
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    os.makedirs(output_dir, exist_ok=True)
+    if approximate is None:
+        import sketches
+        approximate = sketches.APPROXIMATE
+    workers = max(1, jobs // len(files)) if rotation_set and files else 1
+    tasks = [(path, output_format, output_dir, use_cache, save_to_db, profile or None, approximate, None, workers,
+              rotation_set)
+             for path in files]
+    results = [None] * len(tasks)
+
+    writer = None
+    if save_to_db:
+        from db_writer import DatabaseWriter
+        from storage import get_storage
+        get_storage().init()
+        writer = DatabaseWriter()
+
+    def collect(index, result):
+        results[index] = result
+        done = sum(1 for item in results if item is not None)
+        status = result["error"] or f"{result['events']} eventi, {len(result['anomalies'])} anomalie"
+        print(f"[{done}/{len(tasks)}] {result['file']}: {status} - {format_stages(result['metrics'])}", file=sys.stderr)
+        if result["metrics"]["profile_path"]:
+            print(f"    profilo cProfile: {result['metrics']['profile_path']}", file=sys.stderr)
+        summary = result.pop("summary", None)
+        export_prometheus(result["metrics"])
+        if writer and not result["error"] and result["events"]:
+            writer.submit(result["anomalies"], summary["ip_counter"], result["file"], result["report"] or "", summary,
+                          result["metrics"])
+
+    order = sorted(range(len(tasks)), key=lambda i: os.path.getsize(files[i]), reverse=True)
+    try:
+        if jobs == 1 or len(tasks) <= 1:
+            init_worker()
+            for index in order:
+                collect(index, analyze_file(tasks[index]))
+        else:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), initializer=init_worker) as executor:
+                futures = {executor.submit(analyze_file, tasks[index]): index for index in order}
+                for future in as_completed(futures):
+                    collect(futures[future], future.result())
+    finally:
+        if writer:
+            writer.close() # Completa le scritture in coda (o le sposta nel journal)
+    return results
+
+
+def write_summaries(results, output_format, stream):
+    """
+    Scrive i risultati in formato JSON (un documento con tutti i file) o CSV (una riga per file).
+    """
+    if output_format == "json":
+        json.dump(results, stream, indent=2, default=str) # default=str: date del record delle misure
+        stream.write("\n")
+        return
+    writer = csv.writer(stream)
+    writer.writerow(["file", "events", "distinct_ips", "anomalies", "top_ip", "top_ip_attempts",
+                     "report", "seconds", "error"])
+    for result in results:
+        top_ip, top_attempts = result["top_ips"][0] if result["top_ips"] else ("", 0)
+        writer.writerow([result["file"], result["events"], result["distinct_ips"], " ".join(result["anomalies"]),
+                         top_ip, top_attempts, result["report"] or "", result["seconds"], result["error"] or ""])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Analizza in batch file di log di sicurezza senza interfaccia grafica.")
+    parser.add_argument("inputs", nargs="+", help="File, cartelle o pattern glob (es. '/srv/logs/**/auth.log*')")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="File analizzati in parallelo (default: numero di core)")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="pdf",
+                        help="pdf: report PDF per file; json/csv: solo riepilogo (percorso veloce)")
+    parser.add_argument("-o", "--output", help="File del riepilogo JSON/CSV (default: stdout)")
+    parser.add_argument("--output-dir", default="output", help="Cartella dei report PDF")
+    parser.add_argument("--no-db", action="store_true", help="Non salvare i risultati nel database")
+    parser.add_argument("--no-cache", action="store_true", help="Non usare la cache dei riepiloghi")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profila ogni analisi con cProfile (profili in output/profiles)")
+    parser.add_argument("--approximate", action="store_true", default=None,
+                        help="Modalità approssimata a memoria fissa per log con moltissimi IP distinti "
+                             "(IP più attivi e conteggi distinti stimati, con limiti di errore)")
+    parser.add_argument("--rotation-set", action="store_true",
+                        help="Ogni file indicato è il file corrente di una rotazione (es. /var/log/auth.log): "
+                             "analizza insieme anche i file ruotati (auth.log.1, auth.log.2.gz, ...) come un unico log")
+    return parser
+
+
+def main(argv=None):
+    """
+    Punto di ingresso della modalità batch. Restituisce il codice di uscita
+    (0 se tutti i file sono stati analizzati, 1 altrimenti).
+    """
+    args = build_parser().parse_args(argv)
+    files = expand_inputs(args.inputs)
+    if args.rotation_set:
+        # I file ruotati indicati esplicitamente (es. con 'auth.log*') fanno già parte della rotazione
+        from parallel_engine import expand_rotation_set
+        rotated = {path for filepath in files for path in expand_rotation_set(filepath)[:-1]}
+        files = [filepath for filepath in files if filepath not in rotated]
+    if not files:
+        print("Nessun file da analizzare.", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    # I messaggi diagnostici (anche del writer in background) vanno su stderr: stdout resta per il JSON/CSV
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run_batch(files, args.jobs, args.format, args.output_dir,
+                            use_cache=not args.no_cache, save_to_db=not args.no_db, profile=args.profile,
+                            approximate=args.approximate, rotation_set=args.rotation_set)
+    elapsed = time.perf_counter() - start
+
+    if args.format != "pdf" or args.output:
+        if args.output:
+            with open(args.output, "w", newline="", encoding="utf-8") as stream:
+                write_summaries(results, "csv" if args.format == "csv" else "json", stream)
+        else:
+            write_summaries(results, args.format, sys.stdout)
+
+    failed = sum(1 for result in results if result["error"])
+    print(f"{len(results)} file analizzati in {elapsed:.2f} s "
+          f"({len(results) / elapsed * 60:.1f} file/minuto), {failed} errori.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,117 @@
 # database.py
 
 import mysql.connector
+from mysql.connector import pooling
+from contextlib import contextmanager
 from datetime import datetime
+import csv
+import tempfile
+import threading
+import time
 import os
-from db_config import DB_CONFIG # Importa le configurazioni del database
+from db_config import DB_CONFIG, DB_POOL_CONFIG, DB_BULK_CONFIG # Importa le configurazioni del database
+from instrumentation import measure
+from storage import (ANALYSIS_METRICS_COLUMNS, HISTORY_PAGE_SIZE, IP_STATS_COLUMNS, analysis_metrics_rows,
+                     analysis_record, analysis_rows, ip_stats_rows)
+
+_pool = None                  # Pool di connessioni condiviso (creato al primo utilizzo)
+_pool_lock = threading.Lock() # Protegge la creazione del pool tra thread diversi
+_load_data_dir = None         # Unica cartella da cui LOAD DATA LOCAL INFILE può leggere (se attivo)
+
+def get_pool():
+    """
+    Restituisce il pool di connessioni MySQL, creandolo al primo utilizzo.
+    Restituisce:
+        pool: oggetto MySQLConnectionPool.
+    """
+    global _pool, _load_data_dir
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                options = {}
+                if DB_BULK_CONFIG['load_data_threshold'] is not None:
+                    # LOAD DATA LOCAL INFILE limitato ai CSV temporanei di _load_data_infile:
+                    # il server non può chiedere al client altri file locali
+                    _load_data_dir = tempfile.mkdtemp(prefix="log_analyzer_load_data_")
+                    options['allow_local_infile_in_path'] = _load_data_dir
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=DB_POOL_CONFIG['pool_name'],
+                    pool_size=DB_POOL_CONFIG['pool_size'],
+                    **options,
+                    **DB_CONFIG
+                )
+    return _pool
 
 def get_db_connection():
     """
-    Stabilisce e restituisce una connessione al database MySQL.
+    Preleva una connessione dal pool MySQL, verificandone lo stato (health check)
+    e ristabilendola se è scaduta. Se il pool è esaurito attende che si liberi una
+    connessione, fino a DB_POOL_CONFIG['acquire_timeout'] secondi.
+    La chiamata a conn.close() restituisce la connessione al pool.
     Restituisce:
         conn: oggetto di connessione MySQL o None in caso di errore.
     """
+    deadline = time.monotonic() + DB_POOL_CONFIG.get('acquire_timeout', 10)
+    while True:
+        try:
+            conn = get_pool().get_connection()
+        except mysql.connector.errors.PoolError as err:
+            # Pool esaurito: riprova finché non scade il tempo di attesa
+            if time.monotonic() >= deadline:
+                print(f"Errore di connessione al database: {err}")
+                return None
+            time.sleep(0.05)
+            continue
+        except mysql.connector.Error as err:
+            print(f"Errore di connessione al database: {err}")
+            return None
+
+        try:
+            # Health check: riconnette le connessioni chiuse dal server (es. wait_timeout)
+            conn.ping(reconnect=True, attempts=2, delay=0)
+            return conn
+        except mysql.connector.Error as err:
+            print(f"Errore di connessione al database: {err}")
+            conn.close()
+            return None
+
+@contextmanager
+def transaction():
+    """
+    Unità di lavoro: fornisce un cursore su una connessione del pool ed esegue
+    tutte le istruzioni in un'unica transazione. Al termine del blocco 'with'
+    esegue il commit; in caso di eccezione esegue il rollback e rilancia l'errore.
+
+    Esempio:
+        with transaction() as cursor:
+            cursor.execute(...)
+            cursor.execute(...)
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise mysql.connector.Error(msg="Nessuna connessione al database disponibile")
+    cursor = conn.cursor()
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Errore di connessione al database: {err}")
-        return None
+        conn.start_transaction()
+        yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close() # Restituisce la connessione al pool
 
 def init_db():
     """
     Inizializza il database creando le tabelle necessarie se non esistono.
-    Vengono create due tabelle:
+    Vengono create quattro tabelle:
     - anomalies: per memorizzare gli IP anomali rilevati.
     - analysis_history: per memorizzare lo storico delle analisi, inclusi i percorsi dei log e dei PDF.
+    - ip_stats: per memorizzare le statistiche di ogni IP (tentativi, prima/ultima
+      attività, distribuzione oraria) per ciascun file di log analizzato.
+    - analysis_metrics: per memorizzare le misure di ogni fase di un'analisi (tempo,
+      CPU, memoria, righe lette, eventi, righe scritte), collegate allo storico.
     """
     conn = get_db_connection()
     if conn:
@@ -47,6 +135,40 @@ def init_db():
                     analysis_datetime DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            # Tabella delle statistiche per IP (una riga per coppia file di log / IP)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ip_stats (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    log_filepath VARCHAR(255) NOT NULL,
+                    ip VARCHAR(45) NOT NULL,
+                    attempts INT NOT NULL,
+                    first_seen DATETIME NULL,
+                    last_seen DATETIME NULL,
+                    distinct_users INT NOT NULL DEFAULT 0,
+                    hour_histogram VARCHAR(255) NOT NULL,
+                    UNIQUE KEY uq_ip_stats_log_ip (log_filepath, ip)
+                )
+            """)
+            # Tabella delle misure per fase (una riga per fase di ogni analisi)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_metrics (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    analysis_id INT NOT NULL,
+                    run_id CHAR(32) NOT NULL,
+                    stage_order INT NOT NULL,
+                    stage VARCHAR(64) NOT NULL,
+                    wall_seconds DOUBLE NOT NULL,
+                    cpu_seconds DOUBLE NULL,
+                    peak_rss_mb DOUBLE NULL,
+                    lines_read BIGINT NULL,
+                    events BIGINT NULL,
+                    rows_written BIGINT NULL,
+                    error VARCHAR(255) NULL,
+                    KEY idx_metrics_analysis (analysis_id, stage_order),
+                    KEY idx_metrics_stage (stage, analysis_id)
+                )
+            """)
+            migrate_schema(cursor)
             conn.commit()
             print("Database MySQL inizializzato con successo.")
         except mysql.connector.Error as err:
@@ -55,6 +177,191 @@ def init_db():
             cursor.close()
             conn.close()
 
+# Migrazioni dello schema, applicate in ordine da migrate_schema.
+# Ogni voce: (versione, descrizione, lista di (tabella, indice, colonne)).
+SCHEMA_MIGRATIONS = [
+    (1, "Indici per IP, data delle anomalie e data delle analisi", [
+        ("anomalies", "idx_anomalies_ip", "ip, log_date, id"),
+        ("anomalies", "idx_anomalies_log_date", "log_date, id"),
+        ("analysis_history", "idx_history_datetime", "analysis_datetime, id"),
+    ]),
+]
+
+def _index_exists(cursor, table, index):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, index)
+    )
+    return cursor.fetchone()[0] > 0
+
+def migrate_schema(cursor):
+    """
+    Porta lo schema all'ultima versione applicando le migrazioni mancanti.
+    La versione corrente è registrata nella tabella schema_version; ogni indice
+    viene creato solo se non esiste già, quindi la migrazione è ripetibile.
+    Restituisce:
+        version (int): Versione dello schema dopo la migrazione.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    current = cursor.fetchone()[0]
+    for version, description, indexes in SCHEMA_MIGRATIONS:
+        if version <= current:
+            continue
+        for table, index, columns in indexes:
+            if not _index_exists(cursor, table, index):
+                cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+        cursor.execute(
+            "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+            (version, description)
+        )
+        print(f"Migrazione dello schema alla versione {version}: {description}")
+        current = version
+    return current
+
+def drop_tables():
+    """
+    Elimina tutte le tabelle dell'applicazione (usata dal reset; init_db le ricrea).
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        if conn is None:
+            raise mysql.connector.Error(msg="Nessuna connessione al database disponibile")
+        cursor = conn.cursor()
+
+        # Elimina le tabelle se esistono
+        cursor.execute("DROP TABLE IF EXISTS anomalies")
+        cursor.execute("DROP TABLE IF EXISTS analysis_history")
+        cursor.execute("DROP TABLE IF EXISTS ip_stats")
+        cursor.execute("DROP TABLE IF EXISTS analysis_metrics")
+        cursor.execute("DROP TABLE IF EXISTS schema_version") # Gli indici vengono ricreati da init_db
+        conn.commit()
+        print("🗑️ Tabelle database MySQL eliminate.")
+
+    except mysql.connector.Error as err:
+        print(f"Errore durante il reset del database: {err}")
+    finally:
+        # Chiude il cursore e la connessione se sono stati aperti
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+def _insert_batches(cursor, table, columns, rows, update_columns=None, batch_size=None):
+    """
+    Inserisce le righe con istruzioni INSERT multi-riga (VALUES (...), (...), ...),
+    'batch_size' righe per istruzione. Se 'update_columns' è indicato, le righe già
+    presenti (stessa chiave univoca) vengono aggiornate (upsert).
+    """
+    batch_size = batch_size or DB_BULK_CONFIG['batch_size']
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    suffix = ""
+    if update_columns:
+        suffix = " ON DUPLICATE KEY UPDATE " + ", ".join(f"{column} = VALUES({column})" for column in update_columns)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        cursor.execute(
+            statement + ", ".join([placeholders] * len(batch)) + suffix,
+            [value for row in batch for value in row]
+        )
+
+def _load_data_infile(cursor, table, columns, rows, replace=False):
+    """
+    Carica le righe con LOAD DATA LOCAL INFILE da un file CSV temporaneo.
+    Con 'replace' le righe con la stessa chiave univoca vengono sostituite (upsert).
+    """
+    if _load_data_dir is None:
+        raise mysql.connector.errors.NotSupportedError("LOAD DATA LOCAL INFILE non abilitato")
+    with tempfile.NamedTemporaryFile('w', newline='', encoding='utf-8', suffix='.csv', delete=False,
+                                     dir=_load_data_dir) as file:
+        writer = csv.writer(file, lineterminator='\n')
+        for row in rows:
+            # \N = NULL; il backslash è il carattere di escape di LOAD DATA e va raddoppiato
+            writer.writerow(['\\N' if value is None else value.replace('\\', '\\\\') if isinstance(value, str)
+                             else value for value in row])
+        csv_path = file.name
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s {'REPLACE ' if replace else ''}INTO TABLE {table} "
+            "CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            f"LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+            (csv_path,)
+        )
+    finally:
+        os.remove(csv_path)
+
+def bulk_write(cursor, table, columns, rows, update_columns=None, batch_size=None, load_data_threshold=None):
+    """
+    Scrive molte righe in una tabella con il minor numero possibile di round-trip:
+    INSERT multi-riga a blocchi di 'batch_size' righe oppure, oltre 'load_data_threshold'
+    righe, LOAD DATA LOCAL INFILE da un CSV temporaneo (con ripiego sugli INSERT se
+    il server non lo consente). Non esegue il commit.
+    Args:
+        cursor: Cursore della transazione corrente.
+        table (str): Nome della tabella.
+        columns (list): Nomi delle colonne, nell'ordine dei valori di ogni riga.
+        rows (list): Lista di tuple di valori.
+        update_columns (list): Colonne da aggiornare in caso di chiave duplicata (upsert).
+        batch_size (int): Righe per istruzione INSERT (default DB_BULK_CONFIG['batch_size']).
+        load_data_threshold (int): Soglia per LOAD DATA (default DB_BULK_CONFIG['load_data_threshold'],
+            None per disattivarlo).
+    """
+    if not rows:
+        return
+    if load_data_threshold is None:
+        load_data_threshold = DB_BULK_CONFIG['load_data_threshold']
+    if load_data_threshold is not None and len(rows) >= load_data_threshold:
+        try:
+            _load_data_infile(cursor, table, columns, rows, replace=bool(update_columns))
+            return
+        except mysql.connector.Error as err:
+            print(f"LOAD DATA non disponibile ({err}), uso INSERT multi-riga.")
+    _insert_batches(cursor, table, columns, rows, update_columns, batch_size)
+
+def _insert_anomalies(cursor, anomalies, ip_counter, log_date=None):
+    """
+    Inserisce gli IP anomali usando il cursore fornito (senza commit).
+    """
+    log_date = (log_date or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(ip, ip_counter.get(ip, 0), log_date) for ip in anomalies]
+    bulk_write(cursor, "anomalies", ("ip", "attempts", "log_date"), rows)
+
+def _upsert_ip_stats(cursor, summary, log_filepath):
+    """
+    Scrive (o aggiorna, se il log era già stato analizzato) le statistiche di tutti gli IP.
+    """
+    bulk_write(cursor, "ip_stats", IP_STATS_COLUMNS, ip_stats_rows(summary, log_filepath),
+               update_columns=IP_STATS_COLUMNS[2:])
+
+def _insert_analysis_history(cursor, log_filepath, pdf_output_filepath, analysis_datetime=None):
+    """
+    Inserisce una riga nello storico analisi usando il cursore fornito (senza commit).
+    Se 'analysis_datetime' non è indicato viene usata la data/ora del server.
+    Restituisce:
+        analysis_id (int): Id della riga inserita.
+    """
+    if analysis_datetime is None:
+        cursor.execute(
+            "INSERT INTO analysis_history (log_filepath, pdf_output_filepath) VALUES (%s, %s)",
+            (log_filepath, pdf_output_filepath)
+        )
+    else:
+        cursor.execute(
+            "INSERT INTO analysis_history (log_filepath, pdf_output_filepath, analysis_datetime) VALUES (%s, %s, %s)",
+            (log_filepath, pdf_output_filepath, analysis_datetime)
+        )
+    return cursor.lastrowid
+
 def save_anomalies(anomalies, ip_counter):
     """
     Salva gli IP anomali rilevati nel database MySQL.
@@ -62,24 +369,12 @@ def save_anomalies(anomalies, ip_counter):
         anomalies (list): Lista di IP anomali.
         ip_counter (Counter): Counter con il numero di tentativi per ogni IP.
     """
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        log_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        try:
-            for ip in anomalies:
-                attempts = ip_counter.get(ip, 0)
-                cursor.execute(
-                    "INSERT INTO anomalies (ip, attempts, log_date) VALUES (%s, %s, %s)",
-                    (ip, attempts, log_date)
-                )
-            conn.commit()
-            print("Anomalie salvate nel database MySQL.")
-        except mysql.connector.Error as err:
-            print(f"Errore durante il salvataggio delle anomalie: {err}")
-        finally:
-            cursor.close()
-            conn.close()
+    try:
+        with transaction() as cursor:
+            _insert_anomalies(cursor, anomalies, ip_counter)
+        print("Anomalie salvate nel database MySQL.")
+    except mysql.connector.Error as err:
+        print(f"Errore durante il salvataggio delle anomalie: {err}")
 
 def save_analysis_history(log_filepath, pdf_output_filepath):
     """
@@ -89,21 +384,77 @@ def save_analysis_history(log_filepath, pdf_output_filepath):
         log_filepath (str): Percorso del file di log analizzato.
         pdf_output_filepath (str): Percorso del PDF generato.
     """
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO analysis_history (log_filepath, pdf_output_filepath) VALUES (%s, %s)",
-                (log_filepath, pdf_output_filepath)
-            )
-            conn.commit()
-            print("Storico analisi salvato nel database MySQL.")
-        except mysql.connector.Error as err:
-            print(f"Errore durante il salvataggio dello storico analisi: {err}")
-        finally:
-            cursor.close()
-            conn.close()
+    try:
+        with transaction() as cursor:
+            _insert_analysis_history(cursor, log_filepath, pdf_output_filepath)
+        print("Storico analisi salvato nel database MySQL.")
+    except mysql.connector.Error as err:
+        print(f"Errore durante il salvataggio dello storico analisi: {err}")
+
+def save_ip_stats(summary, log_filepath):
+    """
+    Salva nel database MySQL le statistiche di tutti gli IP di un'analisi
+    (scrittura in blocco con upsert).
+    Args:
+        summary (dict): Riepilogo prodotto da analyze_events.
+        log_filepath (str): Percorso del file di log analizzato.
+    """
+    try:
+        with transaction() as cursor:
+            _upsert_ip_stats(cursor, summary, log_filepath)
+        print("Statistiche per IP salvate nel database MySQL.")
+    except mysql.connector.Error as err:
+        print(f"Errore durante il salvataggio delle statistiche per IP: {err}")
+
+def write_analyses(analyses):
+    """
+    Scrive più analisi in un'unica transazione (usata dal writer in background per
+    raggruppare le scritture). A differenza di save_analysis, in caso di errore
+    rilancia l'eccezione, così il chiamante può ritentare.
+    Se l'analisi ha un record di misure ('metrics'), la scrittura viene misurata come
+    fase 'db_write' e tutte le fasi sono salvate in analysis_metrics.
+    Args:
+        analyses (list): Dizionari con chiavi 'anomalies', 'ip_counter', 'log_filepath',
+            'pdf_output_filepath' e (opzionali) 'summary', 'analysis_datetime'
+            (data/ora dell'analisi, per le scritture differite) e 'metrics'.
+    """
+    with transaction() as cursor:
+        for analysis in analyses:
+            analysis_datetime = analysis.get("analysis_datetime")
+            metrics = analysis.get("metrics")
+            # I tentativi non riusciti restano nel record come fasi 'db_write' con errore
+            with measure("db_write", metrics["stages"] if metrics else None) as stage:
+                _insert_anomalies(cursor, analysis["anomalies"], analysis["ip_counter"], analysis_datetime)
+                analysis_id = _insert_analysis_history(cursor, analysis["log_filepath"],
+                                                       analysis["pdf_output_filepath"], analysis_datetime)
+                if analysis.get("summary") is not None:
+                    _upsert_ip_stats(cursor, analysis["summary"], analysis["log_filepath"])
+                stage.count(rows=analysis_rows(analysis))
+            if metrics:
+                bulk_write(cursor, "analysis_metrics", ANALYSIS_METRICS_COLUMNS,
+                           analysis_metrics_rows(analysis_id, metrics))
+
+def save_analysis(anomalies, ip_counter, log_filepath, pdf_output_filepath, summary=None):
+    """
+    Salva in un'unica transazione le anomalie e la riga di storico di un'analisi
+    (e, se fornito il riepilogo, le statistiche di tutti gli IP):
+    o vengono scritte tutte, o nessuna.
+    Args:
+        anomalies (list): Lista di IP anomali.
+        ip_counter (Counter): Counter con il numero di tentativi per ogni IP.
+        log_filepath (str): Percorso del file di log analizzato.
+        pdf_output_filepath (str): Percorso del PDF generato.
+        summary (dict): Riepilogo di analyze_events per la tabella ip_stats (opzionale).
+    Restituisce:
+        bool: True se il salvataggio è andato a buon fine.
+    """
+    try:
+        write_analyses([analysis_record(anomalies, ip_counter, log_filepath, pdf_output_filepath, summary)])
+        print("Anomalie e storico analisi salvati nel database MySQL.")
+        return True
+    except mysql.connector.Error as err:
+        print(f"Errore durante il salvataggio dell'analisi: {err}")
+        return False
 
 def get_analysis_history():
     """
@@ -123,4 +474,90 @@ def get_analysis_history():
         finally:
             cursor.close()
             conn.close()
-    return history
\ No newline at end of file
+    return history
+
+def _fetch_page(query, params):
+    conn = get_db_connection()
+    rows = []
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"Errore durante il recupero dei dati: {err}")
+        finally:
+            cursor.close()
+            conn.close()
+    return rows
+
+def get_analysis_history_page(after=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Recupera una pagina dello storico delle analisi, dalla più recente, con
+    paginazione a chiave (keyset): il costo non dipende dalla posizione della pagina
+    perché la query usa l'indice su (analysis_datetime, id) invece di OFFSET.
+    Args:
+        after (tuple): Chiave (analysis_datetime, id) dell'ultima riga della pagina
+            precedente; None per la prima pagina.
+        limit (int): Numero massimo di righe della pagina.
+    Restituisce:
+        rows (list): Lista di dizionari (righe di analysis_history).
+        next_key (tuple): Chiave da passare come 'after' per la pagina successiva,
+            oppure None se non ci sono altre righe.
+    """
+    query = "SELECT id, log_filepath, pdf_output_filepath, analysis_datetime FROM analysis_history"
+    params = []
+    if after is not None:
+        query += " WHERE analysis_datetime < %s OR (analysis_datetime = %s AND id < %s)"
+        params = [after[0], after[0], after[1]]
+    query += " ORDER BY analysis_datetime DESC, id DESC LIMIT %s"
+    rows = _fetch_page(query, params + [limit + 1]) # Una riga in più per sapere se esiste la pagina successiva
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]['analysis_datetime'], rows[-1]['id'])
+
+def get_anomalies_page(after=None, limit=HISTORY_PAGE_SIZE, ip=None):
+    """
+    Recupera una pagina delle anomalie salvate, dalla più recente, con paginazione
+    a chiave su (log_date, id); se 'ip' è indicato filtra per IP (indice su ip).
+    Args:
+        after (tuple): Chiave (log_date, id) dell'ultima riga della pagina precedente.
+        limit (int): Numero massimo di righe della pagina.
+        ip (str): IP da cercare (opzionale).
+    Restituisce:
+        rows (list): Lista di dizionari (righe di anomalies).
+        next_key (tuple): Chiave per la pagina successiva, oppure None.
+    """
+    query = "SELECT id, ip, attempts, log_date FROM anomalies"
+    conditions = []
+    params = []
+    if ip is not None:
+        conditions.append("ip = %s")
+        params.append(ip)
+    if after is not None:
+        conditions.append("(log_date < %s OR (log_date = %s AND id < %s))")
+        params += [after[0], after[0], after[1]]
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY log_date DESC, id DESC LIMIT %s"
+    rows = _fetch_page(query, params + [limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]['log_date'], rows[-1]['id'])
+
+def get_analysis_metrics(analysis_id):
+    """
+    Recupera le misure per fase di un'analisi (tabella analysis_metrics).
+    Args:
+        analysis_id (int): Id della riga di analysis_history.
+    Restituisce:
+        rows (list): Lista di dizionari, una riga per fase nell'ordine di esecuzione
+            (l'ultima è il totale).
+    """
+    return _fetch_page(
+        f"SELECT {', '.join(ANALYSIS_METRICS_COLUMNS)} FROM analysis_metrics "
+        "WHERE analysis_id = %s ORDER BY stage_order",
+        (analysis_id,)
+    )
@@ -2,9 +2,44 @@
 # Questo file contiene le configurazioni per la connessione al database MySQL.
 # Modifica i valori di 'user', 'password' e 'database' in base alla tua installazione locale di MySQL.
 
+# Backend di persistenza: 'mysql' (server MySQL, configurato sotto) oppure 'sqlite'
+# (file locale, nessun server necessario)
+STORAGE_BACKEND = 'mysql'
+
+# Configurazione del backend SQLite
+SQLITE_CONFIG = {
+    'path': 'security_logs.db',   # File del database
+    'busy_timeout': 5000          # Millisecondi di attesa se il database è bloccato da un altro processo
+}
+
 DB_CONFIG = {
     'host': 'localhost',      # Indirizzo del server MySQL (di solito 'localhost')
     'user': 'user',           # Nome utente MySQL
     'password': 'password',   # Password dell'utente MySQL
     'database': 'security_logs_db'  # Nome del database
-}
\ No newline at end of file
+}
+
+# Configurazione del pool di connessioni (riutilizzate tra le operazioni invece di
+# aprire una nuova connessione TCP ad ogni chiamata)
+DB_POOL_CONFIG = {
+    'pool_name': 'security_logs_pool',  # Nome del pool
+    'pool_size': 5,                     # Numero massimo di connessioni aperte (max 32)
+    'acquire_timeout': 10               # Secondi di attesa massima per una connessione libera
+}
+
+# Configurazione delle scritture in blocco (anomalie e statistiche per IP)
+DB_BULK_CONFIG = {
+    'batch_size': 1000,              # Righe per ogni istruzione INSERT multi-riga
+    'load_data_threshold': None      # Oltre questo numero di righe usa LOAD DATA LOCAL INFILE (None = mai, es. 50000)
+}
+
+# Configurazione del writer in background (scritture asincrone e raggruppate)
+DB_WRITER_CONFIG = {
+    'queue_size': 100,                    # Analisi in attesa di scrittura (oltre si passa al journal)
+    'batch_size': 20,                     # Analisi scritte in un'unica transazione
+    'max_retries': 3,                     # Tentativi prima di spostare un lotto nel journal
+    'backoff_base': 0.5,                  # Attesa iniziale tra due tentativi (secondi, raddoppia)
+    'backoff_max': 30.0,                  # Attesa massima tra due tentativi (secondi)
+    'close_timeout': 30.0,                # Attesa massima (s) delle scritture in coda all'uscita del programma
+    'journal_path': 'journal/pending_writes.journal'  # Journal su disco delle scritture non riuscite
+}
@@ -0,0 +1,298 @@
+# db_writer.py
+# Writer in background per il database: le analisi vengono accodate e scritte da un
+# thread dedicato, così la latenza (o l'indisponibilità) di MySQL non rallenta l'analisi.
+
+import atexit
+import os
+import pickle
+import queue
+import threading
+import time
+from datetime import datetime
+
+from db_config import DB_WRITER_CONFIG
+from instrumentation import export_prometheus
+from storage import analysis_record, get_storage
+
+_STOP = object()  # Sentinella che termina il thread di scrittura
+
+
+class DatabaseWriter:
+    """
+    Scrittore asincrono delle analisi nel database.
+    - submit() accoda l'analisi e ritorna subito; se la coda è piena l'analisi
+      viene scritta direttamente nel journal su disco (l'analisi non si blocca mai).
+    - Il thread di scrittura raggruppa fino a batch_size analisi in un'unica
+      transazione e, in caso di errore, ritenta con attesa esponenziale.
+    - Se il database resta irraggiungibile, il lotto viene salvato nel journal e
+      riscritto (replay) appena il database torna disponibile.
+    - close() (chiamata anche all'uscita del programma, con attesa limitata) svuota la
+      coda: ciò che non può essere scritto resta nel journal per l'avvio successivo.
+      Le analisi inviate dopo close() vanno direttamente nel journal.
+    - discard_journal() elimina il journal (es. prima di un reset del database).
+    """
+
+    def __init__(self, config=None, write=None):
+        config = {**DB_WRITER_CONFIG, **(config or {})}
+        self.batch_size = config['batch_size']
+        self.max_retries = config['max_retries']
+        self.backoff_base = config['backoff_base']
+        self.backoff_max = config['backoff_max']
+        self.journal_path = config['journal_path']
+        self._write = write or get_storage().write_analyses
+
+        self._queue = queue.Queue(maxsize=config['queue_size'])
+        self._journal_lock = threading.Lock()
+        self._write_lock = threading.RLock() # Tenuto durante la scrittura di un lotto o un replay
+        self._pending = 0                    # Analisi accodate non ancora elaborate
+        self._pending_done = threading.Condition()
+        self._backoff = 0.0          # Attesa corrente prima del prossimo replay del journal
+        self._next_replay = 0.0      # Istante (monotonic) del prossimo tentativo di replay
+        self._closed = False
+        self._close_lock = threading.Lock()  # Serializza submit() e la chiusura
+        self._recover_replay()
+
+        self._thread = threading.Thread(target=self._run, name="DatabaseWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close, config['close_timeout'])
+
+    def submit(self, anomalies, ip_counter, log_filepath, pdf_output_filepath, summary=None, metrics=None):
+        """
+        Accoda il salvataggio di un'analisi (stessi argomenti di Storage.save_analysis,
+        più il record delle misure per fase 'metrics', salvato in analysis_metrics).
+
+        Returns:
+            bool: True se l'analisi è stata accodata, False se è finita direttamente nel
+                journal (coda piena o writer chiuso).
+        """
+        # Data dell'analisi, non della scrittura (che può avvenire molto dopo)
+        analysis = analysis_record(anomalies, ip_counter, log_filepath, pdf_output_filepath, summary, datetime.now(),
+                                   metrics)
+        # Il lock garantisce che nessuna analisi venga accodata dopo la sentinella di close()
+        with self._close_lock:
+            if not self._closed:
+                with self._pending_done:
+                    self._pending += 1
+                try:
+                    self._queue.put_nowait(analysis)
+                    return True
+                except queue.Full:
+                    self._done(1)
+                    print("Coda di scrittura piena: analisi salvata nel journal.")
+        self._append_journal([analysis])
+        return False
+
+    def _done(self, count):
+        with self._pending_done:
+            self._pending -= count
+            if self._pending <= 0:
+                self._pending_done.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Attende che tutte le analisi accodate siano state elaborate (scritte nel
+        database o spostate nel journal).
+
+        Returns:
+            bool: True se la coda è stata svuotata entro 'timeout' secondi.
+        """
+        with self._pending_done:
+            return self._pending_done.wait_for(lambda: self._pending <= 0, timeout)
+
+    def close(self, timeout=None):
+        """
+        Svuota la coda e termina il thread di scrittura. Può essere chiamata più volte.
+        Se il thread non termina entro 'timeout' secondi (es. database lento), le analisi
+        ancora in coda vengono spostate nel journal per l'avvio successivo.
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True  # Da qui submit() scrive direttamente nel journal
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=self._remaining(deadline))
+        except queue.Full:
+            pass  # Coda piena e thread bloccato: le analisi in coda passano al journal
+        else:
+            self._thread.join(self._remaining(deadline))
+        atexit.unregister(self.close)
+        if self._thread.is_alive():
+            analyses = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    analyses.append(item)
+            # Il thread termina appena completa la scrittura in corso
+            self._queue.put_nowait(_STOP)
+            if analyses:
+                self._append_journal(analyses)
+                self._done(len(analyses))
+                print(f"Scrittura nel database non completata: {len(analyses)} analisi salvate nel journal.")
+
+    @staticmethod
+    def _remaining(deadline):
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def discard_journal(self, timeout=None):
+        """
+        Elimina il journal (e un eventuale replay interrotto) senza scriverlo nel database,
+        attendendo al massimo 'timeout' secondi la fine della scrittura in corso.
+
+        Returns:
+            bool: True se il journal è stato eliminato.
+        """
+        if not self._write_lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        try:
+            with self._journal_lock:
+                for path in (self.journal_path, f"{self.journal_path}.replay"):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self._backoff = 0.0
+            return True
+        finally:
+            self._write_lock.release()
+
+    def pending_journal(self):
+        """
+        Restituisce il numero di analisi presenti nel journal in attesa di replay.
+        """
+        with self._journal_lock:
+            return len(self._read_journal(self.journal_path))
+
+    # --- Thread di scrittura ---
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self._idle_timeout())
+            except queue.Empty:
+                with self._write_lock:
+                    self._replay_journal()
+                continue
+
+            # Raggruppa le analisi già in coda in un unico lotto
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                if batch:
+                    with self._write_lock:
+                        if self._write_with_retry(batch, retries=0 if stopping else self.max_retries):
+                            self._export_metrics(batch)
+                            self._replay_journal(force=True)
+                        else:
+                            self._append_journal(batch)
+                            print(f"Database non raggiungibile: {len(batch)} analisi salvate nel journal.")
+            finally:
+                self._done(len(batch))
+
+    def _idle_timeout(self):
+        if not os.path.exists(self.journal_path):
+            return None
+        return max(0.1, self._next_replay - time.monotonic())
+
+    def _write_with_retry(self, batch, retries):
+        delay = self.backoff_base
+        for attempt in range(retries + 1):
+            try:
+                self._write(batch)
+                self._backoff = 0.0
+                return True
+            except Exception as err:  # mysql.connector.Error o dati non validi: il lotto non va perso
+                print(f"Errore durante la scrittura nel database (tentativo {attempt + 1}): {err}")
+                if attempt < retries:
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.backoff_max)
+        self._schedule_replay()
+        return False
+
+    @staticmethod
+    def _export_metrics(batch):
+        # Riesporta le metriche dell'ultima analisi, ora completa della fase 'db_write'
+        for analysis in reversed(batch):
+            if analysis.get("metrics"):
+                export_prometheus(analysis["metrics"])
+                return
+
+    def _schedule_replay(self):
+        self._backoff = min(max(self._backoff * 2, self.backoff_base), self.backoff_max)
+        self._next_replay = time.monotonic() + self._backoff
+
+    # --- Journal su disco ---
+
+    @staticmethod
+    def _read_journal(path):
+        analyses = []
+        try:
+            with open(path, "rb") as file:
+                while True:
+                    try:
+                        analyses.extend(pickle.load(file))
+                    except EOFError:
+                        break
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Record finale incompleto (es. interruzione durante la scrittura): si tengono i precedenti
+            print(f"Journal {path} parzialmente illeggibile: {e}")
+        return analyses
+
+    def _append_journal(self, analyses):
+        with self._journal_lock:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.journal_path, "ab") as file:
+                pickle.dump(analyses, file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _recover_replay(self):
+        # Un replay interrotto (es. crash) lascia il file .replay: le sue analisi tornano nel journal
+        replay_path = f"{self.journal_path}.replay"
+        if os.path.exists(replay_path):
+            analyses = self._read_journal(replay_path)
+            if analyses:
+                self._append_journal(analyses)
+            os.remove(replay_path)
+
+    def _replay_journal(self, force=False):
+        """
+        Riscrive nel database le analisi del journal, a lotti di batch_size.
+        Le analisi non scritte tornano nel journal e il replay viene riprogrammato.
+        """
+        if not force and time.monotonic() < self._next_replay:
+            return
+        replay_path = f"{self.journal_path}.replay"
+        with self._journal_lock:
+            if not os.path.exists(self.journal_path):
+                return
+            os.replace(self.journal_path, replay_path)
+        analyses = self._read_journal(replay_path)
+
+        written = 0
+        for start in range(0, len(analyses), self.batch_size):
+            if not self._write_with_retry(analyses[start:start + self.batch_size], retries=0):
+                break
+            written = start + self.batch_size
+        if written < len(analyses):
+            self._append_journal(analyses[written:])
+        else:
+            print(f"Journal riscritto nel database: {len(analyses)} analisi.")
+        os.remove(replay_path)
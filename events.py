@@ -0,0 +1,156 @@
+# events.py
+# Rappresentazione compatta degli eventi di accesso fallito e degli eventi sshd tipizzati.
+
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from timestamps import decode_seconds
+
+# Valore usato nella colonna dei secondi per i timestamp non validi
+INVALID_SECONDS = -1
+
+# Valore usato nella colonna degli utenti quando la riga non riporta un utente
+NO_USER = 0xFFFFFFFF
+
+# Tipi di evento sshd riconosciuti da log_parser.iter_log_records: il valore è il testo
+# che identifica il messaggio nel log
+FAILED_PASSWORD = "Failed password"
+ACCEPTED_PASSWORD = "Accepted password"
+FAILED_PUBLICKEY = "Failed publickey"
+ACCEPTED_PUBLICKEY = "Accepted publickey"
+INVALID_USER = "Invalid user"
+SESSION_OPENED = "session opened"
+SESSION_CLOSED = "session closed"
+EVENT_TYPES = (FAILED_PASSWORD, ACCEPTED_PASSWORD, FAILED_PUBLICKEY, ACCEPTED_PUBLICKEY, INVALID_USER,
+               SESSION_OPENED, SESSION_CLOSED)
+
+
+class SshEvent(namedtuple("SshEvent", ("timestamp", "host", "pid", "type", "user", "ip", "port"))):
+    """
+    Evento sshd tipizzato estratto da una riga di log (vedi log_parser.iter_log_records).
+    I campi sono le stringhe della riga: 'type' è uno di EVENT_TYPES; i campi che il
+    tipo di messaggio non riporta (es. IP e porta delle sessioni) sono stringhe vuote.
+    """
+    __slots__ = ()
+
+    @property
+    def failed(self):
+        """True per i tentativi di accesso falliti (password o chiave pubblica)."""
+        return self.type == FAILED_PASSWORD or self.type == FAILED_PUBLICKEY
+
+
+class Event:
+    """
+    Vista leggera su un singolo evento di un EventBatch.
+    """
+    __slots__ = ("ip", "seconds", "user")
+
+    def __init__(self, ip, seconds, user=None):
+        self.ip = ip
+        self.seconds = seconds
+        self.user = user
+
+    @property
+    def hour(self):
+        """Ora del giorno dell'evento, oppure None se il timestamp non era valido."""
+        return None if self.seconds < 0 else (self.seconds // 3600) % 24
+
+    def __repr__(self):
+        return f"Event(ip={self.ip!r}, seconds={self.seconds}, user={self.user!r})"
+
+
+class EventBatch:
+    """
+    Contenitore compatto di eventi, memorizzati per colonne:
+    - ip_ids: array di interi che indicizzano la tabella degli IP (ogni IP
+      distinto viene salvato una sola volta, nell'ordine di prima apparizione);
+    - seconds: array dei secondi dall'inizio dell'anno (INVALID_SECONDS se il
+      timestamp non è valido), da cui si ricava anche l'ora;
+    - user_ids: array di interi che indicizzano la tabella degli utenti (NO_USER
+      se la riga non riporta un utente).
+    Ogni evento occupa 12 byte invece delle centinaia di un dizionario.
+    """
+    __slots__ = ("ip_table", "_ip_index", "ip_ids", "seconds", "user_table", "_user_index", "user_ids")
+
+    def __init__(self):
+        self.ip_table = []           # ID -> indirizzo IP (str)
+        self._ip_index = {}          # Indirizzo IP -> ID
+        self.ip_ids = array("I")     # Colonna degli ID degli IP
+        self.seconds = array("i")    # Colonna dei secondi dall'inizio dell'anno
+        self.user_table = []         # ID -> nome utente (str)
+        self._user_index = {}        # Nome utente -> ID
+        self.user_ids = array("I")   # Colonna degli ID degli utenti
+
+    @classmethod
+    def from_events(cls, entries):
+        """
+        Costruisce un EventBatch da un iterabile di dizionari con 'ip', 'timestamp'
+        e, se presente, 'user' (es. parse_log o log_parser.iter_log_events).
+        """
+        batch = cls()
+        batch.extend(entries)
+        return batch
+
+    def append(self, ip, timestamp, user=None):
+        """
+        Aggiunge un evento al contenitore.
+
+        Args:
+            ip (str): Indirizzo IP dell'evento.
+            timestamp (str): Timestamp syslog dell'evento.
+            user (str): Nome utente dell'evento (None se assente).
+        """
+        ip_id = self._ip_index.get(ip)
+        if ip_id is None:
+            ip_id = self._ip_index[ip] = len(self.ip_table)
+            self.ip_table.append(ip)
+        self.ip_ids.append(ip_id)
+        seconds = decode_seconds(timestamp)
+        self.seconds.append(INVALID_SECONDS if seconds is None else seconds)
+
+        if user is None:
+            self.user_ids.append(NO_USER)
+        else:
+            user_id = self._user_index.get(user)
+            if user_id is None:
+                user_id = self._user_index[user] = len(self.user_table)
+                self.user_table.append(user)
+            self.user_ids.append(user_id)
+
+    def extend(self, entries):
+        """
+        Aggiunge al contenitore tutti gli eventi (dizionari con 'ip', 'timestamp' e 'user').
+        """
+        append = self.append
+        for entry in entries:
+            append(entry["ip"], entry["timestamp"], entry.get("user"))
+
+    def __len__(self):
+        return len(self.ip_ids)
+
+    def __iter__(self):
+        ip_table = self.ip_table
+        user_table = self.user_table
+        for ip_id, seconds, user_id in zip(self.ip_ids, self.seconds, self.user_ids):
+            yield Event(ip_table[ip_id], seconds, None if user_id == NO_USER else user_table[user_id])
+
+    def ip_counts(self):
+        """
+        Restituisce il numero di eventi per ogni ID di IP (array NumPy indicizzato per ID).
+        """
+        return np.bincount(np.frombuffer(self.ip_ids, dtype=np.uint32), minlength=len(self.ip_table))
+
+    def hours(self):
+        """
+        Restituisce l'ora di ogni evento come array NumPy (-1 per i timestamp non validi).
+        """
+        seconds = np.frombuffer(self.seconds, dtype=np.int32)
+        return np.where(seconds >= 0, (seconds // 3600) % 24, -1)
+
+    def nbytes(self):
+        """
+        Memoria occupata dalle colonne (escluse le tabelle di IP e utenti), in byte.
+        """
+        return sum(column.itemsize * len(column) for column in (self.ip_ids, self.seconds, self.user_ids))
@@ -0,0 +1,76 @@
+# features.py
+# Costruzione della matrice delle feature per IP usata dal modello di anomalie.
+
+import numpy as np
+
+from bursts import BURST_WINDOWS, window_label
+
+# Nomi delle colonne della matrice, nell'ordine
+FEATURE_NAMES = (
+    ["tentativi", "ora_media", "ora_dev_std", "utenti_distinti", "tentativi_per_minuto"]
+    + [f"quota_ora_{hour:02d}" for hour in range(24)]
+    + [f"picco_{window_label(size).replace(' ', '')}" for size in BURST_WINDOWS]
+)
+
+_HOURS = np.arange(24, dtype=np.float64)
+
+
+def build_feature_matrix(summary):
+    """
+    Calcola in un'unica passata le feature di ogni IP e le scrive in una matrice NumPy:
+    - numero di tentativi;
+    - ora media e deviazione standard dell'ora dei tentativi;
+    - numero di utenti distinti tentati;
+    - tentativi per minuto di attività (intensità delle raffiche);
+    - quota dei tentativi in ciascuna delle 24 ore;
+    - picco di tentativi in ciascuna finestra scorrevole di bursts.BURST_WINDOWS.
+    Se il riepilogo non contiene gli aggregati per IP (es. riepiloghi salvati con
+    versioni precedenti), per le feature orarie viene usata la distribuzione globale
+    e come picco il numero di tentativi.
+
+    Args:
+        summary (dict): Riepilogo prodotto da analyze_events.
+
+    Returns:
+        tuple: (lista degli IP, matrice numpy di forma (numero IP, len(FEATURE_NAMES)))
+    """
+    ip_counter = summary["ip_counter"]
+    ip_hourly = summary.get("ip_hourly", {})
+    ip_users = summary.get("ip_users", {})
+    ip_minutes = summary.get("ip_minutes", {})
+    bursts = summary.get("bursts")
+
+    global_histogram = np.zeros(24)
+    for hour, count in summary["hourly_counter"].items():
+        global_histogram[hour] = count
+
+    ips = list(ip_counter)
+    matrix = np.zeros((len(ips), len(FEATURE_NAMES)))
+    histograms = matrix[:, 5:29]
+    peaks = matrix[:, 29:]
+
+    for row, ip in enumerate(ips):
+        hours = ip_hourly.get(ip)
+        if hours is None:
+            histograms[row] = global_histogram
+        else:
+            for hour, count in hours.items():
+                histograms[row, hour] = count
+        matrix[row, 0] = ip_counter[ip]
+        matrix[row, 3] = len(ip_users.get(ip, ()))
+        matrix[row, 4] = ip_counter[ip] / max(1, ip_minutes[ip][0] if ip in ip_minutes else 0)
+        windows = bursts.state.get(ip) if bursts is not None else None
+        if windows:
+            peaks[row] = [window.peak for window in windows]
+        else:
+            peaks[row] = ip_counter[ip]
+
+    # Statistiche orarie calcolate in blocco sull'intera matrice
+    totals = histograms.sum(axis=1)
+    nonzero = totals > 0
+    histograms[nonzero] /= totals[nonzero, None]
+    mean = histograms @ _HOURS
+    matrix[:, 1] = mean
+    matrix[:, 2] = np.sqrt(np.maximum(histograms @ (_HOURS ** 2) - mean ** 2, 0))
+
+    return ips, matrix
@@ -0,0 +1,282 @@
+# follow.py
+# Modalità "follow": segue un file di log in crescita (es. /var/log/auth.log)
+# aggiornando i contatori solo con le righe aggiunte dall'ultimo controllo.
+
+import argparse
+import hashlib
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from analyzer import analyze_events, empty_summary, update_summary
+from log_parser import CHUNK_SIZE, iter_chunk_events
+
+CHECKPOINT_DIR = "checkpoints"   # Cartella dei checkpoint (offset, inode e contatori)
+POLL_INTERVAL = 2.0              # Secondi tra due controlli del file
+SNAPSHOT_INTERVAL = 60.0         # Secondi tra due salvataggi completi del riepilogo
+
+
+def default_checkpoint_path(filepath):
+    """
+    Restituisce il percorso del checkpoint associato a un file di log.
+    """
+    abspath = os.path.abspath(filepath)
+    digest = hashlib.sha1(abspath.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CHECKPOINT_DIR, f"{os.path.basename(abspath)}-{digest}.ckpt")
+
+
+class LogFollower:
+    """
+    Segue un file di log e mantiene aggiornato il riepilogo (come analyze_events)
+    leggendo a ogni aggiornamento solo i byte aggiunti.
+    L'offset letto, l'inode del file e i contatori vengono salvati in un checkpoint,
+    così dopo un riavvio la lettura riprende da dove si era interrotta. A ogni
+    aggiornamento si accoda al file '.delta' solo il riepilogo dei nuovi byte (con
+    offset e inode); il riepilogo completo viene salvato ogni 'snapshot_interval'
+    secondi e alla chiusura, e i delta successivi vengono riapplicati al caricamento.
+    Gestisce la rotazione (il file viene sostituito: si termina la lettura del vecchio
+    file e si riparte dall'inizio del nuovo) e il troncamento (si riparte da zero).
+    """
+
+    def __init__(self, filepath, checkpoint_path=None, poll_interval=POLL_INTERVAL,
+                 snapshot_interval=SNAPSHOT_INTERVAL):
+        self.filepath = filepath
+        self.checkpoint_path = checkpoint_path or default_checkpoint_path(filepath)
+        self.delta_path = f"{self.checkpoint_path}.delta"
+        self.poll_interval = poll_interval
+        self.snapshot_interval = snapshot_interval
+
+        self.file = None        # File attualmente seguito (aperto in lettura binaria)
+        self.inode = None       # (st_dev, st_ino) del file seguito
+        self.offset = 0         # Byte già elaborati del file seguito
+        self.summary = empty_summary()
+        self.generation = 0     # Numero del riepilogo completo salvato: i delta vi fanno riferimento
+        self._last_snapshot = time.monotonic()
+
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        """
+        Ripristina offset, inode e contatori dal checkpoint, se presente, e vi applica
+        i delta salvati dopo di esso.
+        """
+        try:
+            with open(self.checkpoint_path, "rb") as file:
+                state = pickle.load(file)
+        except FileNotFoundError:
+            state = None
+        except Exception as e:
+            print(f"Checkpoint non leggibile ({self.checkpoint_path}), si riparte da zero: {e}")
+            return
+        if state is not None:
+            if state.get("filepath") != os.path.abspath(self.filepath):
+                return
+            self.inode = state["inode"]
+            self.offset = state["offset"]
+            self.summary = state["summary"]
+            self.generation = state.get("generation", 0)
+            # Checkpoint delle versioni precedenti: insiemi dei minuti -> [conteggio, primo, ultimo]
+            self.summary["ip_minutes"] = {
+                ip: [len(minutes), min(minutes), max(minutes)] if isinstance(minutes, set) else minutes
+                for ip, minutes in self.summary.get("ip_minutes", {}).items() if minutes}
+
+        for delta in self._read_deltas():
+            # I delta di un riepilogo precedente sono già inclusi nel checkpoint
+            if delta["generation"] == self.generation:
+                update_summary(self.summary, delta["summary"])
+                self.inode = delta["inode"]
+                self.offset = delta["offset"]
+
+    def _read_deltas(self):
+        deltas = []
+        try:
+            with open(self.delta_path, "rb") as file:
+                while True:
+                    try:
+                        deltas.append(pickle.load(file))
+                    except EOFError:
+                        break
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Delta finale incompleto (es. interruzione durante la scrittura): si tengono i precedenti
+            print(f"Delta del checkpoint parzialmente illeggibili ({self.delta_path}): {e}")
+        return deltas
+
+    def _makedirs(self):
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def save_checkpoint(self):
+        """
+        Salva lo stato corrente (riepilogo completo) nel checkpoint in modo atomico
+        ed elimina i delta, ormai inclusi.
+        """
+        self._makedirs()
+        self.generation += 1
+        state = {
+            "filepath": os.path.abspath(self.filepath),
+            "inode": self.inode,
+            "offset": self.offset,
+            "summary": self.summary,
+            "generation": self.generation,
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.checkpoint_path)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._last_snapshot = time.monotonic()
+
+    def _save_delta(self, delta):
+        """
+        Accoda al file dei delta il riepilogo dei soli byte appena letti, con l'offset e
+        l'inode raggiunti: il costo è proporzionale ai nuovi eventi, non al riepilogo.
+        """
+        self._makedirs()
+        record = {"generation": self.generation, "inode": self.inode, "offset": self.offset, "summary": delta}
+        with open(self.delta_path, "ab") as file:
+            pickle.dump(record, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _open(self):
+        """
+        Apre il file seguito. Se non è lo stesso file del checkpoint (ruotato mentre
+        il programma era fermo), la lettura riparte dall'inizio.
+        """
+        self.file = open(self.filepath, "rb")
+        stat = os.fstat(self.file.fileno())
+        inode = (stat.st_dev, stat.st_ino)
+        if inode != self.inode:
+            if self.inode is not None:
+                print(f"Il file {self.filepath} è stato ruotato: lettura dall'inizio.")
+            self.inode = inode
+            self.offset = 0
+        elif stat.st_size < self.offset:
+            print(f"Il file {self.filepath} è stato troncato: lettura dall'inizio.")
+            self.offset = 0
+
+    def _consume(self, delta, final=False):
+        """
+        Elabora i byte del file seguito tra l'offset corrente e la fine, fermandosi
+        all'ultima riga completa (tranne se 'final', cioè il file è stato ruotato e
+        non crescerà più). I riepiloghi parziali vengono aggiunti anche a 'delta'.
+        Restituisce il numero di nuovi eventi.
+        """
+        stat = os.fstat(self.file.fileno())
+        size = stat.st_size
+        # Anno dei timestamp syslog dedotto dall'mtime del file, come nelle analisi batch
+        reference = datetime.fromtimestamp(stat.st_mtime)
+        new_events = 0
+        while self.offset < size:
+            self.file.seek(self.offset)
+            data = self.file.read(min(CHUNK_SIZE, size - self.offset))
+            if not data:
+                break
+            usable = len(data)
+            if not final:
+                last_newline = data.rfind(b"\n")
+                if last_newline != -1:
+                    usable = last_newline + 1
+                elif len(data) < CHUNK_SIZE:
+                    break  # Riga ancora in scrittura: verrà letta al prossimo controllo
+
+            partial = analyze_events(iter_chunk_events([data[:usable]]), reference)
+            update_summary(self.summary, partial)
+            update_summary(delta, partial)
+            new_events += sum(partial["ip_counter"].values())
+            self.offset += usable
+        return new_events
+
+    def refresh(self):
+        """
+        Controlla il file ed elabora solo i byte aggiunti dall'ultimo controllo.
+
+        Returns:
+            int: Numero di nuovi tentativi falliti trovati.
+        """
+        start_state = (self.inode, self.offset)
+        new_events = 0
+        delta = empty_summary()
+
+        if self.file is None:
+            try:
+                self._open()
+            except FileNotFoundError:
+                return 0  # Il file potrebbe essere in fase di rotazione
+
+        try:
+            stat = os.stat(self.filepath)
+            current = (stat.st_dev, stat.st_ino)
+        except FileNotFoundError:
+            current = self.inode  # Rotazione in corso: continua con il file aperto
+
+        if current != self.inode:
+            # Rotazione: termina il vecchio file e passa al nuovo
+            new_events += self._consume(delta, final=True)
+            self.file.close()
+            self.file = None
+            self._open()
+        elif os.fstat(self.file.fileno()).st_size < self.offset:
+            # Troncamento (es. logrotate con copytruncate)
+            print(f"Il file {self.filepath} è stato troncato: lettura dall'inizio.")
+            self.offset = 0
+
+        new_events += self._consume(delta)
+        if (self.inode, self.offset) != start_state:
+            if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                self.save_checkpoint()
+            else:
+                self._save_delta(delta)
+        return new_events
+
+    def follow(self, callback=None, stop_event=None):
+        """
+        Controlla il file a intervalli regolari finché 'stop_event' non viene impostato.
+
+        Args:
+            callback (callable): Funzione chiamata con (summary, nuovi_eventi) quando
+                arrivano nuovi tentativi falliti.
+            stop_event (threading.Event): Evento per interrompere il ciclo.
+        """
+        stop_event = stop_event or threading.Event()
+        try:
+            while not stop_event.is_set():
+                new_events = self.refresh()
+                if new_events and callback:
+                    callback(self.summary, new_events)
+                stop_event.wait(self.poll_interval)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Salva il checkpoint e chiude il file seguito.
+        """
+        if self.file is not None:
+            self.save_checkpoint()
+            self.file.close()
+            self.file = None
+
+
+def _print_update(summary, new_events):
+    top = ", ".join(f"{ip} ({count})" for ip, count in summary["ip_counter"].most_common(5))
+    print(f"+{new_events} tentativi falliti - totale {sum(summary['ip_counter'].values())} - top IP: {top}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Segue un file di log e aggiorna i contatori in tempo reale.")
+    parser.add_argument("filepath", help="File di log da seguire (es. /var/log/auth.log)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Secondi tra due controlli")
+    parser.add_argument("--checkpoint", help="Percorso del file di checkpoint")
+    args = parser.parse_args()
+
+    follower = LogFollower(args.filepath, args.checkpoint, args.interval)
+    print(f"In ascolto su {args.filepath} (Ctrl+C per terminare)...")
+    try:
+        follower.follow(_print_update)
+    except KeyboardInterrupt:
+        print("Interrotto: checkpoint salvato.")
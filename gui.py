@@ -2,16 +2,26 @@
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk # Aggiunto ttk per widget stilizzati
+import itertools
+import multiprocessing
 import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import threading
 
 # Importa le funzioni di analisi dal tuo progetto
-from log_parser import parse_log
-from analyzer import analyze_events
-from model import detect_anomalies
-from report_generator import generate_report
-from database import init_db, save_anomalies, save_analysis_history, get_analysis_history
+# model (scikit-learn) e report_generator (matplotlib, ReportLab) vengono importati
+# al primo utilizzo o pre-caricati in background: la finestra appare subito
+from cli import analyze_file, init_worker
+from parallel_engine import WorkerBudget
+from storage import get_storage
+from startup import prewarm
+from db_writer import DatabaseWriter
+from instrumentation import export_prometheus, format_stages
+from progress import Progress, format_progress
 from utils import reset_all
 
 # Definizione della palette colori e dei font per la GUI
@@ -28,6 +38,19 @@ FONT_PRIMARY = ("Helvetica", 10)
 FONT_PRIMARY_BOLD = ("Helvetica", 10, "bold")
 FONT_TITLE = ("Helvetica", 12, "bold")
 
+UI_REFRESH_MS = 200       # Intervallo di aggiornamento di log operazioni e avanzamento (ms)
+OUTPUT_MAX_LINES = 5000   # Righe mantenute nell'area di output (le più vecchie vengono rimosse)
+MAX_PARALLEL_JOBS = os.cpu_count() or 1  # Analisi della coda eseguite in parallelo (un processo ciascuna)
+DB_WRITER_TIMEOUT = 5     # Attesa massima (s) delle scritture nel database su reset e chiusura
+MAX_FINISHED_JOBS = 200   # Analisi terminate mantenute nella tabella della coda (le più vecchie vengono rimosse)
+
+# Stati delle analisi nella coda
+JOB_QUEUED = "In coda"
+JOB_RUNNING = "In corso"
+JOB_DONE = "Completata"
+JOB_FAILED = "Errore"
+JOB_CANCELLED = "Annullata"
+
 class SecurityLogAnalyzerGUI:
     """
     Classe principale per la GUI dell'analizzatore di log di sicurezza.
@@ -36,7 +59,7 @@ class SecurityLogAnalyzerGUI:
     def __init__(self, master):
         self.master = master
         master.title("Analizzatore Log di Sicurezza Avanzato")
-        master.geometry("850x750") # Imposta la dimensione della finestra
+        master.geometry("900x850") # Imposta la dimensione della finestra
         master.configure(bg=COLOR_BACKGROUND) # Sfondo della finestra principale
 
         # Stile per i widget ttk (per progressbar o treeview futuri)
@@ -51,10 +74,25 @@ class SecurityLogAnalyzerGUI:
         style.configure("TLabelframe", background=COLOR_BACKGROUND, bordercolor=COLOR_PRIMARY, font=FONT_TITLE)
         style.configure("TLabelframe.Label", foreground=COLOR_PRIMARY, background=COLOR_BACKGROUND, font=FONT_TITLE)
 
-        init_db() # Inizializza il database all'avvio
+        self.storage = get_storage() # Backend di persistenza configurato (MySQL o SQLite)
 
-        self.log_filepath = tk.StringVar() # Percorso del file log selezionato
+        self.log_filepath = tk.StringVar() # File log selezionati (testo mostrato)
+        self.selected_files = [] # Percorsi dei file log selezionati, accodati da "Avvia Analisi"
         self.output_dir = "output"
+        self.db_writer = DatabaseWriter() # Scritture nel database in background
+        self.jobs = {} # Analisi accodate: id della riga nella tabella -> stato, future, avanzamento, risultato
+        self._job_ids = itertools.count(1)
+        self._executor = None # Pool di processi delle analisi, creato alla prima analisi
+        self._manager = None # Manager dei contatori di avanzamento condivisi con i processi del pool
+        self._budget = None # Processi di parsing condivisi tra le analisi in corso (WorkerBudget)
+        self._init_done = False # Inizializzazione del database terminata, vista dal thread della GUI
+        self._db_ready = threading.Event() # Impostato dal thread di inizializzazione (vedi _refresh_ui)
+        self._pending_submits = [] # Salvataggi nel database in attesa del termine dell'inizializzazione
+        self._finished_jobs = queue.SimpleQueue() # Analisi terminate, gestite dal thread della GUI
+        self._batch = [] # Analisi accodate da quando la coda era vuota (avanzamento complessivo)
+        self._batch_started = time.time()
+        self._pending_output = queue.SimpleQueue() # Messaggi dei thread in attesa di essere mostrati
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Crea la cartella output se non esiste
         if not os.path.exists(self.output_dir):
@@ -70,7 +108,7 @@ class SecurityLogAnalyzerGUI:
                                    relief=tk.GROOVE, bd=2)
         file_frame.pack(fill=tk.X, pady=(0, 15))
 
-        tk.Label(file_frame, text="Percorso File:", bg=COLOR_BACKGROUND, fg=COLOR_TEXT_DARK, font=FONT_PRIMARY).pack(side=tk.LEFT, padx=(0,5))
+        tk.Label(file_frame, text="File:", bg=COLOR_BACKGROUND, fg=COLOR_TEXT_DARK, font=FONT_PRIMARY).pack(side=tk.LEFT, padx=(0,5))
         self.log_entry = tk.Entry(file_frame, textvariable=self.log_filepath, width=60, state='readonly',
                                   font=FONT_PRIMARY, bg="#FFFFFF", fg=COLOR_TEXT_DARK, relief=tk.SOLID, bd=1)
         self.log_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True, ipady=4)
@@ -95,149 +133,368 @@ class SecurityLogAnalyzerGUI:
             "cursor": "hand2"
         }
 
-        self.analyze_button = tk.Button(action_frame, text="🚀 Avvia Analisi", command=self.start_analysis_thread,
+        self.analyze_button = tk.Button(action_frame, text="🚀 Avvia Analisi", command=self.start_analyses,
                                         bg=COLOR_SUCCESS, activebackground="#27AE60", **button_config)
         self.analyze_button.pack(side=tk.LEFT, expand=True, padx=5)
 
+        # Storico e reset usano il database: restano disabilitati fino al termine dell'inizializzazione
         self.history_button = tk.Button(action_frame, text="📜 Storico Analisi", command=self.show_history,
-                                        bg=COLOR_SECONDARY, activebackground=COLOR_ACCENT, **button_config)
+                                        state='disabled', bg=COLOR_SECONDARY, activebackground=COLOR_ACCENT,
+                                        **button_config)
         self.history_button.pack(side=tk.LEFT, expand=True, padx=5)
 
         self.reset_button = tk.Button(action_frame, text="🔥 Resetta Tutto", command=self.confirm_reset,
-                                      bg=COLOR_ERROR, activebackground="#C0392B", **button_config)
+                                      state='disabled', bg=COLOR_ERROR, activebackground="#C0392B", **button_config)
         self.reset_button.pack(side=tk.LEFT, expand=True, padx=5)
 
+        # --- Coda delle analisi: una riga per file, con stato e avanzamento ---
+        jobs_frame = tk.LabelFrame(main_frame, text=" Coda Analisi ", padx=15, pady=10,
+                                   bg=COLOR_BACKGROUND, fg=COLOR_PRIMARY, font=FONT_TITLE,
+                                   relief=tk.GROOVE, bd=2)
+        jobs_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+
+        progress_frame = tk.Frame(jobs_frame, bg=COLOR_BACKGROUND)
+        progress_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(8, 0))
+        self.cancel_button = tk.Button(progress_frame, text="⛔ Annulla", command=self.cancel_analysis, state='disabled',
+                                       bg=COLOR_WARNING, activebackground="#D68910", **dict(button_config, pady=4))
+        self.cancel_button.pack(side=tk.RIGHT, padx=(10, 0))
+        self.progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, mode='determinate', maximum=100)
+        self.progress_bar.pack(side=tk.TOP, fill=tk.X)
+        self.progress_label = tk.Label(progress_frame, text="", anchor=tk.W, bg=COLOR_BACKGROUND,
+                                       fg=COLOR_TEXT_DARK, font=FONT_PRIMARY)
+        self.progress_label.pack(side=tk.TOP, fill=tk.X, pady=(4, 0))
+
+        columns = ("file", "status", "progress", "events", "anomalies", "seconds")
+        self.jobs_table = ttk.Treeview(jobs_frame, columns=columns, show='headings', selectmode='extended', height=6)
+        for column, heading, width in zip(columns, ("File Log", "Stato", "Avanzamento", "Eventi", "Anomalie", "Tempo (s)"),
+                                          (230, 80, 260, 70, 70, 70)):
+            self.jobs_table.heading(column, text=heading)
+            self.jobs_table.column(column, width=width, stretch=column in ("file", "progress"))
+        jobs_scrollbar = ttk.Scrollbar(jobs_frame, orient=tk.VERTICAL, command=self.jobs_table.yview)
+        self.jobs_table.configure(yscrollcommand=jobs_scrollbar.set)
+        self.jobs_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        jobs_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.jobs_table.bind("<Double-1>", self._open_job_report) # Doppio clic apre il report dell'analisi
+
         # --- Area di output ---
         output_frame = tk.LabelFrame(main_frame, text=" Log Operazioni ", padx=15, pady=10,
                                      bg=COLOR_BACKGROUND, fg=COLOR_PRIMARY, font=FONT_TITLE,
                                      relief=tk.GROOVE, bd=2)
         output_frame.pack(fill=tk.BOTH, expand=True, pady=(5,0))
 
-        self.output_text = scrolledtext.ScrolledText(output_frame, wrap=tk.WORD, height=20, state='disabled',
+        self.output_text = scrolledtext.ScrolledText(output_frame, wrap=tk.WORD, height=10, state='disabled',
                                                      bg="#FFFFFF", fg=COLOR_TEXT_DARK, font=("Consolas", 9),
                                                      relief=tk.SOLID, bd=1)
         self.output_text.pack(fill=tk.BOTH, expand=True)
 
         self.print_output("Benvenuto nell'Analizzatore Log di Sicurezza Avanzato.\nSeleziona un file di log per iniziare l'analisi.")
 
+        # Messaggi dei thread e avanzamento vengono mostrati a intervalli regolari, in blocco:
+        # il ciclo degli eventi di Tk non viene mai sommerso di aggiornamenti
+        master.after(UI_REFRESH_MS, self._refresh_ui)
+
+        # Inizializzazione del database e pre-caricamento delle dipendenze pesanti in
+        # background, dopo che la finestra è stata mostrata
+        self._init_thread = threading.Thread(target=self._background_startup, daemon=True)
+        master.after_idle(self._init_thread.start)
+
+    def _background_startup(self):
+        """
+        Inizializza il database (unico punto di inizializzazione) e pre-carica
+        scikit-learn, matplotlib e ReportLab.
+        """
+        try:
+            self.storage.init()
+        finally:
+            self._db_ready.set() # Il thread della GUI se ne accorge al successivo _refresh_ui
+        prewarm(on_done=lambda seconds: print(f"Dipendenze pre-caricate in {seconds:.2f} s."))
+
     def print_output(self, message):
         """
         Stampa un messaggio nell'area di output della GUI con timestamp.
         """
+        self._append_output([f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n"])
+
+    def _append_output(self, lines):
+        # Un solo inserimento per tutte le righe; l'area mantiene al massimo OUTPUT_MAX_LINES righe
         self.output_text.config(state='normal')
-        self.output_text.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n")
+        self.output_text.insert(tk.END, "".join(lines[-OUTPUT_MAX_LINES:]))
+        excess = int(self.output_text.index('end-1c').split('.')[0]) - OUTPUT_MAX_LINES
+        if excess > 0:
+            self.output_text.delete('1.0', f"{excess + 1}.0")
         self.output_text.see(tk.END)
         self.output_text.config(state='disabled')
 
     def _thread_safe_print_output(self, message):
         """
-        Permette di stampare in modo sicuro da thread diversi.
+        Permette di stampare in modo sicuro da thread diversi: il messaggio viene accodato
+        e mostrato al successivo aggiornamento periodico (vedi _refresh_ui).
+        """
+        self._pending_output.put(f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n")
+
+    def _flush_output(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self._pending_output.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            self._append_output(lines)
+
+    def _refresh_ui(self):
         """
-        self.master.after(0, self.print_output, message)
+        Aggiornamento periodico (ogni UI_REFRESH_MS): mostra in blocco i messaggi accodati
+        dai thread, gestisce le analisi terminate e aggiorna righe della coda, barra e riga
+        di avanzamento (byte, righe, velocità ed ETA).
+        """
+        self._flush_output()
+        if not self._init_done and self._db_ready.is_set():
+            self._on_init_done()
+        while True:
+            try:
+                job_id = self._finished_jobs.get_nowait()
+            except queue.Empty:
+                break
+            self._on_job_finished(job_id)
+        for job_id, job in self.jobs.items():
+            if job["status"] == JOB_QUEUED and job["future"].running():
+                job["status"] = JOB_RUNNING
+                self.jobs_table.set(job_id, "status", JOB_RUNNING)
+            if job["status"] == JOB_RUNNING:
+                job["snapshot"] = job["progress"].snapshot()
+                if job["snapshot"]["done"]:
+                    self.jobs_table.set(job_id, "progress", format_progress(job["snapshot"]))
+        if self._batch:
+            self._show_batch_progress()
+        self.master.after(UI_REFRESH_MS, self._refresh_ui)
+
+    def _on_init_done(self):
+        """
+        Chiamata dall'aggiornamento periodico quando l'inizializzazione del database è
+        terminata: abilita storico e reset (se nessuna analisi è in corso) e accoda i
+        salvataggi delle analisi concluse nel frattempo.
+        """
+        self._init_done = True
+        self.history_button.config(state='normal')
+        if not self._active_jobs():
+            self.reset_button.config(state='normal')
+        for submit in self._pending_submits:
+            self._submit_analysis(*submit)
+        self._pending_submits = []
+
+    def _submit_analysis(self, anomalies, ip_counter, filepath, report, summary, metrics):
+        # Il salvataggio avviene in background: la coda non attende il database
+        if not self._init_done:
+            self._pending_submits.append((anomalies, ip_counter, filepath, report, summary, metrics))
+        elif not self.db_writer.submit(anomalies, ip_counter, filepath, report, summary, metrics):
+            self.print_output("ATTENZIONE: coda di scrittura piena, analisi salvata nel journal locale.")
+
+    def _prune_jobs(self):
+        # Rimuove dalla tabella (e dalla memoria) le analisi terminate più vecchie oltre MAX_FINISHED_JOBS
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job["status"] not in (JOB_QUEUED, JOB_RUNNING) and job_id not in self._batch]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+            self.jobs_table.delete(job_id)
+
+    def _active_jobs(self):
+        return [job_id for job_id, job in self.jobs.items() if job["status"] in (JOB_QUEUED, JOB_RUNNING)]
+
+    def _show_batch_progress(self):
+        """
+        Avanzamento complessivo delle analisi accodate da quando la coda era vuota: i file
+        terminati contano per intero, quelli in corso per i byte già letti. Al termine
+        dell'ultima analisi mostra l'esito complessivo.
+        """
+        jobs = [self.jobs[job_id] for job_id in self._batch]
+        statuses = [job["status"] for job in jobs]
+        total = sum(job["size"] for job in jobs)
+        done = lines = 0
+        for job in jobs:
+            if job["status"] == JOB_RUNNING:
+                done += min(job["snapshot"]["done"], job["size"])
+                lines += job["snapshot"]["lines"]
+            elif job["status"] != JOB_QUEUED:
+                done += job["size"]
+                lines += job["snapshot"]["lines"]
+        seconds = time.time() - self._batch_started
+        rate = done / seconds if seconds > 0 else 0.0
+        snapshot = {"done": done, "total": total, "lines": lines, "seconds": seconds, "rate": rate,
+                    "fraction": done / total if total else None,
+                    "eta": (total - done) / rate if total and rate > 0 else None}
+        running, queued = statuses.count(JOB_RUNNING), statuses.count(JOB_QUEUED)
+        self.progress_bar.config(value=(snapshot["fraction"] or 0) * 100)
+        self.progress_label.config(text=f"{running} in corso, {queued} in coda, {len(jobs) - running - queued} terminate"
+                                        f" - {format_progress(snapshot)}")
+        if running or queued:
+            return
+
+        # Coda vuota: esito complessivo delle analisi accodate
+        self._batch = []
+        self._prune_jobs()
+        self.cancel_button.config(state='disabled')
+        if self._init_done:
+            self.reset_button.config(state='normal')
+        failed, cancelled = statuses.count(JOB_FAILED), statuses.count(JOB_CANCELLED)
+        message = f"{statuses.count(JOB_DONE)} analisi completate su {len(jobs)} in {seconds:.1f} s"
+        message += f" ({failed} errori, {cancelled} annullate)." if failed or cancelled else "."
+        self.print_output(message)
+        if failed:
+            self.master.after(0, lambda: messagebox.showwarning("Analisi Completate", message, icon='warning'))
+        else:
+            self.master.after(0, lambda: messagebox.showinfo("Analisi Completate", message, icon='info'))
 
     def browse_log_file(self):
         """
-        Apre una finestra di dialogo per selezionare un file di log.
+        Apre una finestra di dialogo per selezionare uno o più file di log.
         """
-        filepath = filedialog.askopenfilename(
-            title="Seleziona un file di log",
-            filetypes=[("Log files", "*.log"), ("Tutti i files", "*.*")]
+        filepaths = filedialog.askopenfilenames(
+            title="Seleziona uno o più file di log",
+            filetypes=[("Log files", "*.log *.log.*"), ("Log compressi", "*.gz *.bz2 *.xz"), ("Tutti i files", "*.*")]
         )
-        if filepath:
-            self.log_filepath.set(filepath)
-            self.print_output(f"File selezionato: {filepath}")
+        if filepaths:
+            self.selected_files = list(filepaths)
+            if len(filepaths) == 1:
+                self.log_filepath.set(filepaths[0])
+            else:
+                self.log_filepath.set(f"{len(filepaths)} file: {', '.join(os.path.basename(path) for path in filepaths)}")
+            for filepath in filepaths:
+                self.print_output(f"File selezionato: {filepath}")
 
-    def start_analysis_thread(self):
+    def start_analyses(self):
         """
-        Avvia l'analisi in un thread separato per non bloccare la GUI.
+        Accoda un'analisi per ogni file selezionato. Fino a MAX_PARALLEL_JOBS analisi
+        (parsing, anomalie, report) vengono eseguite in parallelo in processi separati,
+        le altre attendono in coda: il tempo totale si avvicina a quello del file più lento.
+        La finestra resta utilizzabile e si possono accodare altri file in qualsiasi momento.
         """
-        if not self.log_filepath.get():
-            messagebox.showwarning("Attenzione", "Per favore, seleziona prima un file di log.", icon='warning')
+        if not self.selected_files:
+            messagebox.showwarning("Attenzione", "Per favore, seleziona prima uno o più file di log.", icon='warning')
             return
 
-        self._thread_safe_print_output("Avvio analisi in corso...")
-        
-        # Disabilita i pulsanti durante l'analisi
-        self.browse_button.config(state='disabled')
-        self.analyze_button.config(state='disabled')
-        self.history_button.config(state='disabled')
-        self.reset_button.config(state='disabled')
-        
-        analysis_thread = threading.Thread(target=self._run_analysis, daemon=True)
-        analysis_thread.start()
-
-    def _on_analysis_complete(self, success, message_for_user, pdf_filepath=None):
+        if self._executor is None:
+            # "spawn": i processi non ereditano lo stato di Tk e dei thread della GUI
+            context = multiprocessing.get_context("spawn")
+            if self._manager is None:
+                self._manager = context.Manager()
+                self._budget = WorkerBudget(MAX_PARALLEL_JOBS, self._manager)
+            self._executor = ProcessPoolExecutor(max_workers=MAX_PARALLEL_JOBS, mp_context=context,
+                                                 initializer=init_worker)
+
+        if not self._batch:
+            self._batch_started = time.time()
+        # Ogni analisi, all'avvio, divide il proprio file sui processi lasciati liberi dalle altre
+        self._budget.reserve(len(self.selected_files))
+        for filepath in self.selected_files:
+            job_id = str(next(self._job_ids))
+            progress = Progress(self._manager) # Passato ai task del pool: contatori nel processo del Manager
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                size = 0
+            task = (filepath, "pdf", self.output_dir, True, True, None, None, progress, self._budget)
+            self.jobs[job_id] = {"file": filepath, "status": JOB_QUEUED, "progress": progress, "size": size,
+                                 "snapshot": progress.snapshot(), "result": None,
+                                 "future": self._executor.submit(analyze_file, task)}
+            self.jobs_table.insert('', tk.END, iid=job_id, values=(filepath, JOB_QUEUED, "", "", "", ""))
+            self._batch.append(job_id)
+            # Chiamata da un thread del pool: la riga viene aggiornata dal thread della GUI
+            self.jobs[job_id]["future"].add_done_callback(lambda future, job_id=job_id: self._finished_jobs.put(job_id))
+
+        self.print_output(f"{len(self.selected_files)} analisi accodate ({MAX_PARALLEL_JOBS} eseguite in parallelo).")
+        self.selected_files = []
+        self.log_filepath.set("")
+        self.cancel_button.config(state='normal')
+        self.reset_button.config(state='disabled') # Il reset eliminerebbe database e report delle analisi in corso
+
+    def cancel_analysis(self):
         """
-        Callback chiamata al termine dell'analisi per riabilitare i pulsanti e mostrare un messaggio.
+        Annulla le analisi selezionate nella coda (tutte quelle non terminate se nessuna è
+        selezionata): quelle in coda non partono, quelle in corso si fermano alla fine del
+        blocco di log corrente e le fasi successive non vengono eseguite.
         """
-        self.browse_button.config(state='normal')
-        self.analyze_button.config(state='normal')
-        self.history_button.config(state='normal')
-        self.reset_button.config(state='normal')
-
-        if success:
-            messagebox.showinfo("Analisi Completata", message_for_user, icon='info')
-        else:
-            messagebox.showerror("Errore Analisi", message_for_user, icon='error')
-
-    def _run_analysis(self):
+        active = self._active_jobs()
+        targets = [job_id for job_id in self.jobs_table.selection() if job_id in active] or active
+        for job_id in targets:
+            job = self.jobs[job_id]
+            job["progress"].cancel()
+            job["future"].cancel()
+        self.print_output(f"Annullamento richiesto per {len(targets)} analisi.")
+
+    def _on_job_finished(self, job_id):
         """
-        Esegue l'analisi del log, il rilevamento anomalie, la generazione del report e il salvataggio nel database.
-        Tutto viene eseguito in un thread separato.
+        Gestisce un'analisi terminata (nel thread della GUI): aggiorna la riga della coda,
+        esporta le misure per Prometheus e accoda il salvataggio nel database.
         """
-        log_path = self.log_filepath.get()
-        
-        _status_success = False
-        _status_message_for_user = ""
-        _status_pdf_path = None
-
-        try:
-            self._thread_safe_print_output(f"Parsing del log: {log_path}...")
-            entries = parse_log(log_path)
-            if not entries:
-                _status_message_for_user = "Nessuna voce di 'Failed password' trovata nel log."
-                self._thread_safe_print_output(_status_message_for_user)
-                _status_success = True
+        job = self.jobs[job_id]
+        future = job["future"]
+        job["snapshot"] = job["progress"].snapshot()
+        # I proxy del Manager e il future non servono più: la riga mantiene solo stato e risultato
+        job["progress"] = job["future"] = None
+        if future.cancelled():
+            self._budget.unreserve() # Annullata prima di partire: non chiederà processi
+            result = {"error": "analisi annullata", "cancelled": True}
+        else:
+            try:
+                result = future.result()
+            except Exception as e: # Es. processo worker terminato in modo anomalo
+                result = {"error": f"{type(e).__name__}: {e}"}
+                if isinstance(e, BrokenProcessPool):
+                    self._executor = None # Il pool non è più utilizzabile: ne viene creato uno nuovo
+        job["result"] = result
+        filepath = job["file"]
+
+        summary = result.pop("summary", None)
+        if "metrics" in result:
+            export_prometheus(result["metrics"])
+        if result.get("cancelled"):
+            job["status"] = JOB_CANCELLED
+            self.print_output(f"{filepath}: analisi annullata, nessun report generato e nessun dato salvato.")
+        elif result["error"] and not result.get("report_failed"):
+            job["status"] = JOB_FAILED
+            self.print_output(f"ERRORE durante l'analisi di {filepath}: {result['error']}")
+        else:
+            job["status"] = JOB_DONE
+            anomalies = result["anomalies"]
+            if not result["events"]:
+                self.print_output(f"{filepath}: nessuna voce di 'Failed password' trovata nel log.")
             else:
-                pdf_filename = os.path.join(self.output_dir, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
-                _status_pdf_path = pdf_filename
-
-                self._thread_safe_print_output("Analisi eventi in corso...")
-                summary = analyze_events(entries)
-
-                self._thread_safe_print_output("Rilevamento anomalie con AI in corso...")
-                anomalies = detect_anomalies(summary)
-                self._thread_safe_print_output(f"Eventi anomali rilevati: {', '.join(anomalies) if anomalies else 'Nessuno'}")
-
-                self._thread_safe_print_output(f"Generazione report PDF: {pdf_filename}...")
-                generate_report(summary, anomalies or [], pdf_filename)
-                self._thread_safe_print_output("Report PDF generato con successo!")
-
-                self._thread_safe_print_output("Salvataggio anomalie nel database...")
-                save_anomalies(anomalies, summary["ip_counter"])
-                self._thread_safe_print_output("Anomalie salvate.")
-
-                self._thread_safe_print_output("Salvataggio storico analisi nel database...")
-                save_analysis_history(log_path, pdf_filename)
-                self._thread_safe_print_output("Storico analisi salvato.")
-                
-                _status_message_for_user = f"Analisi completata con successo! Report salvato in: {_status_pdf_path}"
-                _status_success = True
-
-        except Exception as e:
-            error_msg_for_log = f"ERRORE durante l'analisi: {e}"
-            self._thread_safe_print_output(error_msg_for_log)
-            _status_message_for_user = f"Si è verificato un errore durante l'analisi: {e}"
-            _status_success = False
-        finally:
-            self.master.after(0, self._on_analysis_complete, _status_success, _status_message_for_user, _status_pdf_path)
+                self.print_output(f"{filepath}: {result['events']} eventi, anomalie: "
+                                  f"{', '.join(anomalies) if anomalies else 'Nessuna'}")
+                if result["report"]:
+                    self.print_output(f"Report PDF: {result['report']}")
+                else:
+                    self.print_output("ATTENZIONE: generazione del report PDF non riuscita.")
+                self._submit_analysis(anomalies, summary["ip_counter"], filepath, result["report"] or "",
+                                      summary, result["metrics"])
+            self.print_output(f"Tempi delle fasi: {format_stages(result['metrics'])}")
+            if result["metrics"]["profile_path"]:
+                self.print_output(f"Profilo cProfile salvato in: {result['metrics']['profile_path']}")
+
+        self.jobs_table.item(job_id, values=(
+            filepath, job["status"],
+            format_progress(job["snapshot"]) if job["snapshot"]["done"] else "",
+            result.get("events", ""), len(result["anomalies"]) if "anomalies" in result else "",
+            result.get("seconds", "")))
+        self._prune_jobs()
+
+    def _open_job_report(self, event=None):
+        selection = self.jobs_table.selection()
+        if not selection:
+            return
+        result = self.jobs[selection[0]]["result"]
+        if result and result.get("report"):
+            self.open_pdf(result["report"])
+        else:
+            messagebox.showinfo("Report", "Nessun report disponibile per questa analisi.", icon='info')
 
     def show_history(self):
         """
         Mostra una finestra con lo storico delle analisi effettuate e i link ai PDF generati.
+        Lo storico viene caricato una pagina alla volta (paginazione a chiave): la tabella
+        contiene solo le righe della pagina visibile, non l'intero storico.
         """
-        history_data = get_analysis_history()
-
         history_window = tk.Toplevel(self.master)
         history_window.title("📜 Storico Analisi")
         history_window.geometry("750x550")
@@ -245,46 +502,72 @@ class SecurityLogAnalyzerGUI:
         history_window.transient(self.master) # La finestra dello storico rimane sopra la principale
         history_window.grab_set() # Blocca l'interazione con la finestra principale
 
-        text_frame = tk.Frame(history_window, bg=COLOR_BACKGROUND, padx=10, pady=10)
-        text_frame.pack(fill=tk.BOTH, expand=True)
+        table_frame = tk.Frame(history_window, bg=COLOR_BACKGROUND, padx=10, pady=10)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+
+        columns = ("id", "analysis_datetime", "log_filepath", "pdf_output_filepath")
+        history_table = ttk.Treeview(table_frame, columns=columns, show='headings', selectmode='browse')
+        for column, heading, width in zip(columns, ("ID Analisi", "Data/Ora", "File Log Input", "File PDF Output"),
+                                          (70, 140, 240, 260)):
+            history_table.heading(column, text=heading)
+            history_table.column(column, width=width, stretch=column != "id")
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=history_table.yview)
+        history_table.configure(yscrollcommand=scrollbar.set)
+        history_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        nav_frame = tk.Frame(history_window, bg=COLOR_BACKGROUND, padx=10)
+        nav_frame.pack(fill=tk.X, pady=(0, 10))
+        nav_config = {
+            "bg": COLOR_SECONDARY, "fg": COLOR_TEXT_LIGHT, "font": FONT_PRIMARY_BOLD,
+            "relief": tk.FLAT, "padx": 10, "pady": 4, "cursor": "hand2",
+            "activebackground": COLOR_ACCENT, "activeforeground": COLOR_TEXT_LIGHT
+        }
+        prev_button = tk.Button(nav_frame, text="◀ Più recenti", **nav_config)
+        prev_button.pack(side=tk.LEFT)
+        next_button = tk.Button(nav_frame, text="Meno recenti ▶", **nav_config)
+        next_button.pack(side=tk.LEFT, padx=5)
+        page_label = tk.Label(nav_frame, bg=COLOR_BACKGROUND, fg=COLOR_TEXT_DARK, font=FONT_PRIMARY)
+        page_label.pack(side=tk.LEFT, padx=10)
+        open_button = tk.Button(nav_frame, text="🔗 Apri Report", **nav_config)
+        open_button.pack(side=tk.RIGHT)
+
+        # Chiavi (keyset) di inizio delle pagine visitate: permettono di tornare indietro
+        page_keys = [None]
+        state = {"next_key": None}
+
+        def load_page():
+            rows, state["next_key"] = self.storage.get_analysis_history_page(page_keys[-1])
+            history_table.delete(*history_table.get_children())
+            for entry in rows:
+                history_table.insert('', tk.END, iid=str(entry['id']), values=(
+                    entry['id'], entry['analysis_datetime'], entry['log_filepath'], entry['pdf_output_filepath']))
+            if not rows and len(page_keys) == 1:
+                page_label.config(text="Nessuna analisi precedente trovata.")
+            else:
+                page_label.config(text=f"Pagina {len(page_keys)}")
+            prev_button.config(state='normal' if len(page_keys) > 1 else 'disabled')
+            next_button.config(state='normal' if state["next_key"] is not None else 'disabled')
+
+        def next_page():
+            page_keys.append(state["next_key"])
+            load_page()
 
-        history_text_widget = scrolledtext.ScrolledText(text_frame, wrap=tk.WORD, state='disabled',
-                                                       bg="#FFFFFF", fg=COLOR_TEXT_DARK, font=("Consolas", 9),
-                                                       relief=tk.SOLID, bd=1)
-        history_text_widget.pack(fill=tk.BOTH, expand=True)
+        def previous_page():
+            page_keys.pop()
+            load_page()
 
-        history_text_widget.config(state='normal')
-        if not history_data:
-            history_text_widget.insert(tk.END, "Nessuna analisi precedente trovata.")
-        else:
-            history_text_widget.insert(tk.END, "--- Storico delle Analisi Effettuate ---\n\n", ('title',))
-            
-            for entry in history_data:
-                history_text_widget.insert(tk.END, f"ID Analisi: ", ('label',))
-                history_text_widget.insert(tk.END, f"{entry['id']}\n", ('text',))
-                history_text_widget.insert(tk.END, f"Data/Ora: ", ('label',))
-                history_text_widget.insert(tk.END, f"{entry['analysis_datetime']}\n", ('text',))
-                history_text_widget.insert(tk.END, f"File Log Input: ", ('label',))
-                history_text_widget.insert(tk.END, f"{entry['log_filepath']}\n", ('text',))
-                history_text_widget.insert(tk.END, f"File PDF Output: ", ('label',))
-                history_text_widget.insert(tk.END, f"{entry['pdf_output_filepath']}\n", ('text',))
-                
-                # Bottone per aprire direttamente il PDF del report
-                pdf_button = tk.Button(history_text_widget, text="🔗 Apri Report", 
-                                        command=lambda path=entry['pdf_output_filepath']: self.open_pdf(path),
-                                        bg=COLOR_SECONDARY, fg=COLOR_TEXT_LIGHT, font=("Helvetica", 8, "bold"), 
-                                        relief=tk.FLAT, padx=5, pady=2, cursor="hand2",
-                                        activebackground=COLOR_ACCENT, activeforeground=COLOR_TEXT_LIGHT)
-                history_text_widget.window_create(tk.END, window=pdf_button)
-                history_text_widget.insert(tk.END, "\n\n", ('spacer',))
-        
-        # Definisci i tag per lo stile (opzionale, migliora la leggibilità)
-        history_text_widget.tag_configure('title', font=FONT_TITLE, foreground=COLOR_PRIMARY, spacing3=10)
-        history_text_widget.tag_configure('label', font=FONT_PRIMARY_BOLD, foreground=COLOR_PRIMARY)
-        history_text_widget.tag_configure('text', font=FONT_PRIMARY, foreground=COLOR_TEXT_DARK)
-        history_text_widget.tag_configure('spacer', spacing1=5)
+        def open_selected(event=None):
+            selection = history_table.selection()
+            if selection:
+                self.open_pdf(history_table.set(selection[0], "pdf_output_filepath"))
+
+        prev_button.config(command=previous_page)
+        next_button.config(command=next_page)
+        open_button.config(command=open_selected)
+        history_table.bind("<Double-1>", open_selected) # Doppio clic apre il report
 
-        history_text_widget.config(state='disabled')
+        load_page()
 
     def open_pdf(self, filepath):
         """
@@ -306,6 +589,27 @@ class SecurityLogAnalyzerGUI:
             messagebox.showerror("Errore", f"Impossibile aprire il file PDF: {e}", icon='error')
             self._thread_safe_print_output(f"Errore nell'apertura del PDF: {e}")
 
+    def on_close(self):
+        """
+        Chiude l'applicazione dopo aver completato le scritture nel database ancora in coda,
+        attendendo al massimo DB_WRITER_TIMEOUT secondi (quelle non riuscite o non completate
+        restano nel journal e vengono riscritte al prossimo avvio). Le analisi in corso non
+        vengono attese: quelle già oltre la lettura del log (modello, report) terminano nei
+        processi del pool senza bloccare la finestra, e i loro risultati non vengono salvati.
+        """
+        for job_id in self._active_jobs():
+            self.jobs[job_id]["progress"].cancel() # Le analisi in corso si fermano al blocco successivo
+        self.print_output("Completamento delle scritture nel database in corso...")
+        self.master.update_idletasks()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+        for submit in self._pending_submits:
+            self.db_writer.submit(*submit) # Database non ancora inizializzato: scritte (o nel journal) dal writer
+        self.db_writer.close(timeout=DB_WRITER_TIMEOUT)
+        self.master.destroy()
+
     def confirm_reset(self):
         """
         Chiede conferma all'utente e, se accetta, resetta il sistema (database e report).
@@ -318,9 +622,23 @@ class SecurityLogAnalyzerGUI:
         )
         if response:
             self.print_output("Reset del sistema in corso...")
+            # Le scritture in coda e il journal non devono finire nel database appena ricreato
+            if not self.db_writer.flush(timeout=DB_WRITER_TIMEOUT):
+                self.print_output("ATTENZIONE: scritture nel database ancora in corso, reset non eseguito.")
+                return
+            if not self.db_writer.discard_journal(timeout=DB_WRITER_TIMEOUT):
+                self.print_output("ATTENZIONE: riscrittura del journal ancora in corso, reset non eseguito.")
+                return
             reset_all()
             self.print_output("Sistema resettato con successo!")
             self.log_filepath.set("")
+            self.selected_files = []
+            # I report delle analisi già terminate sono stati eliminati
+            self.jobs.clear()
+            self._pending_submits = []
+            self.jobs_table.delete(*self.jobs_table.get_children())
+            self.progress_bar.config(value=0)
+            self.progress_label.config(text="")
             self.print_output("Benvenuto nell'Analizzatore Log di Sicurezza Avanzato.\nSeleziona un file di log per iniziare l'analisi.")
 
 if __name__ == "__main__":
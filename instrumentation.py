@@ -0,0 +1,284 @@
+# instrumentation.py
+# Misure per fase della pipeline di analisi (parsing, rilevamento anomalie, report,
+# database): tempo reale, tempo CPU, picco di memoria, righe lette, eventi trovati e
+# righe scritte. Ogni analisi produce un record strutturato salvato nel database
+# accanto allo storico, esportabile come file di testo Prometheus (textfile collector
+# di node_exporter) e, opzionalmente, accompagnato da un profilo cProfile.
+
+import cProfile
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_TEXTFILE = os.path.join("output", "metrics", "log_analyzer.prom") # File letto da node_exporter (None = nessuna esportazione)
+PROFILE_ENABLED = False                                 # Profila ogni analisi con cProfile (rallenta l'esecuzione)
+PROFILE_DIR = os.path.join("output", "profiles")        # Cartella dei profili (.prof, leggibili con pstats o snakeviz)
+
+COUNTERS = ("lines", "events", "rows")  # Quantità elaborate registrate per ogni fase
+
+_RUSAGE_UNIT = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss: byte su macOS, KB su Linux
+_active_stages = 0               # Fasi in corso nel processo (il picco si azzera solo senza fasi aperte)
+_active_lock = threading.Lock()
+
+
+def _reset_peak_rss():
+    """
+    Azzera il picco di memoria residente del processo (VmHWM) scrivendo "5" in
+    /proc/self/clear_refs (Linux). Restituisce False se non è possibile: il picco
+    resta quello dall'avvio del processo (ru_maxrss).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _process_peak_rss_mb():
+    # Picco dall'ultimo azzeramento (VmHWM), oppure dall'avvio del processo (ru_maxrss)
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / _RUSAGE_UNIT
+
+
+def _children_peak_rss_mb():
+    # Picco del più grande processo figlio terminato (non azzerabile)
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / _RUSAGE_UNIT
+
+
+def _cpu_seconds():
+    # Tempo CPU (utente + sistema) del processo, di tutti i suoi thread e dei figli terminati:
+    # la differenza tra inizio e fine di una fase include i worker terminati durante la fase
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class Stage:
+    """
+    Misura di una fase: usata da RunMetrics.stage() o da sola con measure().
+    I conteggi si aggiungono con count(lines=..., events=..., rows=...).
+    'peak_rss_mb' è il picco di memoria residente durante la fase: su Linux il picco del
+    processo viene azzerato all'inizio della fase (se nessun'altra fase è aperta, altrimenti
+    include anche la parte già trascorsa di quella esterna); altrove è il picco dall'avvio
+    del processo. Se durante la fase sono terminati processi figli più grandi (es. i worker
+    del parsing), vale il loro picco.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+        self._wall = self._cpu = self._children_peak = None
+        self.record = None
+
+    def count(self, **counts):
+        for key, value in counts.items():
+            if value is not None:
+                self.counts[key] = self.counts.get(key, 0) + value
+
+    def start(self):
+        global _active_stages
+        with _active_lock:
+            if not _active_stages:
+                _reset_peak_rss()
+            _active_stages += 1
+        self._children_peak = _children_peak_rss_mb()
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_seconds()
+
+    def stop(self, error=None):
+        global _active_stages
+        with _active_lock:
+            _active_stages -= 1
+        peak = _process_peak_rss_mb()
+        children_peak = _children_peak_rss_mb()
+        if children_peak > self._children_peak:
+            peak = max(peak, children_peak) # Un figlio terminato durante la fase ha superato i precedenti
+        self.record = {
+            "stage": self.name,
+            "wall_seconds": round(time.perf_counter() - self._wall, 6),
+            "cpu_seconds": round(_cpu_seconds() - self._cpu, 6),
+            "peak_rss_mb": round(peak, 1),
+            **{key: self.counts.get(key) for key in COUNTERS},
+            "error": error,
+        }
+        return self.record
+
+
+@contextmanager
+def measure(name, records=None):
+    """
+    Misura il blocco 'with' come fase 'name'; al termine stage.record contiene il
+    risultato (anche se il blocco solleva un'eccezione, che viene rilanciata) e,
+    se indicata, viene aggiunto alla lista 'records'.
+
+    Esempio:
+        with measure("db_write") as stage:
+            ...
+            stage.count(rows=n)
+    """
+    stage = Stage(name)
+    stage.start()
+    try:
+        yield stage
+    except BaseException as e:
+        stage.stop(f"{type(e).__name__}: {e}")
+        raise
+    else:
+        stage.stop()
+    finally:
+        if records is not None and stage.record is not None:
+            records.append(stage.record)
+
+
+class RunMetrics:
+    """
+    Record delle misure di un'analisi (una "run").
+    - stage(name) misura una fase; le fasi sono registrate nell'ordine di esecuzione.
+    - Con 'profile' (default PROFILE_ENABLED) l'intera run viene profilata con cProfile
+      (solo il thread chiamante) e finish() salva il profilo in PROFILE_DIR.
+    - to_record() restituisce il record come dizionario (serializzabile con pickle e
+      JSON), il formato passato al database tramite analysis_record.
+    """
+
+    def __init__(self, log_filepath, profile=None):
+        self.run_id = uuid.uuid4().hex
+        self.log_filepath = log_filepath
+        self.started_at = datetime.now()
+        self.stages = []
+        self.profile_path = None
+        self._start = time.perf_counter()
+        self._seconds = None
+        self._profiler = None
+        if PROFILE_ENABLED if profile is None else profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stage(self, name):
+        """
+        Misura una fase della run (context manager, vedi measure).
+        """
+        return measure(name, self.stages)
+
+    def finish(self):
+        """
+        Chiude la run: ferma il profiler (salvando il profilo) e registra la durata totale.
+        Restituisce il record (vedi to_record).
+        """
+        if self._seconds is None:
+            self._seconds = time.perf_counter() - self._start
+            if self._profiler is not None:
+                self._profiler.disable()
+                try:
+                    os.makedirs(PROFILE_DIR, exist_ok=True)
+                    self.profile_path = os.path.join(
+                        PROFILE_DIR, f"run_{self.started_at.strftime('%Y%m%d_%H%M%S')}_{self.run_id[:8]}.prof")
+                    self._profiler.dump_stats(self.profile_path)
+                except OSError as e:
+                    print(f"Impossibile salvare il profilo cProfile: {e}")
+                    self.profile_path = None
+                self._profiler = None
+        return self.to_record()
+
+    def to_record(self):
+        seconds = self._seconds if self._seconds is not None else time.perf_counter() - self._start
+        return {
+            "run_id": self.run_id,
+            "log_filepath": self.log_filepath,
+            "started_at": self.started_at,
+            "total_seconds": round(seconds, 6),
+            "profile_path": self.profile_path,
+            "stages": list(self.stages),
+        }
+
+
+def format_stages(record):
+    """
+    Riassume in una riga i tempi delle fasi di una run (per il log della GUI e della CLI).
+    """
+    parts = [f"{stage['stage']} {stage['wall_seconds']:.2f} s" for stage in record["stages"]]
+    return f"{', '.join(parts)} (totale {record['total_seconds']:.2f} s)"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Metriche esportate per fase: (nome della metrica, chiave nel record della fase, descrizione)
+PROMETHEUS_STAGE_METRICS = (
+    ("wall_seconds", "wall_seconds", "Tempo reale della fase nell'ultima analisi"),
+    ("cpu_seconds", "cpu_seconds", "Tempo CPU (processo e worker) della fase nell'ultima analisi"),
+    ("peak_rss_bytes", "peak_rss_mb", "Picco di memoria residente durante la fase"),
+    ("lines", "lines", "Righe di log lette nella fase"),
+    ("events", "events", "Eventi trovati nella fase"),
+    ("rows", "rows", "Righe scritte nel database nella fase"),
+)
+
+
+def format_prometheus(record, prefix="log_analyzer"):
+    """
+    Converte il record di una run nel formato di testo di Prometheus: un gauge per
+    ogni misura con etichetta 'stage', più durata e istante dell'analisi.
+    """
+    lines = []
+    for name, key, description in PROMETHEUS_STAGE_METRICS:
+        samples = []
+        for stage in record["stages"]:
+            value = stage.get(key)
+            if value is None:
+                continue
+            if key == "peak_rss_mb":
+                value = int(value * 1024 * 1024)
+            samples.append(f'{prefix}_stage_{name}{{stage="{_escape_label(stage["stage"])}"}} {value}')
+        if samples:
+            lines.append(f"# HELP {prefix}_stage_{name} {description}.")
+            lines.append(f"# TYPE {prefix}_stage_{name} gauge")
+            lines.extend(samples)
+    errors = sum(1 for stage in record["stages"] if stage.get("error"))
+    started_at = record["started_at"]
+    lines += [
+        f"# HELP {prefix}_run_seconds Durata totale dell'ultima analisi.",
+        f"# TYPE {prefix}_run_seconds gauge",
+        f"{prefix}_run_seconds {record['total_seconds']}",
+        f"# HELP {prefix}_run_timestamp_seconds Istante di avvio dell'ultima analisi (epoch).",
+        f"# TYPE {prefix}_run_timestamp_seconds gauge",
+        f"{prefix}_run_timestamp_seconds {started_at.timestamp() if isinstance(started_at, datetime) else started_at}",
+        f"# HELP {prefix}_run_failed_stages Fasi terminate con errore nell'ultima analisi.",
+        f"# TYPE {prefix}_run_failed_stages gauge",
+        f"{prefix}_run_failed_stages {errors}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(record, path=None):
+    """
+    Scrive le metriche della run nel file di testo per il textfile collector di
+    node_exporter (default METRICS_TEXTFILE). Il file viene sostituito in modo
+    atomico, così node_exporter non legge mai un file scritto a metà.
+    Restituisce il percorso scritto, oppure None se l'esportazione è disattivata o fallisce.
+    """
+    path = path or METRICS_TEXTFILE
+    if not path:
+        return None
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(format_prometheus(record))
+        os.replace(tmp_path, path)
+        return path
+    except OSError as e:
+        print(f"Impossibile esportare le metriche Prometheus: {e}")
+        return None
@@ -1,21 +1,412 @@
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import re
+from functools import partial
+
+from events import EVENT_TYPES, EventBatch, SshEvent
+
+# Timestamp di una riga: RFC 3339 (es. "2024-01-10T12:34:56+00:00", rsyslog con
+# formato ad alta precisione) oppure syslog classico (es. "Jan 10 12:34:56")
+_TIMESTAMP = r"(\d{4}-\d\d-\d\dT\S+|\S+ +\S+ \S+)"
+
+# Espressione unica che classifica ogni riga sshd in un solo passaggio ed estrae
+# timestamp, host, pid, tipo di evento, utente, IP e porta. Si applica (findall in C)
+# alle sole righe candidate trovate dal prefiltro sui byte: le righe che non sono
+# eventi noti vengono saltate.
+SSHD_EVENT_PATTERN = re.compile(
+    r"^" + _TIMESTAMP + r" (\S+) sshd(?:-session)?\[(\d+)\]: "                  # timestamp, host, pid
+    r"(?:message repeated \d+ times: \[ )?(?:pam_unix\(sshd:session\): )?"
+    r"(" + "|".join(re.escape(event_type) for event_type in EVENT_TYPES) + r") "  # tipo di evento
+    r"(?:for (?:invalid user |user (?!from ))?)?([^\s(]*)"                      # utente
+    r"(?: from (\S+)(?: port (\d+))?)?.*",                                    # IP e porta
+    re.MULTILINE)
+
+_new_event = partial(tuple.__new__, SshEvent)  # Costruisce un SshEvent da una tupla senza passare da Python
+
+# Marcatori (in byte) cercati dal prefiltro: solo le righe che ne contengono uno vengono
+# decodificate e passate a SSHD_EVENT_PATTERN (i prefissi comuni riducono le scansioni)
+EVENT_MARKERS = (b"Failed ", b"Accepted ", b"Invalid user ", b"session ")
+
+# Marcatore delle righe di accesso fallito cercate dal percorso veloce di iter_log_events
+FAILED_MARKER = b"Failed password"
+
+# Righe di accesso fallito con un formato diverso da quello abituale di sshd
+# ("... from IP port N ssh2"): estrazione di riserva di timestamp, utente e IP
+FAILED_LINE_PATTERN = re.compile(_TIMESTAMP + r" .*?Failed password for (?:invalid user )?(\S*) ?from (\S+)")
+
+# Quota di righe candidate oltre la quale un blocco viene decodificato per intero invece
+# di cercare i marcatori riga per riga; la quota è stimata sui primi DENSITY_SAMPLE byte
+DENSE_RATIO = 0.25
+DENSITY_SAMPLE = 1 << 16
+
+# Dimensione dei blocchi (in byte) letti dal file mappato in memoria
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Firme (magic number) dei formati compressi supportati -> funzione di apertura
+COMPRESSED_FORMATS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+
+
+def _compressed_opener(filepath):
+    """
+    Restituisce la funzione di apertura adatta se il file è compresso
+    (gzip, bzip2 o xz, riconosciuti dai primi byte), altrimenti None.
+    """
+    with open(filepath, 'rb') as file:
+        header = file.read(6)
+    for magic, opener in COMPRESSED_FORMATS:
+        if header.startswith(magic):
+            return opener
+    return None
+
+
+def is_compressed(filepath):
+    """
+    Indica se il file di log è compresso (gzip, bzip2 o xz).
+    """
+    return _compressed_opener(filepath) is not None
+
+
+def open_log(filepath, mode='r'):
+    """
+    Apre un file di log, decomprimendolo in modo trasparente se necessario.
+
+    Args:
+        filepath (str): Percorso del file (es. auth.log, auth.log.2.gz).
+        mode (str): 'r' per la lettura come testo, 'rb' per la lettura binaria.
+
+    Returns:
+        file: Oggetto file in lettura.
+    """
+    opener = _compressed_opener(filepath)
+    if opener is None:
+        return open(filepath, mode)
+    return opener(filepath, 'rt' if mode == 'r' else 'rb')
+
+
 def parse_log(filepath):
     """
-    Analizza un file di log e restituisce una lista di eventi di accesso fallito.
-    Ogni evento è rappresentato da un dizionario con chiavi 'ip' e 'timestamp'.
+    Analizza un file di log (anche compresso con gzip, bzip2 o xz) e restituisce una
+    lista di eventi di accesso fallito.
+    Ogni evento è rappresentato da un dizionario con chiavi 'ip', 'timestamp' e 'user'.
+
+    Args:
+        filepath (str): Percorso del file di log da analizzare.
+
+    Returns:
+        list: Lista di dizionari, ciascuno con 'ip', 'timestamp' e 'user' di un tentativo fallito.
+    """
+    events = []
+    for chunk_events in _iter_failed_event_lists(_iter_file_chunks(filepath)):
+        events += chunk_events
+    return events
+
+
+def _iter_chunks(buf, start, end, chunk_size=CHUNK_SIZE):
+    """
+    Divide l'intervallo [start, end) del buffer in blocchi che terminano sempre
+    su un fine riga, così nessuna riga viene spezzata tra due blocchi.
+    """
+    pos = start
+    while pos < end:
+        chunk_end = min(pos + chunk_size, end)
+        if chunk_end < end:
+            newline = buf.rfind(b"\n", pos, chunk_end)
+            if newline != -1:
+                chunk_end = newline + 1
+        yield buf[pos:chunk_end]
+        pos = chunk_end
+
+
+def _iter_stream_chunks(stream, chunk_size=CHUNK_SIZE):
+    """
+    Legge uno stream binario (es. un file decompresso) a blocchi che terminano
+    sempre su un fine riga, riportando la riga incompleta nel blocco successivo.
+    """
+    remainder = b""
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        data = remainder + data
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            remainder = data  # Nessun fine riga: continua ad accumulare
+            continue
+        yield data[:cut]
+        remainder = data[cut:]
+    if remainder:
+        yield remainder
+
+
+def _iter_file_chunks(filepath, start=0, end=None, on_chunk=None):
+    """
+    Legge il file a blocchi di righe complete: mappato in memoria (mmap) se non è
+    compresso, altrimenti decompresso in streaming (in questo caso l'intervallo di
+    byte non è supportato e il file viene sempre letto per intero).
+    Se indicata, on_chunk(nbytes) viene chiamata quando il consumatore ha elaborato un
+    blocco, con i byte del file (compressi, per i file compressi) consumati nel frattempo:
+    un'eccezione sollevata da on_chunk interrompe la lettura (annullamento cooperativo).
+    """
+    opener = _compressed_opener(filepath)
+    if opener is not None:
+        if start != 0 or end is not None:
+            raise ValueError(f"Intervalli di byte non supportati per i file compressi: {filepath}")
+        with open(filepath, 'rb') as raw, opener(raw, 'rb') as stream:
+            if on_chunk is None:
+                yield from _iter_stream_chunks(stream)
+                return
+            position = 0
+            for chunk in _iter_stream_chunks(stream):
+                yield chunk
+                # Posizione nel file compresso: l'avanzamento si misura sui byte su disco
+                on_chunk(raw.tell() - position)
+                position = raw.tell()
+        return
+
+    with open(filepath, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if end is None or end > size:
+            end = size
+        if size == 0 or start >= end:
+            return  # mmap non accetta file vuoti
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if on_chunk is None:
+                yield from _iter_chunks(mm, start, end)
+                return
+            for chunk in _iter_chunks(mm, start, end):
+                yield chunk
+                on_chunk(len(chunk))
+
+
+def _count_lines(chunk):
+    # count() scorre il blocco in C: costo trascurabile rispetto all'estrazione dei campi
+    return chunk.count(b"\n") + (not chunk.endswith(b"\n"))
+
+
+def _is_dense(chunk, markers):
+    # Stima la quota di righe candidate su un campione iniziale del blocco
+    sample = chunk[:DENSITY_SAMPLE]
+    return sum(sample.count(marker) for marker in markers) > sample.count(b"\n") * DENSE_RATIO
+
+
+def _marked_lines(chunk, markers):
+    """
+    Restituisce, in ordine, le righe (in byte) del blocco che contengono almeno uno dei
+    marcatori. La ricerca salta da un'occorrenza alla successiva con bytes.find, senza
+    decodificare né dividere le righe intermedie.
+    """
+    find = chunk.find
+    rfind = chunk.rfind
+    spans = []
+    for marker in markers:
+        pos = find(marker)
+        while pos != -1:
+            line_start = rfind(b"\n", 0, pos) + 1
+            line_end = find(b"\n", pos)
+            if line_end == -1:
+                line_end = len(chunk)
+            spans.append((line_start, line_end))
+            pos = find(marker, line_end)
+    if len(markers) > 1:
+        spans = sorted(set(spans))  # Una riga può contenere più marcatori
+    return [chunk[line_start:line_end] for line_start, line_end in spans]
+
+
+def _iter_chunk_findall(chunks, stats=None, markers=EVENT_MARKERS):
+    """
+    Applica SSHD_EVENT_PATTERN alle righe di ogni blocco che contengono uno dei marcatori
+    e restituisce, per blocco, la lista delle tuple dei campi (timestamp, host, pid, tipo,
+    utente, IP, porta). Se le righe candidate sono più di DENSE_RATIO (vedi _is_dense),
+    il prefiltro non conviene e il blocco viene decodificato per intero.
+    """
+    findall = SSHD_EVENT_PATTERN.findall
+    for chunk in chunks:
+        if stats is not None:
+            stats["lines"] = stats.get("lines", 0) + _count_lines(chunk)
+        if _is_dense(chunk, markers):
+            yield findall(chunk.decode("utf-8", "replace"))
+        else:
+            marked = _marked_lines(chunk, markers)
+            yield findall(b"\n".join(marked).decode("utf-8", "replace")) if marked else []
+
+
+def _failed_events(lines):
+    """
+    Estrae 'ip', 'timestamp' e 'user' dalle righe (str) di accesso fallito. Le righe nel
+    formato abituale di sshd vengono divise con split() e lette per posizione (come il
+    parser originale); le altre passano da FAILED_LINE_PATTERN.
+    """
+    events = []
+    append = events.append
+    match = FAILED_LINE_PATTERN.match
+    for line in lines:
+        fields = line.split()
+        # "... Failed password for [invalid user] UTENTE from IP port N ssh2"
+        if len(fields) >= 9 and fields[-3] == "port" and fields[-5] == "from":
+            timestamp = fields[0]
+            append({"ip": fields[-4],
+                    "timestamp": timestamp if "T" in timestamp else " ".join(fields[0:3]),
+                    "user": None if fields[-7] == "invalid" else fields[-6]})
+        else:
+            found = match(line)
+            if found:
+                append({"ip": found[3], "timestamp": found[1], "user": found[2] or None})
+    return events
+
+
+def _iter_failed_event_lists(chunks, stats=None):
+    """
+    Percorso veloce dei soli accessi falliti: restituisce, per blocco, la lista degli
+    eventi. Nei blocchi con poche righe "Failed password" le righe vengono trovate con
+    bytes.find e solo quelle vengono decodificate; se sono più di DENSE_RATIO (vedi
+    _is_dense) il blocco viene decodificato per intero e filtrato con 'in'.
+    """
+    markers = (FAILED_MARKER,)
+    for chunk in chunks:
+        if _is_dense(chunk, markers):
+            text = chunk.decode("utf-8", "replace")
+            lines = text.split("\n")
+            line_count = len(lines) - (not lines[-1])
+            candidates = [line for line in lines if "Failed password" in line]
+        else:
+            line_count = _count_lines(chunk)
+            marked = _marked_lines(chunk, markers)
+            candidates = b"\n".join(marked).decode("utf-8", "replace").split("\n") if marked else []
+        if stats is not None:
+            stats["lines"] = stats.get("lines", 0) + line_count
+        yield _failed_events(candidates)
+
+
+def iter_chunk_records(chunks, stats=None, types=None):
+    """
+    Estrae in un solo passaggio tutti gli eventi sshd noti (events.EVENT_TYPES) da una
+    sequenza di blocchi di byte che contengono solo righe complete.
+
+    Args:
+        chunks (iterable): Blocchi di byte (bytes o slice di mmap).
+        stats (dict): Se indicato, vi vengono sommate le righe lette ('lines').
+        types (set): Tipi di evento da restituire (None = tutti).
+
+    Yields:
+        SshEvent: Evento con timestamp, host, pid, tipo, utente, IP e porta.
+    """
+    markers = EVENT_MARKERS if types is None else tuple(event_type.encode() for event_type in types)
+    for matches in _iter_chunk_findall(chunks, stats, markers):
+        if types is None:
+            yield from map(_new_event, matches)
+        else:
+            yield from [_new_event(match) for match in matches if match[3] in types]
+
+
+def iter_log_records(filepath, start=0, end=None, stats=None, types=None):
+    """
+    Restituisce uno alla volta gli eventi sshd tipizzati del file (accessi falliti e
+    riusciti, utenti non validi, aperture e chiusure di sessione), letti in streaming
+    come in iter_log_events: un'unica lettura del file basta per tutti i tipi di evento.
+    Per riga è più lento del percorso originale "in" + split() (circa x3.5 sui file di
+    sample_logs/, vedi benchmarks/bench_extractor.py): la costruzione di un SshEvent con
+    sette campi costa da sola quanto l'intero percorso originale, che conserva solo l'IP.
+
+    Args:
+        filepath (str): Percorso del file di log da analizzare.
+        start (int): Offset in byte da cui iniziare (deve essere l'inizio di una riga).
+        end (int): Offset in byte a cui fermarsi (None = fine del file).
+        stats (dict): Se indicato, vi vengono sommate le righe lette ('lines').
+        types (set): Tipi di evento da restituire (None = tutti, vedi events.EVENT_TYPES).
+
+    Yields:
+        SshEvent: Evento con timestamp, host, pid, tipo, utente, IP e porta.
+    """
+    return iter_chunk_records(_iter_file_chunks(filepath, start, end), stats, types)
+
+
+def iter_chunk_events(chunks, stats=None):
+    """
+    Estrae gli eventi di accesso fallito ("Failed password") da una sequenza di blocchi
+    di byte. Ogni blocco deve contenere solo righe complete (terminare su un fine riga o
+    alla fine dei dati). Percorso veloce dedicato: trova le righe con un prefiltro sui
+    byte ed estrae solo IP, timestamp e utente (per tutti i tipi di evento vedi
+    iter_chunk_records).
+
+    Args:
+        chunks (iterable): Blocchi di byte (bytes o slice di mmap).
+        stats (dict): Se indicato, vi vengono sommate le righe lette ('lines').
+
+    Yields:
+        dict: Dizionario con 'ip', 'timestamp' e 'user' (None se assente) di un tentativo fallito.
+    """
+    for events in _iter_failed_event_lists(chunks, stats):
+        yield from events
+
+
+def iter_log_events(filepath, start=0, end=None, stats=None, on_chunk=None):
+    """
+    Variante in streaming di parse_log: mappa il file in memoria (mmap), cerca le
+    righe "Failed password" a blocchi con il prefiltro sui byte e restituisce gli eventi
+    di accesso fallito uno alla volta (vedi iter_chunk_events). La memoria occupata resta
+    costante indipendentemente dalla dimensione del file; la velocità su un singolo processo
+    è invece simile a quella di parse_log (domina la costruzione dei dizionari): per
+    aumentarla il file va diviso tra più processi (vedi parallel_engine.analyze_parallel).
+
+    I file compressi (gzip, bzip2, xz) vengono decompressi in streaming; per questi
+    l'intervallo di byte non è supportato e il file viene sempre letto per intero.
+
+    Args:
+        filepath (str): Percorso del file di log da analizzare.
+        start (int): Offset in byte da cui iniziare (deve essere l'inizio di una riga).
+        end (int): Offset in byte a cui fermarsi (None = fine del file).
+        stats (dict): Se indicato, vi vengono sommate le righe lette ('lines').
+        on_chunk (callable): Se indicata, chiamata con i byte del file consumati dopo
+            ogni blocco elaborato (avanzamento); se solleva un'eccezione la lettura
+            si interrompe alla fine del blocco (annullamento).
+
+    Yields:
+        dict: Dizionario con 'ip', 'timestamp' e 'user' (None se assente) di un tentativo fallito.
+    """
+    return iter_chunk_events(_iter_file_chunks(filepath, start, end, on_chunk), stats)
+
+
+def iter_log_batches(filepath, batch_size=10000, start=0, end=None):
+    """
+    Come iter_log_events, ma raggruppa gli eventi in liste di dimensione fissa.
+    Utile per i consumatori che elaborano gli eventi a blocchi.
+
+    Args:
+        filepath (str): Percorso del file di log da analizzare.
+        batch_size (int): Numero massimo di eventi per blocco.
+        start (int): Offset in byte da cui iniziare.
+        end (int): Offset in byte a cui fermarsi (None = fine del file).
+
+    Yields:
+        list: Lista di al massimo 'batch_size' eventi.
+    """
+    batch = []
+    for event in iter_log_events(filepath, start, end):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_log_compact(filepath):
+    """
+    Come parse_log, ma restituisce gli eventi in un EventBatch compatto (IP internati
+    in una tabella e timestamp come secondi interi in colonne array), invece di una
+    lista di dizionari. Il file viene letto in streaming con iter_log_events.
 
     Args:
         filepath (str): Percorso del file di log da analizzare.
 
     Returns:
-        list: Lista di dizionari, ciascuno con 'ip' e 'timestamp' di un tentativo fallito.
-    """
-    entries = []
-    with open(filepath, 'r') as file:
-        for line in file:
-            # Considera solo le righe che contengono "Failed password"
-            if "Failed password" in line:
-                parts = line.split()
-                ip = parts[-4]  # Estrae l'IP dalla posizione attesa nella riga
-                timestamp = " ".join(parts[0:3])  # Estrae il timestamp (es: "Jan 10 12:34:56")
-                entries.append({"ip": ip, "timestamp": timestamp})
-    return entries
\ No newline at end of file
+        EventBatch: Contenitore compatto dei tentativi falliti.
+    """
+    return EventBatch.from_events(iter_log_events(filepath))
@@ -1,18 +1,27 @@
 ### main
 
-import tkinter as tk
-from gui import SecurityLogAnalyzerGUI   # Importa la classe GUI principale
-from database import init_db             # Importa la funzione per inizializzare il database
+from startup import elapsed, record_startup # Importato per primo: misura il tempo di avvio
+import sys
+
+def _report_startup():
+    # Chiamata quando la finestra è stata disegnata ed è pronta a ricevere input
+    record = record_startup(elapsed())
+    print(f"Finestra pronta in {record['seconds']:.3f} s.")
 
 if __name__ == "__main__":
-    # Inizializza il database (crea le tabelle se non esistono)
-    init_db()
+    if len(sys.argv) > 1:
+        # Con argomenti: modalità batch senza interfaccia grafica (vedi cli.py)
+        from cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    import tkinter as tk
+    from gui import SecurityLogAnalyzerGUI   # Importa la classe GUI principale
 
     # Crea la finestra principale Tkinter
     root = tk.Tk()
     # Istanzia e avvia l'interfaccia grafica dell'analizzatore di log
+    # (il database viene inizializzato dalla GUI, in background)
     app = SecurityLogAnalyzerGUI(root)
+    root.after_idle(_report_startup)
     # Avvia il loop principale della GUI
     root.mainloop()
-
-
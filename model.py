@@ -1,40 +1,46 @@
-from sklearn.ensemble import IsolationForest
+from analyzer import analyze_events
+from events import EventBatch
+from features import build_feature_matrix
+from model_store import model_name
 
 
-def detect_anomalies(summary):
+def detect_anomalies(summary, store=None, source=None):
     """
     Rileva IP anomali utilizzando Isolation Forest.
-    Analizza la frequenza degli IP e la distribuzione oraria degli eventi.
+    Analizza per ogni IP numero di tentativi, distribuzione oraria, utenti tentati
+    e intensità delle raffiche (vedi features.build_feature_matrix).
 
     Args:
-        summary (dict): Dizionario con 'ip_counter' e 'hourly_counter'.
+        summary (dict | EventBatch): Dizionario con 'ip_counter' e 'hourly_counter',
+            oppure direttamente un EventBatch (che viene prima aggregato).
+        store (ModelStore): Archivio dei modelli addestrati (es. cli.get_model_store()):
+            il modello salvato viene riutilizzato e riaddestrato solo quando necessario.
+            None addestra ogni volta un modello nuovo, senza salvarlo.
+        source (str): Percorso del log analizzato: con 'store' ogni sorgente ha il proprio
+            modello, separato per i riepiloghi approssimati (vedi model_store.model_name).
 
     Returns:
         list: Lista di IP rilevati come anomali.
     """
-    ip_counter = summary["ip_counter"]
-    hourly_counter = summary["hourly_counter"]
+    if isinstance(summary, EventBatch):
+        summary = analyze_events(summary)
 
-    data = []   # Lista delle feature per ogni IP (numero tentativi, ora media)
-    ips = []    # Lista degli IP corrispondenti
+    # Matrice delle feature per IP (tentativi, distribuzione oraria, utenti, raffiche)
+    ips, data = build_feature_matrix(summary)
 
-    for ip, count in ip_counter.items():
-        total_attempts = sum(hourly_counter.values())
-        if total_attempts == 0:
-            ora_media = 0
-        else:
-            # Calcola l'ora media ponderata degli eventi
-            ora_media = sum(hour * freq for hour, freq in hourly_counter.items()) / total_attempts
-        data.append([count, ora_media])
-        ips.append(ip)
-
-    if not data:
+    if not ips:
         return []  # Nessun dato da analizzare
 
     try:
-        # Crea e addestra il modello Isolation Forest per rilevare outlier
-        model = IsolationForest(contamination=0.2, random_state=42)
-        preds = model.fit_predict(data)
+        if store is not None:
+            # Riutilizza il modello salvato (se ancora valido) senza riaddestrarlo
+            model, _ = store.get_model(data, model_name(source, summary.get("sketch") is not None))
+            preds = model.predict(data)
+        else:
+            # Crea e addestra il modello Isolation Forest per rilevare outlier
+            from sklearn.ensemble import IsolationForest # Import lazy: scikit-learn è lento da caricare
+            model = IsolationForest(contamination=0.2, random_state=42)
+            preds = model.fit_predict(data)
         # Gli IP con predizione -1 sono considerati anomali
         anomalous_ips = [ip for ip, pred in zip(ips, preds) if pred == -1]
         return anomalous_ips
@@ -0,0 +1,167 @@
+# model_store.py
+# Archivio su disco dei modelli Isolation Forest già addestrati.
+
+import hashlib
+import os
+import pickle
+import time
+
+import numpy as np
+
+from features import FEATURE_NAMES
+from parallel_engine import ROTATED_SUFFIX
+
+MODEL_DIR = "models"            # Cartella in cui vengono salvati i modelli
+MODEL_MAX_AGE = 24 * 3600       # Età massima (secondi) prima di un riaddestramento programmato
+DRIFT_THRESHOLD = 1.0           # Deriva (in deviazioni standard) di una feature oltre cui riaddestrare
+
+# Feature controllate per la deriva: le quote orarie sono riassunte da ora_media e ora_dev_std
+DRIFT_FEATURES = [index for index, name in enumerate(FEATURE_NAMES) if not name.startswith("quota_ora_")]
+
+# Parametri del modello: cambiarli invalida i modelli salvati
+MODEL_PARAMS = {"contamination": 0.2, "random_state": 42}
+
+
+def model_name(source=None, approximate=False):
+    """
+    Restituisce il nome del modello salvato per un log: ogni sorgente ha il proprio modello
+    (il file corrente di una rotazione e i suoi file ruotati, es. auth.log.2.gz, lo
+    condividono), separato per i riepiloghi approssimati. Senza sorgente restituisce il
+    modello comune ('default' o 'approx').
+    """
+    name = "approx" if approximate else "default"
+    if source is None:
+        return name
+    path = ROTATED_SUFFIX.sub("", os.path.abspath(source))
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+    return f"{name}-{os.path.basename(path)}-{digest}"
+
+
+def fingerprint(data):
+    """
+    Calcola l'impronta (SHA-256) di una matrice di feature, usata per riconoscere
+    un insieme di addestramento già visto.
+    """
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    digest = hashlib.sha256(str(data.shape).encode())
+    digest.update(data.tobytes())
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """
+    Conserva su disco i modelli addestrati insieme allo schema delle feature,
+    all'impronta dei dati di addestramento e alle loro statistiche.
+    Un modello salvato viene riutilizzato per valutare nuovi dati senza riaddestrarlo,
+    finché non è troppo vecchio o finché i nuovi dati non si discostano troppo
+    (deriva delle feature) da quelli di addestramento.
+    """
+
+    def __init__(self, directory=MODEL_DIR, max_age=MODEL_MAX_AGE, drift_threshold=DRIFT_THRESHOLD):
+        self.directory = directory
+        self.max_age = max_age
+        self.drift_threshold = drift_threshold
+        self._loaded = {}  # Percorso -> (mtime, record) per evitare di rileggere il file
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.pkl")
+
+    def load(self, name="default"):
+        """
+        Carica il record salvato (modello e metadati), oppure None se assente o illeggibile.
+        """
+        path = self._path(name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._loaded.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "rb") as file:
+                record = pickle.load(file)
+        except Exception as e:
+            print(f"Modello salvato non leggibile ({path}): {e}")
+            return None
+        self._loaded[path] = (mtime, record)
+        return record
+
+    def save(self, record, name="default"):
+        """
+        Salva il record su disco in modo atomico (file temporaneo + rinomina).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(record, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._loaded[path] = (os.path.getmtime(path), record)
+
+    def drift(self, record, data):
+        """
+        Misura la deriva dei nuovi dati rispetto a quelli di addestramento: massimo, sulle
+        feature di DRIFT_FEATURES, dello scostamento delle medie in deviazioni standard
+        (basta una feature che si sposta, es. i tentativi, per riaddestrare).
+        """
+        mean = np.asarray(data).mean(axis=0)[DRIFT_FEATURES]
+        std = record["feature_std"][DRIFT_FEATURES]
+        scale = np.where(std > 0, std, 1.0)
+        return float(np.max(np.abs(mean - record["feature_mean"][DRIFT_FEATURES]) / scale))
+
+    def needs_refit(self, record, data):
+        """
+        Restituisce il motivo per cui il modello salvato va riaddestrato, oppure None.
+        """
+        if record is None:
+            return "nessun modello salvato"
+        if record.get("feature_names") != FEATURE_NAMES or record.get("params") != MODEL_PARAMS:
+            return "schema delle feature cambiato"
+        if record["fingerprint"] == fingerprint(data):
+            return None  # Stessi dati di addestramento: il modello è valido
+        if time.time() - record["trained_at"] > self.max_age:
+            return "modello scaduto"
+        if self.drift(record, data) > self.drift_threshold:
+            return "deriva delle feature"
+        return None
+
+    def fit(self, data, name="default"):
+        """
+        Addestra un nuovo modello sui dati forniti e lo salva.
+        """
+        from sklearn.ensemble import IsolationForest # Import lazy: scikit-learn è lento da caricare
+        data = np.asarray(data, dtype=np.float64)
+        model = IsolationForest(**MODEL_PARAMS)
+        model.fit(data)
+        record = {
+            "model": model,
+            "params": MODEL_PARAMS,
+            "feature_names": FEATURE_NAMES,
+            "fingerprint": fingerprint(data),
+            "feature_mean": data.mean(axis=0),
+            "feature_std": data.std(axis=0),
+            "n_samples": len(data),
+            "trained_at": time.time(),
+        }
+        self.save(record, name)
+        return record
+
+    def get_model(self, data, name="default"):
+        """
+        Restituisce un modello pronto per valutare 'data': quello salvato se ancora
+        valido, altrimenti uno nuovo addestrato su 'data'.
+
+        Args:
+            data (numpy.ndarray): Matrice delle feature da valutare.
+            name (str): Nome del modello (vedi model_name: un modello per sorgente di log).
+
+        Returns:
+            tuple: (modello IsolationForest, True se è stato appena riaddestrato)
+        """
+        record = self.load(name)
+        reason = self.needs_refit(record, data)
+        if reason is None:
+            return record["model"], False
+        print(f"Riaddestramento del modello '{name}': {reason}.")
+        return self.fit(data, name)["model"], True
@@ -0,0 +1,276 @@
+# parallel_engine.py
+
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from log_parser import is_compressed, iter_log_events
+from analyzer import analyze_events, merge_summaries
+from progress import AnalysisCancelled
+
+# Dimensione minima (in byte) di ogni porzione di file assegnata a un worker:
+# sotto questa soglia il costo di avvio dei processi supera il guadagno
+MIN_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Suffisso dei file ruotati: auth.log.1, auth.log.2.gz, auth.log.3.bz2, ...
+ROTATED_SUFFIX = re.compile(r"\.(\d+)(?:\.(?:gz|bz2|xz))?$")
+
+# Avanzamento condiviso (progress.Progress) del processo worker, impostato da _init_worker
+_worker_progress = None
+
+
+def split_file(filepath, parts, min_chunk_size=MIN_CHUNK_SIZE, start=0, end=None):
+    """
+    Divide un file in al massimo 'parts' intervalli di byte, allineati all'inizio
+    delle righe, in modo che ogni riga appartenga a un solo intervallo.
+    Un file compresso non può essere diviso e produce un unico intervallo (0, None).
+
+    Args:
+        filepath (str): Percorso del file da dividere.
+        parts (int): Numero massimo di intervalli desiderati.
+        min_chunk_size (int): Dimensione minima di ogni intervallo in byte.
+        start (int): Offset (inizio di una riga) da cui iniziare la divisione.
+        end (int): Offset (fine di una riga) a cui fermarsi; None = dimensione attuale
+            del file. Per un log che cresce durante l'analisi fissa i byte da leggere.
+
+    Returns:
+        list: Lista di tuple (start, end) ordinate e contigue.
+    """
+    if is_compressed(filepath):
+        if start != 0:
+            raise ValueError(f"Impossibile riprendere da un offset in un file compresso: {filepath}")
+        return [(0, None)]
+
+    size = os.path.getsize(filepath)
+    if end is not None:
+        size = min(size, end)
+    if size <= start:
+        return []
+    parts = max(1, min(parts, (size - start) // max(1, min_chunk_size)))
+
+    offsets = [start]
+    with open(filepath, 'rb') as file:
+        for i in range(1, parts):
+            target = start + (size - start) * i // parts
+            if target <= offsets[-1]:
+                continue
+            # Avanza fino al primo inizio riga successivo all'offset teorico
+            file.seek(target - 1)
+            file.readline()
+            offset = file.tell()
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+class WorkerBudget:
+    """
+    Processi di parsing condivisi tra più analisi eseguite insieme (es. la coda della GUI),
+    così che la somma dei processi non superi i core disponibili.
+    - reserve(jobs) registra le analisi accodate che chiederanno processi.
+    - acquire() (all'avvio di un'analisi) assegna una parte dei processi liberi, divisi
+      tra l'analisi e quelle ancora in attesa; almeno 1 (il processo dell'analisi).
+    - release(count) restituisce i processi assegnati; unreserve(jobs) toglie le analisi
+      annullate prima di partire.
+    I contatori sono gestiti da un multiprocessing.Manager: l'oggetto si può passare come
+    argomento ai task di un pool già avviato (vedi borrowed_workers).
+    """
+
+    def __init__(self, total, manager):
+        self._free = manager.Value("i", total)
+        self._waiting = manager.Value("i", 0)
+        self._lock = manager.Lock()
+
+    def reserve(self, jobs=1):
+        with self._lock:
+            self._waiting.value += jobs
+
+    def unreserve(self, jobs=1):
+        with self._lock:
+            self._waiting.value = max(0, self._waiting.value - jobs)
+
+    def acquire(self):
+        with self._lock:
+            waiting = max(0, self._waiting.value - 1)
+            self._waiting.value = waiting
+            count = max(1, self._free.value // (waiting + 1))
+            self._free.value -= count
+            return count
+
+    def release(self, count):
+        with self._lock:
+            self._free.value += count
+
+
+@contextmanager
+def borrowed_workers(workers):
+    """
+    Restituisce (come contesto) il numero di processi da usare: 'workers' se è un
+    numero, altrimenti quelli assegnati dal WorkerBudget, restituiti all'uscita.
+    """
+    if not isinstance(workers, WorkerBudget):
+        yield workers
+        return
+    count = workers.acquire()
+    try:
+        yield count
+    finally:
+        workers.release(count)
+
+
+def _init_worker(progress):
+    global _worker_progress
+    _worker_progress = progress
+
+
+def _analyze_range(task, progress=None):
+    """
+    Funzione eseguita dai worker: analizza l'intervallo di byte indicato e
+    restituisce il riepilogo parziale (con il numero di righe lette in 'lines').
+    L'anno dei timestamp è dedotto dalla data di modifica del file, uguale per
+    tutte le porzioni: i worker producono istanti coerenti tra loro.
+    Con un avanzamento (argomento o _worker_progress) byte e righe vengono registrati
+    dopo ogni blocco e l'annullamento interrompe la lettura con AnalysisCancelled.
+    """
+    filepath, start, end, approximate = task
+    stats = {"lines": 0}
+    progress = progress or _worker_progress
+    on_chunk = None
+    if progress is not None:
+        progress.check()
+        counted = [0]
+
+        def on_chunk(nbytes):
+            # Le righe del blocco sono già state contate in stats quando il blocco viene consumato
+            progress.advance(nbytes, stats["lines"] - counted[0])
+            counted[0] = stats["lines"]
+
+    reference = datetime.fromtimestamp(os.path.getmtime(filepath))
+    summary = analyze_events(iter_log_events(filepath, start, end, stats, on_chunk), reference, approximate)
+    summary["lines"] = stats["lines"]
+    return summary
+
+
+def analyze_parallel(filepaths, workers=None, min_chunk_size=MIN_CHUNK_SIZE, start=0, approximate=False,
+                     progress=None, end=None):
+    """
+    Esegue parsing e aggregazione di uno o più file di log su più processi.
+    Ogni file viene diviso in porzioni allineate alle righe, ogni worker produce
+    ip_counter/hourly_counter parziali e i risultati vengono uniti nell'ordine
+    dei file e delle porzioni, quindi il riepilogo coincide con quello seriale.
+
+    Args:
+        filepaths (str | list): Percorso di un file di log o lista di percorsi.
+        workers (int): Numero di processi (None = numero di core disponibili).
+        min_chunk_size (int): Dimensione minima di ogni porzione in byte.
+        start (int): Offset (inizio di una riga) da cui iniziare in ogni file;
+            usato per elaborare solo la parte aggiunta a un file già analizzato.
+        approximate (bool): Modalità approssimata a memoria fissa (vedi analyze_events):
+            gli sketch dei worker vengono uniti come i contatori.
+        progress (progress.Progress): Se indicato, vi vengono registrati byte e righe
+            elaborati (totale: i byte da leggere) e un annullamento richiesto con
+            progress.cancel() interrompe i worker alla fine del blocco corrente.
+        end (int): Offset (fine di una riga) a cui fermarsi in ogni file (None = fine
+            del file); le righe aggiunte dopo questo offset non vengono lette.
+
+    Returns:
+        dict: Riepilogo con 'ip_counter' e 'hourly_counter', come analyze_events, e con
+            'lines' (righe lette).
+
+    Raises:
+        AnalysisCancelled: Se l'analisi è stata annullata tramite 'progress'.
+    """
+    if isinstance(filepaths, (str, os.PathLike)):
+        filepaths = [filepaths]
+    workers = workers or os.cpu_count() or 1
+
+    tasks = []
+    for filepath in filepaths:
+        for range_start, range_end in split_file(filepath, workers, min_chunk_size, start, end):
+            tasks.append((filepath, range_start, range_end, approximate))
+
+    if progress is not None:
+        progress.start(sum(_task_bytes(task) for task in tasks))
+
+    if workers == 1 or len(tasks) <= 1:
+        # Nessun vantaggio dal pool: esegue tutto nel processo corrente
+        return merge_summaries(_analyze_range(task, progress) for task in tasks)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                             initargs=(progress,)) as executor:
+        # I task più costosi (file compressi, porzioni grandi) partono per primi,
+        # ma i risultati vengono uniti nell'ordine originale: unione deterministica
+        futures = [None] * len(tasks)
+        for index in sorted(range(len(tasks)), key=lambda i: _task_cost(tasks[i]), reverse=True):
+            futures[index] = executor.submit(_analyze_range, tasks[index])
+        try:
+            return merge_summaries(future.result() for future in futures)
+        except AnalysisCancelled:
+            # I task non ancora avviati non partono; quelli in corso si fermano al blocco successivo
+            executor.shutdown(cancel_futures=True)
+            raise
+
+
+def _task_bytes(task):
+    """
+    Byte su disco letti da un task (il file intero, compresso, se non divisibile).
+    """
+    filepath, start, end, _ = task
+    return os.path.getsize(filepath) if end is None else end - start
+
+
+def _task_cost(task):
+    """
+    Stima del costo di un task: i byte da leggere, moltiplicati per un fattore
+    che tiene conto della decompressione per i file compressi.
+    """
+    filepath, start, end, _ = task
+    if end is None:
+        return os.path.getsize(filepath) * 8
+    return end - start
+
+
+def expand_rotation_set(filepath):
+    """
+    Restituisce tutti i file di una rotazione (es. auth.log, auth.log.1,
+    auth.log.2.gz ... auth.log.30.gz) in ordine cronologico, dal più vecchio
+    al file corrente.
+
+    Args:
+        filepath (str): Percorso del file di log corrente (es. /var/log/auth.log).
+
+    Returns:
+        list: Percorsi dei file esistenti della rotazione.
+    """
+    rotated = []
+    for candidate in glob.glob(glob.escape(filepath) + ".*"):
+        match = ROTATED_SUFFIX.fullmatch(candidate[len(filepath):])
+        if match:
+            rotated.append((int(match.group(1)), candidate))
+    # Indice più alto = file più vecchio
+    files = [path for _, path in sorted(rotated, reverse=True)]
+    if os.path.exists(filepath):
+        files.append(filepath)
+    return files
+
+
+def analyze_rotation_set(filepath, workers=None, approximate=False, progress=None):
+    """
+    Analizza in parallelo un'intera rotazione di log (file compressi compresi):
+    la decompressione avviene nei processi worker e i contatori vengono uniti
+    in ordine cronologico.
+
+    Args:
+        filepath (str): Percorso del file di log corrente (es. /var/log/auth.log).
+        workers (int): Numero di processi (None = numero di core disponibili).
+        approximate (bool): Modalità approssimata a memoria fissa (vedi analyze_events).
+        progress (progress.Progress): Avanzamento e annullamento (vedi analyze_parallel).
+
+    Returns:
+        dict: Riepilogo complessivo, come analyze_events.
+    """
+    return analyze_parallel(expand_rotation_set(filepath), workers, approximate=approximate, progress=progress)
@@ -0,0 +1,121 @@
+# progress.py
+# Avanzamento e annullamento delle analisi lunghe: i byte e le righe elaborati dai
+# worker (anche in processi diversi) vengono sommati in contatori condivisi, da cui
+# la GUI calcola percentuale, velocità e tempo residuo stimato (ETA). L'annullamento
+# è cooperativo: i worker controllano la richiesta alla fine di ogni blocco letto.
+
+import multiprocessing
+import time
+
+
+class AnalysisCancelled(Exception):
+    """Sollevata dai worker quando l'analisi è stata annullata (vedi Progress.cancel)."""
+
+
+class Progress:
+    """
+    Avanzamento di un'analisi condiviso tra il processo principale e i worker.
+    - start(total) azzera i contatori e fissa i byte da elaborare (0 = sconosciuti).
+    - advance(nbytes, lines) somma quanto elaborato; solleva AnalysisCancelled se
+      l'analisi è stata annullata. I worker la chiamano alla fine di ogni blocco.
+    - finish() ferma il cronometro (velocità ed ETA restano quelle finali).
+    - cancel() richiede l'annullamento; snapshot() restituisce lo stato attuale.
+    Senza 'manager' l'oggetto va passato ai processi worker alla loro creazione (es.
+    initargs del pool). Con un multiprocessing.Manager i contatori sono gestiti dal suo
+    processo: l'oggetto si può passare come argomento ai task di un pool già avviato.
+    """
+
+    def __init__(self, manager=None):
+        context = manager or multiprocessing
+        self._total = context.Value("q", 0)
+        self._done = context.Value("q", 0)
+        self._lines = context.Value("q", 0)
+        self._started = context.Value("d", time.time())
+        self._finished = context.Value("d", 0.0)
+        self._cancel = context.Event()
+        self._lock = manager.Lock() if manager is not None else self._done.get_lock()
+
+    def start(self, total):
+        """
+        Inizia una nuova fase di lettura di 'total' byte.
+        """
+        with self._lock:
+            self._total.value = total
+            self._done.value = 0
+            self._lines.value = 0
+            self._started.value = time.time()
+            self._finished.value = 0.0
+
+    def finish(self):
+        with self._lock:
+            if not self._finished.value:
+                self._finished.value = time.time()
+
+    def advance(self, nbytes, lines=0):
+        """
+        Registra 'nbytes' byte e 'lines' righe elaborati e verifica l'annullamento.
+        """
+        with self._lock:
+            self._done.value += nbytes
+            self._lines.value += lines
+        self.check()
+
+    def check(self):
+        """
+        Solleva AnalysisCancelled se è stato richiesto l'annullamento.
+        """
+        if self._cancel.is_set():
+            raise AnalysisCancelled("analisi annullata")
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def snapshot(self):
+        """
+        Restituisce lo stato dell'avanzamento.
+
+        Returns:
+            dict: 'done' e 'total' (byte), 'lines', 'seconds' trascorsi, 'rate' (byte/s),
+                'fraction' (0-1, None se il totale è sconosciuto) ed 'eta' (secondi, o None).
+        """
+        with self._lock:
+            total, done, lines = self._total.value, self._done.value, self._lines.value
+            started, finished = self._started.value, self._finished.value
+        seconds = (finished or time.time()) - started
+        rate = done / seconds if seconds > 0 else 0.0
+        fraction = min(1.0, done / total) if total else None
+        eta = (total - done) / rate if total and rate > 0 else None
+        return {"done": done, "total": total, "lines": lines, "seconds": seconds, "rate": rate,
+                "fraction": fraction, "eta": max(0.0, eta) if eta is not None else None}
+
+
+def _format_bytes(nbytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if nbytes < 1024 or unit == "GB":
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+def _format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_progress(snapshot):
+    """
+    Riassume in una riga lo stato di avanzamento (per la GUI), es.
+    "1.2 GB / 10.0 GB (12%) - 15,300,000 righe - 95.0 MB/s - ETA 1:32".
+    """
+    parts = [_format_bytes(snapshot["done"])]
+    if snapshot["total"]:
+        parts[0] += f" / {_format_bytes(snapshot['total'])} ({snapshot['fraction']:.0%})"
+    parts.append(f"{snapshot['lines']:,} righe")
+    parts.append(f"{_format_bytes(snapshot['rate'])}/s")
+    if snapshot["eta"] is not None:
+        parts.append(f"ETA {_format_seconds(snapshot['eta'])}")
+    return " - ".join(parts)
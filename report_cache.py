@@ -0,0 +1,174 @@
+# report_cache.py
+# Cache dei report indicizzata per contenuto: un report (o un grafico) con gli stessi
+# dati di ingresso di uno già generato viene riutilizzato invece di essere ricostruito.
+
+import hashlib
+import json
+import os
+import shutil
+
+from bursts import top_bursts
+
+REPORT_CACHE_DIR = os.path.join("output", ".cache")   # Cartella della cache (dentro 'output')
+REPORT_CACHE_MAX_BYTES = 128 * 1024 * 1024             # Dimensione massima della cache su disco
+
+
+def _digest(payload):
+    # JSON con chiavi ordinate: lo stesso contenuto produce sempre la stessa impronta
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def report_key(summary, anomalies, template_version):
+    """
+    Calcola l'impronta degli ingressi di un report: i soli dati che compaiono nel PDF
+    (top 5 IP, distribuzione oraria, IP anomali con i loro tentativi, raffiche,
+    periodo dei tentativi e, in modalità approssimata, stime e limiti di errore)
+    e la versione del template.
+    """
+    from report_generator import TOP_BURSTS
+    ip_counter = summary["ip_counter"]
+    bursts = summary.get("bursts")
+    sketch = summary.get("sketch")
+    return _digest({
+        "template": template_version,
+        "top_ips": ip_counter.most_common(5),
+        "hourly": list(summary["hourly_counter"].items()), # L'ordine conta per il grafico
+        "anomalies": [(ip, ip_counter.get(ip)) for ip in anomalies],
+        "bursts": top_bursts(bursts, TOP_BURSTS),
+        "time_range": bursts.time_range() if bursts is not None else None,
+        "sketch": None if sketch is None else (
+            sketch.events, sketch.error_bounds(),
+            [(sketch.distinct_ips(hour), sketch.distinct_users(hour)) for hour in [None] + list(range(24))]),
+    })
+
+
+def chart_key(chart, template_version):
+    """
+    Calcola l'impronta di un grafico (data, title, chart_type).
+    """
+    data, title, chart_type = chart
+    return _digest({
+        "template": template_version,
+        "data": [(str(key), value) for key, value in data.items()],
+        "title": title,
+        "type": chart_type,
+    })
+
+
+def link_or_copy(source, target):
+    """
+    Rende disponibile 'source' come 'target' con un hardlink (nessuna copia dei dati);
+    se il filesystem non lo consente (es. dispositivi diversi) copia il file.
+    """
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+class ReportCache:
+    """
+    Cache su disco dei PDF e dei grafici PNG, indicizzata per impronta degli ingressi.
+    - generate() restituisce il PDF in cache (hardlink o copia con il nuovo nome) se
+      gli ingressi coincidono, altrimenti lo genera riutilizzando i grafici in cache.
+    - Quando la cache supera max_bytes vengono eliminate le voci usate meno di recente.
+    I report già consegnati in 'output' non vengono mai eliminati: la cache ne conserva
+    solo un collegamento, quindi l'eliminazione libera spazio solo per le voci non più
+    referenziate.
+    """
+
+    def __init__(self, directory=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def _touch(self, path):
+        try:
+            os.utime(path)  # Aggiorna l'ordine LRU
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get(self, chart):
+        """
+        Restituisce il PNG in cache del grafico (data, title, chart_type), oppure None.
+        """
+        from report_generator import REPORT_TEMPLATE_VERSION
+        path = self._path(chart_key(chart, REPORT_TEMPLATE_VERSION), "png")
+        try:
+            with open(path, "rb") as file:
+                png = file.read()
+        except FileNotFoundError:
+            return None
+        self._touch(path)
+        return png
+
+    def put(self, chart, png):
+        """
+        Salva in cache il PNG di un grafico.
+        """
+        from report_generator import REPORT_TEMPLATE_VERSION
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(chart_key(chart, REPORT_TEMPLATE_VERSION), "png")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(png)
+        os.replace(tmp_path, path)
+
+    def generate(self, summary, anomalies, filename):
+        """
+        Produce il report PDF in 'filename', riutilizzando la cache quando possibile.
+
+        Args:
+            summary (dict): Dati aggregati dell'analisi (ip_counter, hourly_counter).
+            anomalies (list): Lista di IP anomali rilevati.
+            filename (str): Percorso dove salvare il PDF.
+
+        Returns:
+            str: 'hit' (PDF dalla cache), 'miss' (PDF generato) oppure 'error'.
+        """
+        from report_generator import REPORT_TEMPLATE_VERSION, generate_report # Import lazy (matplotlib, ReportLab)
+
+        cached = self._path(report_key(summary, anomalies, REPORT_TEMPLATE_VERSION), "pdf")
+        if self._touch(cached):
+            link_or_copy(cached, filename)
+            print(f"📄 Report PDF recuperato dalla cache: {filename}")
+            return "hit"
+
+        if not generate_report(summary, anomalies, filename, chart_cache=self):
+            return "error"
+        os.makedirs(self.directory, exist_ok=True)
+        link_or_copy(filename, cached)
+        self.evict()
+        return "miss"
+
+    def evict(self):
+        """
+        Elimina le voci usate meno di recente finché la cache non rientra in max_bytes.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith((".pdf", ".png")):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                print(f"Errore durante l'eliminazione della voce di cache {path}: {e}")
@@ -5,35 +5,86 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Page
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib.style
+from concurrent.futures import ProcessPoolExecutor
+import atexit
 from datetime import datetime
+from io import BytesIO
 import os
+import threading
 import numpy as np
 
-# Salva un grafico matplotlib come immagine PNG
-def save_chart(data, title, filename, chart_type='bar'):
+from bursts import BURST_WINDOWS, top_bursts, window_label
+from timestamps import epoch_to_datetime
+
+TOP_BURSTS = 10                     # IP riportati nella tabella delle raffiche
+
+REPORT_TEMPLATE_VERSION = 3         # Da incrementare a ogni modifica del layout (invalida la cache dei report)
+CHART_STYLE = 'seaborn-v0_8-whitegrid'
+CHART_SIZE = (10, 6)                 # Dimensione dei grafici in pollici
+CHART_WORKERS = os.cpu_count() or 1  # Processi per il rendering dei grafici (1 = nel processo corrente, senza pool)
+
+_style_lock = threading.Lock()
+_style_applied = False
+_local = threading.local()           # Figura riutilizzata, una per thread
+_chart_pool = None
+_chart_pool_lock = threading.Lock()
+
+def _setup_style():
     """
-    Genera e salva un grafico (bar o pie) a partire dai dati forniti.
+    Applica lo stile dei grafici una sola volta per processo.
+    """
+    global _style_applied
+    with _style_lock:
+        if not _style_applied:
+            matplotlib.style.use(CHART_STYLE)
+            _style_applied = True
+
+def _figure():
+    """
+    Restituisce la figura del thread corrente, svuotata e pronta per un nuovo grafico.
+    Le figure sono create con l'API a oggetti (senza pyplot), quindi più thread
+    possono disegnare contemporaneamente senza condividere stato globale.
+    """
+    fig = getattr(_local, "figure", None)
+    if fig is None:
+        _setup_style()
+        fig = Figure(figsize=CHART_SIZE)
+        FigureCanvasAgg(fig)
+        _local.figure = fig
+    else:
+        fig.clear()
+    return fig
+
+def render_chart(data, title, chart_type='bar'):
+    """
+    Disegna un grafico (bar o pie) e lo restituisce come immagine PNG in memoria.
     Args:
         data (dict): Dati da visualizzare.
         title (str): Titolo del grafico.
-        filename (str): Percorso dove salvare il file PNG.
         chart_type (str): Tipo di grafico ('bar' o 'pie').
+    Returns:
+        bytes: Contenuto PNG del grafico, oppure None se non ci sono dati.
     """
     if not data: # Non tentare di generare un grafico se non ci sono dati
         print(f"ℹ️ Nessun dato fornito per il grafico: {title}")
-        return
+        return None
 
-    plt.style.use('seaborn-v0_8-whitegrid')
-    fig, ax = plt.subplots(figsize=(10, 6))
+    fig = _figure()
+    ax = fig.add_subplot()
+    viridis = matplotlib.colormaps['viridis']
 
     keys = [str(k) for k in data.keys()] # Assicura che le chiavi siano stringhe per matplotlib
     values = list(data.values())
 
     if chart_type == 'bar':
-        bars = ax.bar(keys, values, color=plt.cm.viridis(np.linspace(0.4, 0.8, len(keys))))
+        bars = ax.bar(keys, values, color=viridis(np.linspace(0.4, 0.8, len(keys))))
         ax.set_ylabel("Numero di Eventi/Tentativi")
-        plt.xticks(rotation=45, ha="right") # Migliore rotazione e allineamento etichette asse x
+        ax.tick_params(axis='x', labelrotation=45) # Migliore rotazione e allineamento etichette asse x
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
 
         # Aggiungi i valori sopra le barre
         for bar in bars:
@@ -44,28 +95,103 @@ def save_chart(data, title, filename, chart_type='bar'):
 
     elif chart_type == 'pie' and sum(values) > 0: # Grafico a torta solo se ci sono valori > 0
         ax.pie(values, labels=keys, autopct='%1.1f%%', startangle=90,
-               colors=plt.cm.viridis(np.linspace(0, 1, len(keys))))
+               colors=viridis(np.linspace(0, 1, len(keys))))
         ax.axis('equal') # Assicura che la torta sia circolare
 
     ax.set_title(title, fontsize=14, fontweight='bold')
-    plt.tight_layout() # Aggiusta il layout per evitare sovrapposizioni
+    fig.tight_layout() # Aggiusta il layout per evitare sovrapposizioni
 
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+# Salva un grafico matplotlib come immagine PNG
+def save_chart(data, title, filename, chart_type='bar'):
+    """
+    Genera e salva un grafico (bar o pie) a partire dai dati forniti.
+    Args:
+        data (dict): Dati da visualizzare.
+        title (str): Titolo del grafico.
+        filename (str): Percorso dove salvare il file PNG.
+        chart_type (str): Tipo di grafico ('bar' o 'pie').
+    """
+    png = render_chart(data, title, chart_type)
+    if png is None:
+        return
     try:
-        plt.savefig(filename)
+        with open(filename, 'wb') as file:
+            file.write(png)
         print(f"📈 Grafico salvato: {filename}")
     except Exception as e:
         print(f"❌ Errore durante il salvataggio del grafico {filename}: {e}")
-    finally:
-        plt.close(fig) # Chiudi la figura specifica per liberare memoria
+
+def _get_chart_pool():
+    """
+    Restituisce il pool di processi condiviso per il rendering dei grafici
+    (creato al primo utilizzo e riutilizzato da tutti i report, chiuso all'uscita del
+    programma o con close_chart_pool). Con CHART_WORKERS = 1 il pool non viene mai creato.
+    """
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            _chart_pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, initializer=_setup_style)
+            atexit.register(close_chart_pool)
+        return _chart_pool
+
+def close_chart_pool():
+    """
+    Chiude il pool dei grafici (se creato) e ne termina i processi. Un report generato
+    in seguito ne crea uno nuovo.
+    """
+    global _chart_pool
+    with _chart_pool_lock:
+        pool, _chart_pool = _chart_pool, None
+    if pool is not None:
+        atexit.unregister(close_chart_pool)
+        pool.shutdown()
+
+def render_charts(charts, workers=None, chart_cache=None):
+    """
+    Disegna più grafici in parallelo sul pool di processi.
+    Args:
+        charts (list): Tuple (data, title, chart_type).
+        workers (int): Processi da usare (default CHART_WORKERS; 1 = nel processo corrente,
+            senza creare il pool).
+        chart_cache: Cache dei grafici già disegnati (es. report_cache.ReportCache), con
+            metodi get(chart) e put(chart, png); i grafici trovati non vengono ridisegnati.
+    Returns:
+        list: Contenuti PNG (o None), nello stesso ordine di 'charts'.
+    """
+    results = [chart_cache.get(chart) if chart_cache else None for chart in charts]
+    missing = [index for index, png in enumerate(results) if png is None]
+    workers = workers or CHART_WORKERS
+    if workers == 1 or len(missing) <= 1:
+        for index in missing:
+            results[index] = render_chart(*charts[index])
+    else:
+        pool = _get_chart_pool()
+        futures = [(index, pool.submit(render_chart, *charts[index])) for index in missing]
+        for index, future in futures:
+            results[index] = future.result()
+    if chart_cache:
+        for index in missing:
+            if results[index] is not None:
+                chart_cache.put(charts[index], results[index])
+    return results
 
 # Crea il report PDF
-def generate_report(summary, anomalies, filename):
+def generate_report(summary, anomalies, filename, chart_cache=None):
     """
     Genera un report PDF con tabelle e grafici a partire dai dati di analisi.
     Args:
-        summary (dict): Dati aggregati dell'analisi (ip_counter, hourly_counter).
+        summary (dict): Dati aggregati dell'analisi (ip_counter, hourly_counter e, se
+            presenti, i picchi per finestra in 'bursts' o gli sketch della modalità
+            approssimata in 'sketch', di cui vengono riportati i limiti di errore).
         anomalies (list): Lista di IP anomali rilevati.
         filename (str): Percorso dove salvare il PDF.
+        chart_cache: Cache dei grafici già disegnati (opzionale, vedi render_charts).
+    Returns:
+        bool: True se il PDF è stato generato.
     """
     doc = SimpleDocTemplate(filename, pagesize=A4)
     styles = getSampleStyleSheet()
@@ -73,10 +199,26 @@ def generate_report(summary, anomalies, filename):
 
     ip_counter = summary["ip_counter"]
     hourly_counter = summary["hourly_counter"]
+    bursts = summary.get("bursts")
+    time_range = bursts.time_range() if bursts is not None else None
+    sketch = summary.get("sketch")
+    count_suffix = ""
+    if sketch is not None:
+        bounds = sketch.error_bounds()
+        count_suffix = f" (±{bounds['count_error']})" if bounds["count_error"] else ""
 
     # Titolo e data del report
     elements.append(Paragraph("📄 Report Analisi Log di Sicurezza", styles["Title"]))
     elements.append(Paragraph(f"Generato il: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles["Normal"]))
+    if time_range:
+        first, last = (epoch_to_datetime(epoch).strftime('%Y-%m-%d %H:%M:%S') for epoch in time_range)
+        elements.append(Paragraph(f"Periodo dei tentativi: dal {first} al {last}", styles["Normal"]))
+    if sketch is not None:
+        elements.append(Paragraph(
+            f"Modalità approssimata: {sketch.events} eventi, circa {sketch.distinct_ips()} IP distinti e "
+            f"{sketch.distinct_users()} utenti distinti (errore standard {bounds['distinct_error']:.1%}). "
+            f"I conteggi per IP sono stime per eccesso, con errore massimo di {bounds['count_error']} "
+            f"tentativi nel {bounds['confidence']:.0%} dei casi.", styles["Normal"]))
     elements.append(Spacer(1, 24)) # Spazio dopo il titolo
 
     # Sezione 1: IP sospetti (Top 5) - Tabella
@@ -85,7 +227,7 @@ def generate_report(summary, anomalies, filename):
         # Dati per la tabella, inclusa l'intestazione
         data_ip = [["Indirizzo IP", "Numero Tentativi/Eventi"]]
         for ip, count in ip_counter.most_common(5):
-            data_ip.append([Paragraph(ip, styles["Normal"]), str(count)]) # Usiamo Paragraph per l'IP per coerenza di stile
+            data_ip.append([Paragraph(ip, styles["Normal"]), f"{count}{count_suffix}"]) # Usiamo Paragraph per l'IP per coerenza di stile
 
         ip_table = Table(data_ip, colWidths=[3*inch, 2*inch]) # Specifica larghezza colonne
         ip_table.setStyle(TableStyle([
@@ -112,14 +254,24 @@ def generate_report(summary, anomalies, filename):
         data_hourly = [["Fascia Oraria", "Numero Tentativi/Eventi"]]
         for hour, count in sorted(hourly_counter.items()):
             data_hourly.append([f"{hour:02d}:00 - {hour:02d}:59", str(count)])
+        col_widths = [2.5*inch, 2.5*inch] # Specifica larghezza colonne
+        header_size = 12
+        if sketch is not None:
+            # Modalità approssimata: IP e utenti distinti per fascia oraria (stime HyperLogLog)
+            data_hourly[0] += ["IP distinti (stima)", "Utenti distinti (stima)"]
+            for row in data_hourly[1:]:
+                hour = int(row[0][:2])
+                row += [str(sketch.distinct_ips(hour)), str(sketch.distinct_users(hour))]
+            col_widths = [1.2*inch, 1.8*inch, 1.4*inch, 1.6*inch]
+            header_size = 10
 
-        hourly_table = Table(data_hourly, colWidths=[2.5*inch, 2.5*inch]) # Specifica larghezza colonne
+        hourly_table = Table(data_hourly, colWidths=col_widths)
         hourly_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#4F81BD")),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('FONTSIZE', (0, 0), (-1, 0), header_size),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
             ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#DCE6F1")),
             ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
@@ -138,7 +290,7 @@ def generate_report(summary, anomalies, filename):
         data_anomalies = [["Indirizzo IP Anomalo", "Tentativi/Eventi Registrati"]]
         for ip in anomalies:
             count = ip_counter.get(ip, "N/D") # Prendiamo il conteggio da ip_counter, N/D se non presente
-            data_anomalies.append([Paragraph(f"⚠️ {ip}", styles["Normal"]), str(count)])
+            data_anomalies.append([Paragraph(f"⚠️ {ip}", styles["Normal"]), f"{count}{count_suffix}"])
 
         anomaly_table = Table(data_anomalies, colWidths=[3*inch, 2.5*inch])
         anomaly_table.setStyle(TableStyle([
@@ -158,27 +310,59 @@ def generate_report(summary, anomalies, filename):
         elements.append(Paragraph("Nessuna anomalia rilevata dal modello.", styles["Normal"]))
     elements.append(Spacer(1, 12))
 
-    # Sezione 4: Grafici di riepilogo (salvati come immagini PNG e inseriti nel PDF)
-    ip_chart_path = "output/ip_chart.png"
-    hour_chart_path = "output/hour_chart.png"
-    if not os.path.exists("output"):
-        os.makedirs("output") # Creazione cartella se non esiste
+    # Sezione 4: Raffiche - picco di tentativi per IP in finestre scorrevoli
+    elements.append(Paragraph("4. Raffiche di Tentativi (Picchi per Finestra)", styles["Heading2"]))
+    burst_rows = top_bursts(bursts, TOP_BURSTS)
+    if burst_rows:
+        elements.append(Paragraph(
+            "Massimo numero di tentativi di ogni IP in una finestra scorrevole della durata indicata "
+            f"(risoluzione 1/{bursts.slots} della finestra).", styles["Normal"]))
+        elements.append(Spacer(1, 6))
+        data_bursts = [["Indirizzo IP"] + [f"Picco {window_label(size)}" for size in BURST_WINDOWS]
+                       + ["Tentativi/min (picco)"]]
+        for ip, peaks in burst_rows:
+            rate = peaks[0] * 60 / BURST_WINDOWS[0]
+            data_bursts.append([Paragraph(ip, styles["Normal"])] + [str(peak) for peak in peaks] + [f"{rate:.1f}"])
+
+        burst_table = Table(data_bursts, colWidths=[1.8*inch] + [1.0*inch] * len(BURST_WINDOWS) + [1.3*inch])
+        burst_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#4F81BD")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#DCE6F1")),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(burst_table)
+    elif sketch is not None:
+        elements.append(Paragraph("Raffiche non calcolate in modalità approssimata.", styles["Normal"]))
+    else:
+        elements.append(Paragraph("Nessun timestamp valido per il calcolo delle raffiche.", styles["Normal"]))
+    elements.append(Spacer(1, 12))
+
+    # Sezione 5: Grafici di riepilogo (disegnati in parallelo e inseriti nel PDF dalla memoria,
+    # senza file PNG intermedi: report generati in contemporanea non si sovrascrivono)
+    ip_chart_png, hour_chart_png = render_charts([
+        (dict(ip_counter.most_common(5)), "Top 5 IP per Attività", 'bar'),
+        (dict(hourly_counter), "Distribuzione Oraria dei Tentativi/Eventi", 'bar'),
+    ], chart_cache=chart_cache)
 
     # Grafico Top 5 IP
-    if ip_counter:
-        save_chart(dict(ip_counter.most_common(5)), "Top 5 IP per Attività", ip_chart_path)
-        elements.append(Paragraph("4. Grafici di Riepilogo", styles["Heading2"]))
-        elements.append(Image(ip_chart_path, width=5*inch, height=3*inch))
+    elements.append(Paragraph("5. Grafici di Riepilogo", styles["Heading2"]))
+    if ip_chart_png:
+        elements.append(Image(BytesIO(ip_chart_png), width=5*inch, height=3*inch))
         elements.append(Spacer(1, 12))
     else:
-        elements.append(Paragraph("4. Grafici di Riepilogo", styles["Heading2"]))
         elements.append(Paragraph("Nessun dato IP disponibile per il grafico.", styles["Normal"]))
         elements.append(Spacer(1,12))
 
     # Grafico distribuzione oraria
-    if hourly_counter:
-        save_chart(hourly_counter, "Distribuzione Oraria dei Tentativi/Eventi", hour_chart_path)
-        elements.append(Image(hour_chart_path, width=5*inch, height=3*inch))
+    if hour_chart_png:
+        elements.append(Image(BytesIO(hour_chart_png), width=5*inch, height=3*inch))
         elements.append(Spacer(1,12))
     else:
         elements.append(Paragraph("Nessun dato orario disponibile per il grafico.", styles["Normal"]))
@@ -188,5 +372,7 @@ def generate_report(summary, anomalies, filename):
     try:
         doc.build(elements)
         print(f"📄 Report PDF generato con successo: {filename}")
+        return True
     except Exception as e:
-        print(f"❌ Errore durante la costruzione del PDF: {e}")
\ No newline at end of file
+        print(f"❌ Errore durante la costruzione del PDF: {e}")
+        return False
\ No newline at end of file
@@ -0,0 +1,327 @@
+# sketches.py
+# Aggregazione approssimata per log con milioni di IP distinti (es. scansioni distribuite):
+# la memoria resta fissa qualunque sia il numero di IP, con un errore noto e configurabile.
+# - Count-Min Sketch e un insieme limitato di candidati per gli IP più attivi (heavy hitters);
+# - HyperLogLog per il numero di IP e di utenti distinti, in totale e per ora del giorno.
+# Gli sketch si uniscono (merge) tra file e processi diversi: gli hash sono deterministici
+# (blake2b) e non dipendono da PYTHONHASHSEED.
+
+import hashlib
+import math
+from collections import Counter
+
+import numpy as np
+
+APPROXIMATE = False      # Modalità approssimata di default (CLI: --approximate)
+HEAVY_HITTERS = 1000     # IP più attivi conservati, con il conteggio stimato
+SKETCH_EPSILON = 0.0001  # Errore massimo dei conteggi per IP: epsilon * eventi totali
+SKETCH_DELTA = 0.01      # Probabilità che un conteggio superi l'errore massimo
+HLL_PRECISION = 12       # 2^12 registri per HyperLogLog: errore standard 1.04/sqrt(4096) ≈ 1.6%
+BUFFER_EVENTS = 100000   # Eventi accumulati (come chiavi distinte) prima di aggiornare gli sketch
+
+NO_HOUR = 24             # Riga degli HyperLogLog per gli eventi senza un timestamp valido
+
+
+def hash64(text):
+    """
+    Hash deterministico a 64 bit di una stringa (uguale in ogni processo).
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def hash_array(items):
+    """
+    Restituisce gli hash (hash64) di una sequenza di stringhe come array numpy uint64.
+    """
+    return np.fromiter((hash64(item) for item in items), dtype=np.uint64, count=len(items))
+
+
+def _bit_length(values):
+    # Numero di bit significativi di ogni valore uint64, calcolato sulle due metà a 32 bit
+    # (con float64 la conversione delle metà è esatta)
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch: conteggi stimati per chiave in una tabella di dimensione fissa
+    (depth righe x width colonne). La stima non è mai inferiore al valore vero e lo
+    supera di al più epsilon * totale con probabilità 1 - delta.
+    """
+
+    def __init__(self, epsilon=SKETCH_EPSILON, delta=SKETCH_DELTA):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, hashes):
+        # Doppio hashing: colonna della riga i = (h1 + i * h2) mod width
+        h1 = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        h2 = (hashes >> np.uint64(32)).astype(np.int64) | 1
+        return (h1[None, :] + np.arange(self.depth)[:, None] * h2[None, :]) % self.width
+
+    def add(self, hashes, counts):
+        """
+        Aggiunge 'counts' (array di interi) alle chiavi con gli hash indicati.
+        """
+        columns = self._columns(hashes)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(columns[row], weights=counts, minlength=self.width).astype(np.int64)
+        self.total += int(np.sum(counts))
+
+    def estimate(self, hashes):
+        """
+        Restituisce i conteggi stimati (array) delle chiavi con gli hash indicati.
+        """
+        columns = self._columns(hashes)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def error_bound(self):
+        """
+        Errore massimo di un conteggio stimato (con probabilità 1 - delta).
+        """
+        return math.ceil(self.epsilon * self.total)
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Impossibile unire Count-Min Sketch con parametri diversi")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+
+class HeavyHitters:
+    """
+    IP più attivi con memoria limitata: i conteggi sono stimati dal Count-Min Sketch
+    e si conservano al più 2 * capacity candidati (ridotti periodicamente ai 'capacity'
+    con la stima più alta). Un IP escluso può rientrare in seguito senza perdere il
+    conteggio, perché lo sketch ricorda tutti gli eventi.
+    """
+
+    def __init__(self, capacity=HEAVY_HITTERS, epsilon=SKETCH_EPSILON, delta=SKETCH_DELTA):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(epsilon, delta)
+        self.candidates = {}  # IP -> hash
+        self.threshold = 0    # Stima minima per entrare tra i candidati (dopo l'ultima riduzione)
+
+    def add(self, items, hashes, counts):
+        """
+        Aggiunge i conteggi di una serie di chiavi distinte (liste/array allineati).
+        """
+        if not len(items):
+            return
+        self.sketch.add(hashes, counts)
+        estimates = self.sketch.estimate(hashes)
+        for index in np.flatnonzero(estimates > self.threshold).tolist():
+            self.candidates[items[index]] = hashes[index]
+        if len(self.candidates) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        items = list(self.candidates)
+        estimates = self.sketch.estimate(np.fromiter(self.candidates.values(), dtype=np.uint64, count=len(items)))
+        keep = np.argpartition(-estimates, self.capacity - 1)[:self.capacity]
+        self.threshold = int(estimates[keep].min())
+        self.candidates = {items[index]: self.candidates[items[index]] for index in keep.tolist()}
+
+    def top(self, limit=None):
+        """
+        Restituisce la lista [(IP, conteggio stimato)] in ordine decrescente (al più 'limit', default capacity).
+        """
+        if not self.candidates:
+            return []
+        items = list(self.candidates)
+        estimates = self.sketch.estimate(np.fromiter(self.candidates.values(), dtype=np.uint64, count=len(items)))
+        ranked = sorted(zip(items, estimates.tolist()), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit or self.capacity]
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.candidates.update(other.candidates)
+        if len(self.candidates) > 2 * self.capacity:
+            self._prune()
+        return self
+
+
+class HyperLogLog:
+    """
+    Insieme di 'rows' contatori HyperLogLog con 2^precision registri ciascuno
+    (una riga per ora del giorno): stimano il numero di elementi distinti con
+    errore standard 1.04 / sqrt(2^precision). Il totale è l'unione delle righe.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, rows=1):
+        self.precision = precision
+        self.registers = np.zeros((rows, 1 << precision), dtype=np.uint8)
+
+    def add(self, rows, hashes):
+        """
+        Aggiunge gli elementi con gli hash indicati alle righe corrispondenti (array allineati).
+        """
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        ranks = (64 - self.precision + 1 - _bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, (np.asarray(rows, dtype=np.int64), index), ranks)
+
+    def count(self, row=None):
+        """
+        Stima il numero di elementi distinti nella riga indicata (None = tutte le righe).
+        """
+        registers = self.registers.max(axis=0) if row is None else self.registers[row]
+        m = registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Correzione per cardinalità piccole (linear counting)
+        return int(round(estimate))
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.registers.shape[1])
+
+    def merge(self, other):
+        if self.registers.shape != other.registers.shape:
+            raise ValueError("Impossibile unire HyperLogLog con parametri diversi")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+
+class SketchSummary:
+    """
+    Riepilogo approssimato di un log a memoria fissa: IP più attivi (HeavyHitters),
+    IP e utenti distinti per ora del giorno (HyperLogLog) e numero di eventi.
+    - add(ip, hour, user) accumula gli eventi in piccoli buffer (al più BUFFER_EVENTS
+      eventi) che vengono riversati negli sketch con operazioni NumPy;
+    - add_arrays() aggiunge le colonne di un EventBatch;
+    - merge() unisce il riepilogo di un altro file o processo (stessi parametri).
+    I metodi di lettura svuotano prima i buffer.
+    """
+
+    def __init__(self, capacity=HEAVY_HITTERS, epsilon=SKETCH_EPSILON, delta=SKETCH_DELTA,
+                 precision=HLL_PRECISION):
+        self.heavy = HeavyHitters(capacity, epsilon, delta)
+        self.ips = HyperLogLog(precision, NO_HOUR + 1)
+        self.users = HyperLogLog(precision, NO_HOUR + 1)
+        self.events = 0
+        self._pending = 0
+        self._ip_counts = Counter()
+        self._hour_ips = [set() for _ in range(NO_HOUR + 1)]
+        self._hour_users = [set() for _ in range(NO_HOUR + 1)]
+
+    def add(self, ip, hour=None, user=None):
+        """
+        Registra un evento dell'IP nell'ora del giorno indicata (None se il timestamp non è valido).
+        """
+        row = NO_HOUR if hour is None else hour
+        self._ip_counts[ip] += 1
+        self._hour_ips[row].add(ip)
+        if user is not None:
+            self._hour_users[row].add(user)
+        self._pending += 1
+        if self._pending >= BUFFER_EVENTS:
+            self.flush()
+
+    def flush(self):
+        """
+        Riversa negli sketch gli eventi accumulati nei buffer.
+        """
+        if not self._pending:
+            return
+        items = list(self._ip_counts)
+        hashes = hash_array(items)
+        self.heavy.add(items, hashes, np.fromiter(self._ip_counts.values(), dtype=np.int64, count=len(items)))
+        ip_hashes = dict(zip(items, hashes.tolist()))
+        self._add_distinct(self.ips, self._hour_ips, ip_hashes.__getitem__)
+        self._add_distinct(self.users, self._hour_users, hash64)
+        self.events += self._pending
+        self._pending = 0
+        self._ip_counts = Counter()
+
+    @staticmethod
+    def _add_distinct(hll, hour_sets, hasher):
+        rows, hashes = [], []
+        for row, values in enumerate(hour_sets):
+            rows.extend([row] * len(values))
+            hashes.extend(hasher(value) for value in values)
+            values.clear()
+        hll.add(np.array(rows, dtype=np.int64), np.array(hashes, dtype=np.uint64))
+
+    def add_arrays(self, ip_table, ip_ids, hours, user_table=(), user_ids=None, user_hours=None):
+        """
+        Variante vettoriale di add per le colonne di un EventBatch.
+
+        Args:
+            ip_table (list): ID -> indirizzo IP.
+            ip_ids (numpy.ndarray): ID dell'IP di ogni evento.
+            hours (numpy.ndarray): Ora del giorno di ogni evento (-1 se il timestamp non è valido).
+            user_table (list): ID -> nome utente.
+            user_ids (numpy.ndarray): ID degli utenti tentati (solo gli eventi con utente).
+            user_hours (numpy.ndarray): Ora degli eventi di user_ids (-1 se non valida).
+        """
+        self.flush()
+        ip_ids = np.asarray(ip_ids, dtype=np.int64)
+        if not ip_ids.size:
+            return
+        ip_hashes = hash_array(ip_table)
+        counts = np.bincount(ip_ids, minlength=len(ip_table))
+        present = np.flatnonzero(counts)
+        self.heavy.add([ip_table[index] for index in present.tolist()], ip_hashes[present], counts[present])
+        self.ips.add(np.where(hours >= 0, hours, NO_HOUR), ip_hashes[ip_ids])
+        if user_ids is not None and len(user_ids):
+            user_hashes = hash_array(user_table)
+            self.users.add(np.where(user_hours >= 0, user_hours, NO_HOUR),
+                           user_hashes[np.asarray(user_ids, dtype=np.int64)])
+        self.events += int(ip_ids.size)
+
+    def counter(self):
+        """
+        Restituisce un Counter {IP: tentativi stimati} con gli IP più attivi (al più HEAVY_HITTERS).
+        """
+        self.flush()
+        return Counter(dict(self.heavy.top()))
+
+    def distinct_ips(self, hour=None):
+        """
+        Stima degli IP distinti nell'ora del giorno indicata (None = in tutto il log).
+        """
+        self.flush()
+        return self.ips.count(hour)
+
+    def distinct_users(self, hour=None):
+        """
+        Stima degli utenti distinti nell'ora del giorno indicata (None = in tutto il log).
+        """
+        self.flush()
+        return self.users.count(hour)
+
+    def error_bounds(self):
+        """
+        Restituisce i limiti di errore del riepilogo: errore massimo dei conteggi per
+        IP ('count_error', eccesso in tentativi) con la relativa probabilità
+        ('confidence') ed errore standard relativo dei conteggi distinti ('distinct_error').
+        """
+        self.flush()
+        return {
+            "count_error": self.heavy.sketch.error_bound(),
+            "confidence": 1 - self.heavy.sketch.delta,
+            "distinct_error": self.ips.relative_error(),
+        }
+
+    def merge(self, other):
+        """
+        Aggiunge in place il riepilogo approssimato 'other' (stessi parametri).
+        """
+        self.flush()
+        other.flush()
+        self.heavy.merge(other.heavy)
+        self.ips.merge(other.ips)
+        self.users.merge(other.users)
+        self.events += other.events
+        return self
@@ -0,0 +1,253 @@
+# sqlite_storage.py
+# Backend di persistenza SQLite integrato: nessun server da installare né round-trip
+# di rete, adatto alle installazioni su un singolo host, ai test e ai benchmark.
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from db_config import SQLITE_CONFIG
+from instrumentation import measure
+from storage import (ANALYSIS_METRICS_COLUMNS, HISTORY_PAGE_SIZE, IP_STATS_COLUMNS, Storage, analysis_metrics_rows,
+                     analysis_rows, ip_stats_rows)
+
+SCHEMA_VERSION = 2 # Registrata in PRAGMA user_version (2: tabella analysis_metrics)
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS anomalies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ip TEXT NOT NULL,
+        attempts INTEGER,
+        log_date TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analysis_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        log_filepath TEXT NOT NULL,
+        pdf_output_filepath TEXT NOT NULL,
+        analysis_datetime TEXT DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ip_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        log_filepath TEXT NOT NULL,
+        ip TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        first_seen TEXT,
+        last_seen TEXT,
+        distinct_users INTEGER NOT NULL DEFAULT 0,
+        hour_histogram TEXT NOT NULL,
+        UNIQUE (log_filepath, ip)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analysis_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        analysis_id INTEGER NOT NULL,
+        run_id TEXT NOT NULL,
+        stage_order INTEGER NOT NULL,
+        stage TEXT NOT NULL,
+        wall_seconds REAL NOT NULL,
+        cpu_seconds REAL,
+        peak_rss_mb REAL,
+        lines_read INTEGER,
+        events INTEGER,
+        rows_written INTEGER,
+        error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_ip ON anomalies (ip, log_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_log_date ON anomalies (log_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_history_datetime ON analysis_history (analysis_datetime, id)",
+    "CREATE INDEX IF NOT EXISTS idx_metrics_analysis ON analysis_metrics (analysis_id, stage_order)",
+    "CREATE INDEX IF NOT EXISTS idx_metrics_stage ON analysis_metrics (stage, analysis_id)",
+]
+
+TABLES = ("anomalies", "analysis_history", "ip_stats", "analysis_metrics")
+
+
+def _format_datetime(value):
+    # Le date sono salvate come testo 'YYYY-MM-DD HH:MM:SS': l'ordine alfabetico è quello cronologico
+    return value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else value
+
+
+class SQLiteStorage(Storage):
+    """
+    Backend SQLite. Il database è un singolo file in modalità WAL (i lettori, es. la
+    finestra dello storico, non bloccano il writer); ogni thread usa una propria
+    connessione e ogni chiamata a write_analyses è un'unica transazione con
+    inserimenti executemany.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=None, busy_timeout=None):
+        self.path = path or SQLITE_CONFIG['path']
+        self.busy_timeout = busy_timeout or SQLITE_CONFIG['busy_timeout']
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # isolation_level=None: le transazioni sono gestite esplicitamente con BEGIN/COMMIT
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # Con WAL resta consistente anche dopo un crash
+            self._local.conn = conn
+        return conn
+
+    def _write(self, operation):
+        """
+        Esegue operation(conn) in una transazione (BEGIN IMMEDIATE ... COMMIT),
+        con rollback in caso di errore.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            operation(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def init(self):
+        try:
+            def create(conn):
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._write(create)
+            print(f"Database SQLite inizializzato con successo ({self.path}).")
+        except sqlite3.Error as err:
+            print(f"Errore durante l'inizializzazione del database: {err}")
+
+    @staticmethod
+    def _insert_anomalies(conn, anomalies, ip_counter, log_date=None):
+        log_date = _format_datetime(log_date or datetime.now())
+        conn.executemany(
+            "INSERT INTO anomalies (ip, attempts, log_date) VALUES (?, ?, ?)",
+            [(ip, ip_counter.get(ip, 0), log_date) for ip in anomalies]
+        )
+
+    @staticmethod
+    def _insert_analysis_history(conn, log_filepath, pdf_output_filepath, analysis_datetime=None):
+        if analysis_datetime is None:
+            cursor = conn.execute(
+                "INSERT INTO analysis_history (log_filepath, pdf_output_filepath) VALUES (?, ?)",
+                (log_filepath, pdf_output_filepath)
+            )
+        else:
+            cursor = conn.execute(
+                "INSERT INTO analysis_history (log_filepath, pdf_output_filepath, analysis_datetime) VALUES (?, ?, ?)",
+                (log_filepath, pdf_output_filepath, _format_datetime(analysis_datetime))
+            )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _upsert_ip_stats(conn, summary, log_filepath):
+        rows = [tuple(_format_datetime(value) for value in row) for row in ip_stats_rows(summary, log_filepath)]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in IP_STATS_COLUMNS[2:])
+        conn.executemany(
+            f"INSERT INTO ip_stats ({', '.join(IP_STATS_COLUMNS)}) VALUES ({', '.join('?' * len(IP_STATS_COLUMNS))}) "
+            f"ON CONFLICT (log_filepath, ip) DO UPDATE SET {updates}",
+            rows
+        )
+
+    @staticmethod
+    def _insert_metrics(conn, analysis_id, metrics):
+        conn.executemany(
+            f"INSERT INTO analysis_metrics ({', '.join(ANALYSIS_METRICS_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(ANALYSIS_METRICS_COLUMNS))})",
+            analysis_metrics_rows(analysis_id, metrics)
+        )
+
+    def write_analyses(self, analyses):
+        def write(conn):
+            for analysis in analyses:
+                analysis_datetime = analysis.get("analysis_datetime")
+                metrics = analysis.get("metrics")
+                # I tentativi non riusciti restano nel record come fasi 'db_write' con errore
+                with measure("db_write", metrics["stages"] if metrics else None) as stage:
+                    self._insert_anomalies(conn, analysis["anomalies"], analysis["ip_counter"], analysis_datetime)
+                    analysis_id = self._insert_analysis_history(conn, analysis["log_filepath"],
+                                                                analysis["pdf_output_filepath"], analysis_datetime)
+                    if analysis.get("summary") is not None:
+                        self._upsert_ip_stats(conn, analysis["summary"], analysis["log_filepath"])
+                    stage.count(rows=analysis_rows(analysis))
+                if metrics:
+                    self._insert_metrics(conn, analysis_id, metrics)
+        self._write(write)
+
+    def _write_anomalies(self, anomalies, ip_counter):
+        self._write(lambda conn: self._insert_anomalies(conn, anomalies, ip_counter))
+
+    def _write_history(self, log_filepath, pdf_output_filepath):
+        self._write(lambda conn: self._insert_analysis_history(conn, log_filepath, pdf_output_filepath))
+
+    def _fetch(self, query, params=()):
+        try:
+            return [dict(row) for row in self._connection().execute(query, params).fetchall()]
+        except sqlite3.Error as err:
+            print(f"Errore durante il recupero dei dati: {err}")
+            return []
+
+    def get_analysis_history(self):
+        return self._fetch("SELECT * FROM analysis_history ORDER BY analysis_datetime DESC, id DESC")
+
+    def get_analysis_history_page(self, after=None, limit=HISTORY_PAGE_SIZE):
+        query = "SELECT id, log_filepath, pdf_output_filepath, analysis_datetime FROM analysis_history"
+        params = []
+        if after is not None:
+            query += " WHERE analysis_datetime < ? OR (analysis_datetime = ? AND id < ?)"
+            params = [after[0], after[0], after[1]]
+        query += " ORDER BY analysis_datetime DESC, id DESC LIMIT ?"
+        rows = self._fetch(query, params + [limit + 1]) # Una riga in più per sapere se esiste la pagina successiva
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]['analysis_datetime'], rows[-1]['id'])
+
+    def get_anomalies_page(self, after=None, limit=HISTORY_PAGE_SIZE, ip=None):
+        query = "SELECT id, ip, attempts, log_date FROM anomalies"
+        conditions = []
+        params = []
+        if ip is not None:
+            conditions.append("ip = ?")
+            params.append(ip)
+        if after is not None:
+            conditions.append("(log_date < ? OR (log_date = ? AND id < ?))")
+            params += [after[0], after[0], after[1]]
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY log_date DESC, id DESC LIMIT ?"
+        rows = self._fetch(query, params + [limit + 1])
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]['log_date'], rows[-1]['id'])
+
+    def get_analysis_metrics(self, analysis_id):
+        return self._fetch(
+            f"SELECT {', '.join(ANALYSIS_METRICS_COLUMNS)} FROM analysis_metrics "
+            "WHERE analysis_id = ? ORDER BY stage_order",
+            (analysis_id,)
+        )
+
+    def reset(self):
+        try:
+            def drop(conn):
+                for table in TABLES:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self._write(drop)
+            print("🗑️ Tabelle database SQLite eliminate.")
+        except sqlite3.Error as err:
+            print(f"Errore durante il reset del database: {err}")
+        self.init()
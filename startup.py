@@ -0,0 +1,83 @@
+# startup.py
+# Misura del tempo di avvio e pre-caricamento in background delle dipendenze pesanti
+# (scikit-learn, matplotlib, ReportLab), che i moduli importano solo al primo utilizzo.
+
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Istante di riferimento per la misura dell'avvio: importare questo modulo per primo
+# (vedi main.py) lo rende praticamente l'istante di avvio del processo
+PROCESS_START = time.perf_counter()
+
+# Moduli caricati in modo lazy, in ordine di pre-caricamento (prima i più lenti)
+HEAVY_MODULES = ("sklearn.ensemble", "report_generator")
+
+STARTUP_LOG = os.path.join("output", "startup_times.jsonl") # Storico dei tempi di avvio
+
+
+def elapsed():
+    """
+    Restituisce i secondi trascorsi dall'avvio del processo (PROCESS_START).
+    """
+    return time.perf_counter() - PROCESS_START
+
+
+def prewarm(modules=HEAVY_MODULES, on_done=None):
+    """
+    Importa i moduli indicati in un thread in background, così il primo utilizzo
+    (es. la prima analisi) non paga il costo di caricamento.
+
+    Args:
+        modules (tuple): Nomi dei moduli da importare.
+        on_done (callable): Funzione chiamata con i secondi impiegati al termine.
+
+    Returns:
+        threading.Thread: Il thread avviato.
+    """
+    def run():
+        start = time.perf_counter()
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"Pre-caricamento di {name} non riuscito: {e}")
+        if on_done:
+            on_done(time.perf_counter() - start)
+
+    thread = threading.Thread(target=run, name="Prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def heavy_modules_loaded():
+    """
+    Restituisce quali dipendenze pesanti sono già state caricate nel processo.
+    """
+    return [name for name in ("sklearn", "matplotlib", "reportlab", "mysql.connector") if name in sys.modules]
+
+
+def record_startup(seconds, label="gui", path=STARTUP_LOG, heavy=None):
+    """
+    Aggiunge il tempo di avvio allo storico (una riga JSON per avvio), così
+    l'andamento può essere confrontato tra una versione e l'altra.
+    """
+    record = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "label": label,
+        "seconds": round(seconds, 4),
+        "heavy_modules_loaded": heavy_modules_loaded() if heavy is None else heavy,
+    }
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Impossibile registrare il tempo di avvio: {e}")
+    return record
+
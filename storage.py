@@ -0,0 +1,271 @@
+# storage.py
+# Interfaccia di persistenza: le operazioni sul database (inizializzazione, salvataggio
+# di anomalie e storico, lettura dello storico, reset) sono indipendenti dal backend.
+# Backend disponibili: MySQL (database.py) e SQLite integrato (sqlite_storage.py).
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from db_config import STORAGE_BACKEND
+from timestamps import epoch_to_datetime, seconds_to_datetime
+
+HISTORY_PAGE_SIZE = 50 # Righe per pagina nelle query paginate
+
+IP_STATS_COLUMNS = ("log_filepath", "ip", "attempts", "first_seen", "last_seen", "distinct_users", "hour_histogram")
+
+# Colonne della tabella analysis_metrics (una riga per fase di ogni analisi, più il totale)
+ANALYSIS_METRICS_COLUMNS = ("analysis_id", "run_id", "stage_order", "stage", "wall_seconds", "cpu_seconds",
+                            "peak_rss_mb", "lines_read", "events", "rows_written", "error")
+
+
+def ip_stats_rows(summary, log_filepath, year=None):
+    """
+    Costruisce le righe della tabella ip_stats a partire dal riepilogo di analyze_events.
+    Args:
+        summary (dict): Riepilogo dell'analisi.
+        log_filepath (str): Percorso del file di log analizzato.
+        year (int): Anno a cui riferire i timestamp syslog (default: anno corrente), usato
+            solo per i riepiloghi senza istanti assoluti ('bursts', versioni precedenti).
+    Restituisce:
+        rows (list): Tuple (log_filepath, ip, attempts, first_seen, last_seen,
+            distinct_users, hour_histogram).
+    """
+    year = year or datetime.now().year
+    ip_hourly = summary.get("ip_hourly", {})
+    ip_users = summary.get("ip_users", {})
+    ip_minutes = summary.get("ip_minutes", {})
+    # Primo/ultimo istante con l'anno dedotto dal log (corretti anche a cavallo di capodanno)
+    seen = summary["bursts"].seen if summary.get("bursts") is not None else {}
+    rows = []
+    for ip, attempts in summary["ip_counter"].items():
+        minutes = ip_minutes.get(ip)
+        if ip in seen:
+            first_seen, last_seen = (epoch_to_datetime(epoch) for epoch in seen[ip])
+        else:
+            first_seen = seconds_to_datetime(minutes[1] * 60, year) if minutes else None
+            last_seen = seconds_to_datetime(minutes[2] * 60, year) if minutes else None
+        hours = ip_hourly.get(ip, {})
+        histogram = ",".join(str(hours.get(hour, 0)) for hour in range(24))
+        rows.append((log_filepath, ip, attempts, first_seen, last_seen, len(ip_users.get(ip, ())), histogram))
+    return rows
+
+
+def analysis_record(anomalies, ip_counter, log_filepath, pdf_output_filepath, summary=None, analysis_datetime=None,
+                    metrics=None):
+    """
+    Restituisce il dizionario che descrive un'analisi da salvare (formato di write_analyses).
+    'metrics' è il record delle fasi dell'analisi (instrumentation.RunMetrics.finish()).
+    """
+    return {
+        "anomalies": list(anomalies or []),
+        "ip_counter": ip_counter,
+        "log_filepath": log_filepath,
+        "pdf_output_filepath": pdf_output_filepath,
+        "summary": summary,
+        "analysis_datetime": analysis_datetime,
+        "metrics": metrics,
+    }
+
+
+def analysis_rows(analysis):
+    """
+    Restituisce il numero di righe scritte per un'analisi (anomalie, storico e statistiche per IP).
+    """
+    summary = analysis.get("summary")
+    return len(analysis["anomalies"]) + 1 + (len(summary["ip_counter"]) if summary is not None else 0)
+
+
+def analysis_metrics_rows(analysis_id, metrics):
+    """
+    Costruisce le righe della tabella analysis_metrics per il record di una run:
+    una riga per fase, nell'ordine di esecuzione, più una riga 'total' con la durata
+    complessiva, la somma dei tempi CPU e il picco di memoria.
+    Restituisce:
+        rows (list): Tuple nell'ordine di ANALYSIS_METRICS_COLUMNS.
+    """
+    rows = []
+    stages = metrics["stages"]
+    for order, stage in enumerate(stages):
+        error = stage.get("error")
+        rows.append((analysis_id, metrics["run_id"], order, stage["stage"], stage["wall_seconds"], stage["cpu_seconds"],
+                     stage["peak_rss_mb"], stage.get("lines"), stage.get("events"), stage.get("rows"),
+                     error[:255] if error else None))
+    rows.append((analysis_id, metrics["run_id"], len(stages), "total", metrics["total_seconds"],
+                 round(sum(stage["cpu_seconds"] for stage in stages), 6),
+                 max((stage["peak_rss_mb"] for stage in stages), default=None), None, None, None, None))
+    return rows
+
+
+class Storage(ABC):
+    """
+    Interfaccia comune dei backend di persistenza.
+    Le sottoclassi devono implementare (metodi astratti) init, write_analyses, le query
+    di lettura, reset, _write_anomalies e _write_history;
+    i metodi save_* sono costruiti su write_analyses e non sollevano eccezioni
+    (stampano l'errore, come il resto dell'applicazione).
+    """
+
+    name = None
+
+    @abstractmethod
+    def init(self):
+        """Crea le tabelle e gli indici mancanti."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_analyses(self, analyses):
+        """
+        Scrive più analisi (dizionari di analysis_record) in un'unica transazione.
+        In caso di errore solleva l'eccezione del backend, così il chiamante può ritentare.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_analysis_history(self):
+        """Restituisce tutto lo storico delle analisi, dalla più recente."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_analysis_history_page(self, after=None, limit=HISTORY_PAGE_SIZE):
+        """
+        Restituisce (righe, chiave_successiva) di una pagina dello storico, con
+        paginazione a chiave su (analysis_datetime, id).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_anomalies_page(self, after=None, limit=HISTORY_PAGE_SIZE, ip=None):
+        """
+        Restituisce (righe, chiave_successiva) di una pagina delle anomalie, con
+        paginazione a chiave su (log_date, id), eventualmente filtrate per IP.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_analysis_metrics(self, analysis_id):
+        """Restituisce le misure per fase di un'analisi (righe di analysis_metrics, in ordine)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset(self):
+        """Elimina tutte le tabelle e le ricrea vuote."""
+        raise NotImplementedError
+
+    def save_analysis(self, anomalies, ip_counter, log_filepath, pdf_output_filepath, summary=None):
+        """
+        Salva in un'unica transazione anomalie, storico e (se fornito il riepilogo)
+        statistiche per IP. Restituisce True se il salvataggio è andato a buon fine.
+        """
+        try:
+            self.write_analyses([analysis_record(anomalies, ip_counter, log_filepath, pdf_output_filepath, summary)])
+            print(f"Anomalie e storico analisi salvati nel database ({self.name}).")
+            return True
+        except Exception as err:
+            print(f"Errore durante il salvataggio dell'analisi: {err}")
+            return False
+
+    def save_anomalies(self, anomalies, ip_counter):
+        """Salva solo le anomalie (senza riga di storico)."""
+        try:
+            self._write_anomalies(anomalies, ip_counter)
+            print(f"Anomalie salvate nel database ({self.name}).")
+        except Exception as err:
+            print(f"Errore durante il salvataggio delle anomalie: {err}")
+
+    def save_analysis_history(self, log_filepath, pdf_output_filepath):
+        """Salva solo la riga di storico di un'analisi."""
+        try:
+            self._write_history(log_filepath, pdf_output_filepath)
+            print(f"Storico analisi salvato nel database ({self.name}).")
+        except Exception as err:
+            print(f"Errore durante il salvataggio dello storico analisi: {err}")
+
+    @abstractmethod
+    def _write_anomalies(self, anomalies, ip_counter):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _write_history(self, log_filepath, pdf_output_filepath):
+        raise NotImplementedError
+
+
+class MySQLStorage(Storage):
+    """
+    Backend MySQL: delega alle funzioni di database.py (pool di connessioni,
+    scritture in blocco, migrazioni dello schema).
+    """
+
+    name = "mysql"
+
+    @property
+    def _db(self):
+        # Import lazy: chi usa SQLite non ha bisogno di mysql-connector e l'avvio non ne paga il caricamento
+        import database
+        return database
+
+    def init(self):
+        self._db.init_db()
+
+    def write_analyses(self, analyses):
+        self._db.write_analyses(analyses)
+
+    def get_analysis_history(self):
+        return self._db.get_analysis_history()
+
+    def get_analysis_history_page(self, after=None, limit=HISTORY_PAGE_SIZE):
+        return self._db.get_analysis_history_page(after, limit)
+
+    def get_anomalies_page(self, after=None, limit=HISTORY_PAGE_SIZE, ip=None):
+        return self._db.get_anomalies_page(after, limit, ip)
+
+    def get_analysis_metrics(self, analysis_id):
+        return self._db.get_analysis_metrics(analysis_id)
+
+    def reset(self):
+        self._db.drop_tables()
+        self._db.init_db()
+
+    def save_analysis(self, anomalies, ip_counter, log_filepath, pdf_output_filepath, summary=None):
+        return self._db.save_analysis(anomalies, ip_counter, log_filepath, pdf_output_filepath, summary)
+
+    def save_anomalies(self, anomalies, ip_counter):
+        self._db.save_anomalies(anomalies, ip_counter)
+
+    def save_analysis_history(self, log_filepath, pdf_output_filepath):
+        self._db.save_analysis_history(log_filepath, pdf_output_filepath)
+
+    def _write_anomalies(self, anomalies, ip_counter):
+        with self._db.transaction() as cursor:
+            self._db._insert_anomalies(cursor, anomalies, ip_counter)
+
+    def _write_history(self, log_filepath, pdf_output_filepath):
+        with self._db.transaction() as cursor:
+            self._db._insert_analysis_history(cursor, log_filepath, pdf_output_filepath)
+
+
+_storage = None
+
+
+def get_storage(backend=None):
+    """
+    Restituisce il backend di persistenza configurato (db_config.STORAGE_BACKEND),
+    creato una sola volta e condiviso da tutta l'applicazione.
+    Args:
+        backend (str): 'mysql' o 'sqlite' per forzare un backend (crea una nuova istanza).
+    Restituisce:
+        storage (Storage): Istanza del backend.
+    """
+    global _storage
+    if backend is None and _storage is not None:
+        return _storage
+    name = backend or STORAGE_BACKEND
+    if name == "mysql":
+        storage = MySQLStorage()
+    elif name == "sqlite":
+        from sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage()
+    else:
+        raise ValueError(f"Backend di persistenza non supportato: {name}")
+    if backend is None:
+        _storage = storage
+    return storage
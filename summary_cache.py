@@ -0,0 +1,237 @@
+# summary_cache.py
+# Cache dei riepiloghi (ip_counter, hourly_counter, ...) indicizzata per impronta del file,
+# così i log già analizzati e non modificati non vengono mai rielaborati.
+
+import hashlib
+import os
+import pickle
+
+from analyzer import update_summary
+from log_parser import is_compressed
+from parallel_engine import analyze_parallel
+import sketches
+
+CACHE_DIR = os.path.join("cache", "summaries")   # Cartella della cache
+CACHE_MAX_BYTES = 256 * 1024 * 1024              # Dimensione massima della cache su disco
+SAMPLE_SIZE = 64 * 1024                          # Byte letti per ogni campione
+SAMPLE_COUNT = 8                                 # Numero di campioni per l'impronta del contenuto
+SUMMARY_FORMAT = 3                               # Versione della struttura del riepilogo (3: minuti contati per IP)
+
+
+def content_hash(filepath, size):
+    """
+    Calcola un'impronta del contenuto dei primi 'size' byte del file leggendo solo
+    alcuni campioni (inizio, fine e punti intermedi equidistanti).
+    Le posizioni dei campioni dipendono solo da 'size': ricalcolando l'impronta con la
+    vecchia dimensione si può verificare che un file cresciuto abbia lo stesso prefisso.
+    """
+    digest = hashlib.sha256(str(size).encode())
+    with open(filepath, "rb") as file:
+        if size <= SAMPLE_SIZE * SAMPLE_COUNT:
+            digest.update(file.read(size))
+        else:
+            step = (size - SAMPLE_SIZE) // (SAMPLE_COUNT - 1)
+            for index in range(SAMPLE_COUNT):
+                file.seek(index * step)
+                digest.update(file.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def file_fingerprint(filepath):
+    """
+    Restituisce l'impronta di un file: dimensione, mtime, inode e hash campionato
+    del contenuto. Due file con la stessa impronta hanno lo stesso riepilogo.
+    """
+    stat = os.stat(filepath)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inode": (stat.st_dev, stat.st_ino),
+        "content": content_hash(filepath, stat.st_size),
+    }
+
+
+def _ends_with_newline(filepath, size):
+    if size == 0:
+        return True
+    with open(filepath, "rb") as file:
+        file.seek(size - 1)
+        return file.read(1) == b"\n"
+
+
+class SummaryCache:
+    """
+    Cache su disco dei riepiloghi di analisi.
+    - Se l'impronta del file coincide con una voce salvata, il riepilogo viene
+      restituito senza rileggere il log.
+    - Se lo stesso file (stesso inode) è solo cresciuto e il vecchio contenuto è
+      invariato, il riepilogo salvato viene riutilizzato e si elabora solo la coda.
+    - Quando la cache supera max_bytes vengono eliminate le voci usate meno di recente.
+    Con 'approximate' i riepiloghi sono calcolati in modalità approssimata (vedi
+    analyze_events) e salvati separatamente da quelli esatti.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, workers=None, approximate=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.approximate = sketches.APPROXIMATE if approximate is None else approximate
+
+    def _key(self, fingerprint):
+        # La versione del formato fa sì che i riepiloghi delle versioni precedenti non vengano più usati
+        mode = "approx" if self.approximate else "exact"
+        raw = (f"{SUMMARY_FORMAT}:{mode}:{fingerprint['size']}:{fingerprint['mtime_ns']}:{fingerprint['inode']}:"
+               f"{fingerprint['content']}")
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _inode_path(self, inode):
+        suffix = "-approx" if self.approximate else ""
+        return os.path.join(self.directory, f"inode-{inode[0]}-{inode[1]}{suffix}.ptr")
+
+    def _read_entry(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Voce di cache non leggibile ({path}): {e}")
+            return None
+        os.utime(path)  # Aggiorna l'ordine LRU
+        return entry
+
+    def get(self, filepath, fingerprint=None):
+        """
+        Restituisce il riepilogo salvato per il file, se l'impronta coincide; altrimenti None.
+        """
+        fingerprint = fingerprint or file_fingerprint(filepath)
+        entry = self._read_entry(self._key(fingerprint))
+        return entry["summary"] if entry else None
+
+    def put(self, filepath, summary, fingerprint=None):
+        """
+        Salva il riepilogo del file in cache e applica l'eliminazione LRU.
+        """
+        fingerprint = fingerprint or file_fingerprint(filepath)
+        os.makedirs(self.directory, exist_ok=True)
+        key = self._key(fingerprint)
+        entry = {
+            "format": SUMMARY_FORMAT,
+            "fingerprint": fingerprint,
+            "ends_with_newline": _ends_with_newline(filepath, fingerprint["size"]),
+            "summary": summary,
+        }
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        with open(self._inode_path(fingerprint["inode"]), "w") as file:
+            file.write(key)
+        self.evict()
+
+    def _prefix_entry(self, filepath, fingerprint):
+        """
+        Cerca una voce salvata per lo stesso inode di cui il file attuale è
+        un'estensione (crescita in sola aggiunta).
+        """
+        try:
+            with open(self._inode_path(fingerprint["inode"])) as file:
+                key = file.read().strip()
+        except FileNotFoundError:
+            return None
+        entry = self._read_entry(key)
+        if entry is None or entry.get("format") != SUMMARY_FORMAT:
+            return None
+        old = entry["fingerprint"]
+        if (old["size"] >= fingerprint["size"] or not entry["ends_with_newline"]
+                or content_hash(filepath, old["size"]) != old["content"]):
+            return None
+        return entry
+
+    def analyze(self, filepath, stats=None, progress=None):
+        """
+        Restituisce il riepilogo del file usando la cache quando possibile.
+
+        Args:
+            filepath (str): Percorso del file di log.
+            stats (dict): Se indicato, vi viene registrato il numero di righe
+                effettivamente lette ('lines': 0 se il riepilogo viene dalla cache).
+            progress (progress.Progress): Avanzamento e annullamento della lettura del
+                log (vedi analyze_parallel); un'analisi annullata non viene salvata.
+
+        Returns:
+            tuple: (riepilogo, esito) dove esito è 'hit' (dalla cache), 'append'
+                (riepilogo in cache + coda nuova) oppure 'miss' (analisi completa).
+        """
+        # L'analisi si ferma alla dimensione dell'impronta: le righe aggiunte nel frattempo
+        # a un log attivo verranno lette come coda alla prossima analisi, non contate due volte
+        fingerprint = file_fingerprint(filepath)
+        summary = self.get(filepath, fingerprint)
+        if summary is not None:
+            if stats is not None:
+                stats["lines"] = 0
+            return summary, "hit"
+
+        # I file compressi non crescono in sola aggiunta: niente riuso del prefisso
+        entry = None if is_compressed(filepath) else self._prefix_entry(filepath, fingerprint)
+        if entry is not None:
+            summary = entry["summary"]
+            tail = analyze_parallel(filepath, self.workers, start=entry["fingerprint"]["size"],
+                                    approximate=self.approximate, progress=progress, end=fingerprint["size"])
+            update_summary(summary, tail)
+            scanned = tail.get("lines", 0)
+            outcome = "append"
+        else:
+            summary = analyze_parallel(filepath, self.workers, approximate=self.approximate, progress=progress,
+                                       end=fingerprint["size"])
+            scanned = summary.get("lines", 0)
+            outcome = "miss"
+
+        if stats is not None:
+            stats["lines"] = scanned
+        self.put(filepath, summary, fingerprint)
+        return summary, outcome
+
+    def evict(self):
+        """
+        Elimina le voci usate meno di recente finché la cache non rientra in max_bytes,
+        poi i puntatori per inode (.ptr) rimasti senza voce.
+        """
+        entries = []
+        pointers = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".ptr"):
+                pointers.append(os.path.join(self.directory, name))
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                print(f"Errore durante l'eliminazione della voce di cache {path}: {e}")
+
+        for path in pointers:
+            try:
+                with open(path) as file:
+                    key = file.read().strip()
+                if not os.path.exists(self._entry_path(key)):
+                    os.remove(path)
+            except OSError as e:
+                print(f"Errore durante l'eliminazione del puntatore di cache {path}: {e}")
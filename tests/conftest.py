@@ -0,0 +1,8 @@
+# conftest.py
+# I moduli del progetto sono al primo livello: li rende importabili dai test.
+
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
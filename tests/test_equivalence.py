@@ -0,0 +1,120 @@
+# test_equivalence.py
+# Verifica sui file di sample_logs/ che i percorsi veloci diano gli stessi risultati di
+# quelli originali: parser, analisi seriale e parallela, decodifica dei timestamp e
+# conteggio dei minuti di attività per IP.
+
+import glob
+import os
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from analyzer import analyze_events
+from log_parser import iter_log_events, iter_log_records, parse_log, parse_log_compact
+from parallel_engine import analyze_parallel
+from timestamps import decode_seconds
+
+SAMPLE_LOGS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                            "sample_logs", "*.log")))
+
+# Chiavi del riepilogo che devono coincidere tra analisi seriale e parallela
+SUMMARY_KEYS = ("ip_counter", "hourly_counter", "ip_hourly", "ip_users", "ip_minutes")
+
+
+def baseline_events(filepath):
+    """Parser originale: IP e timestamp delle righe "Failed password", letti con split()."""
+    events = []
+    with open(filepath) as file:
+        for line in file:
+            if "Failed password" in line:
+                parts = line.split()
+                events.append((parts[-4], " ".join(parts[0:3])))
+    return events
+
+
+def reference_of(filepath):
+    return datetime.fromtimestamp(os.path.getmtime(filepath))
+
+
+@pytest.fixture(params=SAMPLE_LOGS, ids=os.path.basename)
+def sample_log(request):
+    return request.param
+
+
+@pytest.fixture
+def chronological_log(sample_log, tmp_path):
+    """
+    Copia di un file di sample_logs/ con le righe in ordine cronologico, come in un log
+    scritto da syslog: i file di esempio sono in parte mescolati e il conteggio dei minuti
+    di attività (analyzer._add_minute) è esatto solo per i log in ordine.
+    """
+    with open(sample_log) as file:
+        lines = [line if line.endswith("\n") else line + "\n" for line in file]
+    lines.sort(key=lambda line: decode_seconds(" ".join(line.split()[0:3])))
+    path = tmp_path / os.path.basename(sample_log)
+    path.write_text("".join(lines))
+    os.utime(path, (os.path.getmtime(sample_log),) * 2)
+    return str(path)
+
+
+def test_parser_matches_baseline(sample_log):
+    expected = baseline_events(sample_log)
+    assert expected
+    assert [(event["ip"], event["timestamp"]) for event in parse_log(sample_log)] == expected
+    assert [(event["ip"], event["timestamp"]) for event in iter_log_events(sample_log)] == expected
+    assert [(record.ip, record.timestamp) for record in iter_log_records(sample_log, types={"Failed password"})] \
+        == expected
+
+
+def test_parallel_matches_serial(chronological_log):
+    serial = analyze_events(iter_log_events(chronological_log), reference_of(chronological_log))
+    # Porzioni piccole: il file viene diviso tra più processi
+    parallel = analyze_parallel(chronological_log, workers=3, min_chunk_size=4096)
+    with open(chronological_log) as file:
+        assert parallel["lines"] == sum(1 for _ in file)
+    for key in SUMMARY_KEYS:
+        assert parallel[key] == serial[key], key
+    assert parallel["ip_counter"] == Counter(ip for ip, _ in baseline_events(chronological_log))
+
+
+def test_compact_batch_matches_serial(chronological_log):
+    serial = analyze_events(iter_log_events(chronological_log), reference_of(chronological_log))
+    batch = analyze_events(parse_log_compact(chronological_log), reference_of(chronological_log))
+    for key in SUMMARY_KEYS:
+        assert batch[key] == serial[key], key
+
+
+def test_decode_seconds_matches_strptime(sample_log):
+    timestamps = {timestamp for _, timestamp in baseline_events(sample_log)}
+    for timestamp in timestamps:
+        # decode_seconds conta i giorni su un anno bisestile (vedi timestamps.MONTH_OFFSETS)
+        parsed = datetime.strptime(timestamp, "%b %d %H:%M:%S").replace(year=2000)
+        assert decode_seconds(timestamp) == (parsed - datetime(2000, 1, 1)).total_seconds(), timestamp
+
+
+def test_minute_counts_match_sets(chronological_log):
+    # Conteggio originale: insieme dei minuti (anno senza importanza) con almeno un tentativo
+    minute_sets = {}
+    for ip, timestamp in baseline_events(chronological_log):
+        parsed = datetime.strptime(timestamp, "%b %d %H:%M:%S").replace(year=2000)
+        minute_sets.setdefault(ip, set()).add(int((parsed - datetime(2000, 1, 1)).total_seconds()) // 60)
+
+    summary = analyze_events(iter_log_events(chronological_log), reference_of(chronological_log))
+    assert set(summary["ip_minutes"]) == set(minute_sets)
+    for ip, minutes in minute_sets.items():
+        assert summary["ip_minutes"][ip] == [len(minutes), min(minutes), max(minutes)], ip
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "auth.log"
+    path.write_text("")
+    assert parse_log(str(path)) == []
+    assert list(iter_log_events(str(path))) == []
+    assert list(iter_log_records(str(path))) == []
+    summary = analyze_parallel(str(path), workers=2)
+    assert not summary["ip_counter"]
+    assert not summary["hourly_counter"]
+    assert not summary["ip_minutes"]
+    assert summary["lines"] == 0
+
@@ -0,0 +1,295 @@
+# timestamps.py
+# Decodifica veloce dei timestamp syslog (formato "Mese Giorno Ora:Minuti:Secondi").
+
+import calendar
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+# Abbreviazioni dei mesi (come %b in locale C) -> numero del mese
+MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+
+# Giorni massimi per mese (29 per febbraio: l'anno non è presente nel timestamp)
+DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Numero di timestamp distinti (risoluzione al secondo) tenuti in cache
+HOUR_CACHE_SIZE = 1 << 17
+
+# Giorni trascorsi dall'inizio dell'anno al primo di ogni mese (anno bisestile,
+# così anche il 29 febbraio ha una posizione distinta)
+MONTH_OFFSETS = (0, 0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+
+# Fine del 29 febbraio (in secondi dall'inizio dell'anno, con gli offset di MONTH_OFFSETS)
+LEAP_DAY_END = MONTH_OFFSETS[3] * 86400
+
+_DIGITS = "0123456789"
+
+
+def _strptime_fields(timestamp):
+    """
+    Percorso lento di riserva: usa datetime.strptime per i formati non canonici
+    (es. ore a una cifra o mesi in minuscolo) e datetime.fromisoformat per RFC 3339,
+    restituendo None se non valido.
+    """
+    try:
+        parsed = datetime.strptime(timestamp, "%b %d %H:%M:%S")
+    except ValueError:
+        # Timestamp RFC 3339 (es. "2024-01-10T12:34:56+00:00"): si usa l'ora locale riportata
+        if len(timestamp) < 19 or timestamp[10] != "T":
+            return None
+        try:
+            parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return parsed.month, parsed.day, parsed.hour, parsed.minute, parsed.second
+
+
+def _parse_fields(timestamp):
+    """
+    Scompone un timestamp syslog con parsing a posizioni fisse.
+
+    Returns:
+        tuple: (mese, giorno, ora, minuti, secondi), oppure None se non valido.
+    """
+    # Forma canonica: "Mmm D HH:MM:SS" (14 caratteri) o "Mmm DD HH:MM:SS" (15)
+    length = len(timestamp)
+    month = MONTHS.get(timestamp[:3])
+    if month is None or length not in (14, 15) or timestamp[3] != " ":
+        return _strptime_fields(timestamp)
+
+    day_text = timestamp[4:length - 9]
+    clock = timestamp[length - 8:]
+    if (timestamp[length - 9] != " " or clock[2] != ":" or clock[5] != ":"
+            or not all(c in _DIGITS for c in day_text + clock[0:2] + clock[3:5] + clock[6:8])):
+        return _strptime_fields(timestamp)
+
+    day = int(day_text)
+    hour = int(clock[0:2])
+    minute = int(clock[3:5])
+    second = int(clock[6:8])
+    if not 1 <= day <= DAYS_IN_MONTH[month] or hour > 23 or minute > 59 or second > 59:
+        return None
+    return month, day, hour, minute, second
+
+
+@lru_cache(maxsize=HOUR_CACHE_SIZE)
+def decode_hour(timestamp):
+    """
+    Estrae l'ora da un timestamp syslog con parsing a posizioni fisse.
+    Gestisce sia il giorno con zero iniziale ("Jan 01") sia quello a una cifra
+    ("Jan 1", come in sample_logs/auth2.log). I risultati sono in cache, dato che
+    nei log lo stesso secondo si ripete molte volte.
+
+    Args:
+        timestamp (str): Timestamp nel formato "Mese Giorno Ora:Minuti:Secondi".
+
+    Returns:
+        int: Ora del giorno (0-23), oppure None se il timestamp non è valido.
+    """
+    fields = _parse_fields(timestamp)
+    return None if fields is None else fields[2]
+
+
+@lru_cache(maxsize=HOUR_CACHE_SIZE)
+def decode_seconds(timestamp):
+    """
+    Converte un timestamp syslog nel numero di secondi trascorsi dall'inizio
+    dell'anno (l'anno non è presente nel formato syslog).
+
+    Args:
+        timestamp (str): Timestamp nel formato "Mese Giorno Ora:Minuti:Secondi".
+
+    Returns:
+        int: Secondi dall'inizio dell'anno, oppure None se il timestamp non è valido.
+    """
+    fields = _parse_fields(timestamp)
+    if fields is None:
+        return None
+    month, day, hour, minute, second = fields
+    return ((MONTH_OFFSETS[month] + day - 1) * 24 + hour) * 3600 + minute * 60 + second
+
+
+def seconds_to_datetime(seconds, year):
+    """
+    Operazione inversa di decode_seconds: converte i secondi dall'inizio dell'anno
+    in un datetime dell'anno indicato.
+
+    Args:
+        seconds (int): Secondi dall'inizio dell'anno (come da decode_seconds).
+        year (int): Anno a cui riferire il timestamp.
+
+    Returns:
+        datetime: Data e ora corrispondenti, oppure None se non valide in quell'anno
+            (es. 29 febbraio di un anno non bisestile).
+    """
+    days, remainder = divmod(seconds, 86400)
+    month = bisect_right(MONTH_OFFSETS, days, 1) - 1
+    try:
+        return datetime(year, month, days - MONTH_OFFSETS[month] + 1,
+                        remainder // 3600, (remainder // 60) % 60, remainder % 60)
+    except ValueError:
+        return None
+
+
+class YearResolver:
+    """
+    Converte i secondi dall'inizio dell'anno (decode_seconds) in secondi epoch,
+    deducendo l'anno mancante nel formato syslog da un istante di riferimento
+    (es. la data di modifica del file di log): un evento appartiene all'anno del
+    riferimento se non lo supera, altrimenti all'anno precedente. Così un log
+    che attraversa il capodanno ("Dec 31" ... "Jan 01") resta in ordine cronologico.
+    La decisione dipende solo dal riferimento, quindi porzioni diverse dello stesso
+    file (analizzate da processi diversi) producono secondi coerenti.
+
+    I secondi epoch sono riferiti all'ora locale del log (senza fuso orario): le
+    differenze tra eventi sono esatte anche se il log non riporta il fuso.
+    """
+
+    def __init__(self, reference=None, tolerance=86400):
+        """
+        Args:
+            reference (datetime): Istante di riferimento (default: adesso).
+            tolerance (int): Secondi oltre il riferimento ancora attribuiti al suo anno
+                (orologi non sincronizzati, fusi orari diversi).
+        """
+        reference = reference or datetime.now()
+        year = reference.year
+        self.limit = (((MONTH_OFFSETS[reference.month] + reference.day - 1) * 24 + reference.hour) * 3600
+                      + reference.minute * 60 + reference.second + tolerance)
+        self.current = self._year_base(year)
+        self.previous = self._year_base(year - 1)
+
+    @staticmethod
+    def _year_base(year):
+        # (epoch dell'1 gennaio, True se l'anno è bisestile)
+        return calendar.timegm((year, 1, 1, 0, 0, 0)), calendar.isleap(year)
+
+    def epoch(self, seconds):
+        """
+        Restituisce i secondi epoch dell'evento, oppure None se 'seconds' è None (o negativo).
+        """
+        if seconds is None or seconds < 0:
+            return None
+        base, leap = self.current if seconds <= self.limit else self.previous
+        # MONTH_OFFSETS conta il 29 febbraio: negli anni non bisestili da marzo in poi si toglie un giorno
+        if not leap and seconds >= LEAP_DAY_END:
+            seconds -= 86400
+        return base + seconds
+
+    def epochs(self, seconds):
+        """
+        Variante vettoriale di epoch per un array NumPy di secondi dall'inizio dell'anno
+        (-1 per i timestamp non validi, che restano -1).
+        """
+        seconds = np.asarray(seconds, dtype=np.int64)
+        current = seconds <= self.limit
+        base = np.where(current, self.current[0], self.previous[0])
+        leap = np.where(current, self.current[1], self.previous[1])
+        result = base + seconds - np.where(~leap & (seconds >= LEAP_DAY_END), 86400, 0)
+        return np.where(seconds >= 0, result, -1)
+
+
+def epoch_to_datetime(epoch):
+    """
+    Converte i secondi epoch di YearResolver nel datetime (ora locale del log, senza fuso).
+    """
+    return datetime(1970, 1, 1) + timedelta(seconds=int(epoch))
+
+
+def decode_hours(timestamps):
+    """
+    Estrae le ore di un intero blocco di timestamp in un'unica passata NumPy.
+    Le righe in forma canonica vengono decodificate in modo vettoriale;
+    le altre passano per decode_hour.
+
+    Args:
+        timestamps (list): Lista di timestamp syslog (str).
+
+    Returns:
+        numpy.ndarray: Array di interi con l'ora di ogni timestamp (-1 se non valido).
+    """
+    count = len(timestamps)
+    hours = np.full(count, -1, dtype=np.int8)
+    if count == 0:
+        return hours
+
+    try:
+        # Matrice (n, 16) di byte ASCII, allineata a sinistra e riempita con zeri:
+        # i timestamp più lunghi di 15 caratteri risultano di lunghezza 16 e
+        # vengono quindi trattati come non canonici
+        raw = np.array(timestamps, dtype="S16")
+    except UnicodeEncodeError:
+        # Caratteri non ASCII: decodifica tutto con il percorso scalare
+        for index, timestamp in enumerate(timestamps):
+            hour_value = decode_hour(timestamp)
+            if hour_value is not None:
+                hours[index] = hour_value
+        return hours
+    matrix = raw.view(np.uint8).reshape(count, 16)
+    lengths = np.char.str_len(raw)
+    rows = np.arange(count)
+
+    def column(offset_from_end):
+        return matrix[rows, np.clip(lengths - offset_from_end, 0, 15)].astype(np.int16)
+
+    def digit(values):
+        return values - ord("0")
+
+    month_codes = raw.astype("S3")
+    month_numbers = np.zeros(count, dtype=np.int16)
+    for name, number in MONTHS.items():
+        month_numbers[month_codes == name.encode()] = number
+
+    day_tens = np.where(lengths == 15, digit(matrix[:, 4].astype(np.int16)), 0)
+    day_units = column(10)
+    hour_tens, hour_units = column(8), column(7)
+    minute_tens, minute_units = column(5), column(4)
+    second_tens, second_units = column(2), column(1)
+
+    digits = np.stack([hour_tens, hour_units, minute_tens, minute_units,
+                       second_tens, second_units, day_units])
+    canonical = (
+        (month_numbers > 0)
+        & ((lengths == 14) | (lengths == 15))
+        & (matrix[:, 3] == ord(" "))
+        & (column(9) == ord(" "))
+        & (column(6) == ord(":"))
+        & (column(3) == ord(":"))
+        & np.all((digits >= ord("0")) & (digits <= ord("9")), axis=0)
+        & ((lengths == 14) | ((day_tens >= 0) & (day_tens <= 9)))
+    )
+
+    day = day_tens * 10 + digit(day_units)
+    hour = digit(hour_tens) * 10 + digit(hour_units)
+    minute = digit(minute_tens) * 10 + digit(minute_units)
+    second = digit(second_tens) * 10 + digit(second_units)
+    max_day = np.array(DAYS_IN_MONTH, dtype=np.int16)[month_numbers]
+    valid = canonical & (day >= 1) & (day <= max_day) & (hour <= 23) & (minute <= 59) & (second <= 59)
+    hours[valid] = hour[valid]
+
+    # Formati non canonici (o troppo lunghi per la matrice): percorso scalare
+    for index in np.flatnonzero(~canonical):
+        hour_value = decode_hour(timestamps[index])
+        if hour_value is not None:
+            hours[index] = hour_value
+    return hours
+
+
+def hourly_counts(timestamps):
+    """
+    Conta gli eventi per ora del giorno in un blocco di timestamp usando decode_hours.
+
+    Args:
+        timestamps (list): Lista di timestamp syslog (str).
+
+    Returns:
+        dict: Dizionario {ora: numero di eventi} con le sole ore presenti.
+    """
+    hours = decode_hours(timestamps)
+    counts = np.bincount(hours[hours >= 0], minlength=24)
+    return {hour: int(counts[hour]) for hour in range(24) if counts[hour]}
@@ -1,11 +1,12 @@
 # utils.py
 import os
-import mysql.connector
-from db_config import DB_CONFIG # Importa le configurazioni del database
+import shutil
+from report_cache import REPORT_CACHE_DIR
+from storage import get_storage # Backend di persistenza configurato
 
 def reset_all():
     """
-    Elimina il database MySQL e tutti i report PDF generati.
+    Elimina il database (MySQL o SQLite) e tutti i report PDF generati.
     Poi ricrea le tabelle vuote nel database.
     """
     # Elimina i PDF generati nella cartella 'output'
@@ -19,31 +20,10 @@ def reset_all():
                     print(f"🗑️ Eliminato file: {filepath}")
                 except Exception as e:
                     print(f"Errore durante l'eliminazione di {filepath}: {e}")
+    # Elimina anche la cache dei report e dei grafici
+    shutil.rmtree(REPORT_CACHE_DIR, ignore_errors=True)
     
-    # Connessione al database per eliminare le tabelle
-    conn = None
-    cursor = None
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        # Elimina le tabelle se esistono
-        cursor.execute("DROP TABLE IF EXISTS anomalies")
-        cursor.execute("DROP TABLE IF EXISTS analysis_history")
-        conn.commit()
-        print("🗑️ Tabelle database MySQL eliminate.")
-        
-    except mysql.connector.Error as err:
-        print(f"Errore durante il reset del database: {err}")
-    finally:
-        # Chiude il cursore e la connessione se sono stati aperti
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            
-    # Ricrea database vuoto (chiamando init_db)
-    from database import init_db
-    init_db()
+    # Elimina le tabelle e ricrea il database vuoto (backend configurato: MySQL o SQLite)
+    get_storage().reset()
     print("🔁 Sistema resettato e pronto.")
 